@@ -0,0 +1,17 @@
+"""
+Configuration gunicorn (chargée automatiquement depuis la racine du projet, voir Procfile)
+Le client Gemini est créé dans chaque worker après le fork (voir GeminiService.client);
+ce hook ouvre ses connexions dès le démarrage du worker plutôt qu'à la première requête,
+et lance le balayage des fichiers temporaires orphelins (sans attendre un premier upload).
+"""
+
+
+def post_worker_init(worker):
+    from django.conf import settings
+    from main_app.scratch import scratch_space
+
+    scratch_space.start()
+
+    if getattr(settings, 'GEMINI_WARMUP_ON_BOOT', True):
+        from main_app.gemini_service import gemini_service
+        gemini_service.warm_up()
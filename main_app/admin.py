@@ -4,7 +4,13 @@ from .models import (
     UploadedContent,
     Interaction,
     ConceptMap,
-    UserProgress
+    UserProgress,
+    AnalysisCacheEntry,
+    AnalysisJob,
+    ChatSessionState,
+    GeminiFile,
+    InteractionArchive,
+    PromptBlob
 )
 
 
@@ -33,19 +39,19 @@ class UploadedContentAdmin(admin.ModelAdmin):
     list_display = ('filename', 'content_type', 'session', 'file_size', 'analysis_completed', 'uploaded_at')
     list_filter = ('content_type', 'analysis_completed', 'uploaded_at')
     search_fields = ('filename', 'session__title')
-    readonly_fields = ('id', 'uploaded_at', 'file_size')
+    readonly_fields = ('id', 'uploaded_at', 'file_size', 'content_hash')
 
 
 @admin.register(Interaction)
 class InteractionAdmin(admin.ModelAdmin):
-    list_display = ('session', 'interaction_type', 'timestamp', 'is_correct')
-    list_filter = ('interaction_type', 'is_correct', 'timestamp')
+    list_display = ('session', 'interaction_type', 'timestamp', 'is_correct', 'model_name')
+    list_filter = ('interaction_type', 'is_correct', 'model_name', 'timestamp')
     search_fields = ('session__title', 'gemini_prompt', 'user_response')
     readonly_fields = ('id', 'timestamp')
     
     fieldsets = (
         ('Interaction Info', {
-            'fields': ('id', 'session', 'interaction_type', 'timestamp', 'is_correct')
+            'fields': ('id', 'session', 'interaction_type', 'timestamp', 'is_correct', 'model_name')
         }),
         ('Content', {
             'fields': ('gemini_prompt', 'gemini_response', 'user_response')
@@ -56,6 +62,49 @@ class InteractionAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(InteractionArchive)
+class InteractionArchiveAdmin(admin.ModelAdmin):
+    """Interactions archivées, en lecture seule (textes décompressés à l'affichage)"""
+    list_display = ('session', 'interaction_type', 'timestamp', 'is_correct', 'model_name', 'partition')
+    list_filter = ('interaction_type', 'is_correct', 'partition')
+    search_fields = ('session__title', 'user_response')
+    list_select_related = ('session',)
+    readonly_fields = (
+        'id', 'session', 'interaction_type', 'timestamp', 'partition', 'is_correct', 'model_name',
+        'gemini_prompt', 'gemini_response', 'user_response', 'context_data', 'archived_at',
+    )
+    
+    fieldsets = (
+        ('Interaction Info', {
+            'fields': ('id', 'session', 'interaction_type', 'timestamp', 'is_correct', 'model_name', 'partition', 'archived_at')
+        }),
+        ('Content', {
+            'fields': ('gemini_prompt', 'gemini_response', 'user_response')
+        }),
+        ('Context', {
+            'fields': ('context_data',)
+        }),
+    )
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PromptBlob)
+class PromptBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size_bytes', 'codec', 'created_at')
+    list_filter = ('codec',)
+    search_fields = ('sha256',)
+    readonly_fields = ('sha256', 'codec', 'size_bytes', 'text', 'created_at')
+    exclude = ('data',)
+    
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(ConceptMap)
 class ConceptMapAdmin(admin.ModelAdmin):
     list_display = ('session', 'created_at')
@@ -83,3 +132,34 @@ class UserProgressAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at')
         }),
     )
+
+
+@admin.register(AnalysisCacheEntry)
+class AnalysisCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'mode', 'speed_mode', 'hit_count', 'size_bytes', 'last_accessed_at', 'expires_at')
+    list_filter = ('mode', 'speed_mode')
+    search_fields = ('content_hash', 'cache_key')
+    readonly_fields = ('cache_key', 'content_hash', 'context_hash', 'created_at', 'last_accessed_at', 'hit_count', 'size_bytes')
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'upload', 'status', 'progress', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'is_mock', 'created_at')
+    search_fields = ('upload__filename', 'worker_id')
+    readonly_fields = ('id', 'created_at', 'started_at', 'finished_at', 'worker_id', 'attempts')
+
+
+@admin.register(ChatSessionState)
+class ChatSessionStateAdmin(admin.ModelAdmin):
+    list_display = ('session', 'user_level', 'version', 'updated_at')
+    search_fields = ('session__title',)
+    readonly_fields = ('version', 'updated_at')
+
+
+@admin.register(GeminiFile)
+class GeminiFileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'state', 'mime_type', 'size_bytes', 'last_used_at', 'expires_at')
+    list_filter = ('state', 'mime_type')
+    search_fields = ('name', 'content_hash')
+    readonly_fields = ('content_hash', 'name', 'uri', 'created_at', 'last_used_at', 'expires_at')
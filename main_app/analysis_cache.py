@@ -0,0 +1,148 @@
+"""
+Cache d'analyses adressé par contenu
+Évite de rappeler Gemini pour un fichier déjà analysé avec les mêmes paramètres
+"""
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+from datetime import timedelta
+import hashlib
+import json
+import threading
+
+from .models import AnalysisCacheEntry
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 Mo
+
+
+def compute_file_hash(path, chunk_size=HASH_CHUNK_SIZE):
+    """Calcule le SHA-256 d'un fichier en streaming (mémoire constante)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash, mode, context="", speed_mode=False):
+    """Clé de cache: contenu + mode de session + contexte du prompt + speed_mode"""
+    context_hash = hashlib.sha256((context or "").encode('utf-8')).hexdigest()
+    raw = f"{content_hash}:{mode}:{context_hash}:{int(bool(speed_mode))}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest(), context_hash
+
+
+class AnalysisCache:
+    """Cache persistant (table AnalysisCacheEntry) avec TTL, éviction LRU et compteurs"""
+
+    EVICT_EVERY = 50  # Éviction (parcours de la table) toutes les N écritures
+
+    def __init__(self, ttl_seconds=None, max_entries=None, max_bytes=None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else getattr(
+            settings, 'ANALYSIS_CACHE_TTL_SECONDS', 30 * 24 * 3600
+        )
+        self.max_entries = max_entries if max_entries is not None else getattr(
+            settings, 'ANALYSIS_CACHE_MAX_ENTRIES', 5000
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else getattr(
+            settings, 'ANALYSIS_CACHE_MAX_BYTES', 200 * 1024 * 1024
+        )
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+            return self._counters[name]
+
+    def get(self, content_hash, mode, context="", speed_mode=False):
+        """Retourne l'analyse en cache ou None"""
+        if not content_hash:
+            self._incr('misses')
+            return None
+
+        cache_key, _ = make_cache_key(content_hash, mode, context, speed_mode)
+        entry = AnalysisCacheEntry.objects.filter(
+            cache_key=cache_key,
+            expires_at__gt=timezone.now()
+        ).only('id', 'analysis').first()
+
+        if entry is None:
+            self._incr('misses')
+            return None
+
+        AnalysisCacheEntry.objects.filter(id=entry.id).update(
+            hit_count=F('hit_count') + 1,
+            last_accessed_at=timezone.now()
+        )
+        self._incr('hits')
+        return entry.analysis
+
+    def set(self, content_hash, mode, analysis, context="", speed_mode=False):
+        """Enregistre une analyse (politique d'éviction appliquée toutes les EVICT_EVERY écritures)"""
+        if not content_hash:
+            return
+
+        cache_key, context_hash = make_cache_key(content_hash, mode, context, speed_mode)
+        now = timezone.now()
+        AnalysisCacheEntry.objects.update_or_create(
+            cache_key=cache_key,
+            defaults={
+                'content_hash': content_hash,
+                'mode': mode,
+                'context_hash': context_hash,
+                'speed_mode': bool(speed_mode),
+                'analysis': analysis,
+                'size_bytes': len(json.dumps(analysis)),
+                'last_accessed_at': now,
+                'expires_at': now + timedelta(seconds=self.ttl_seconds),
+            }
+        )
+        if self._incr('stores') % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà des limites"""
+        deleted, _ = AnalysisCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+
+        # Limite en nombre d'entrées
+        overflow_ids = list(
+            AnalysisCacheEntry.objects.order_by('-last_accessed_at')
+            .values_list('id', flat=True)[self.max_entries:]
+        )
+        if overflow_ids:
+            deleted += AnalysisCacheEntry.objects.filter(id__in=overflow_ids).delete()[0]
+
+        # Limite en taille totale
+        total = AnalysisCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+        if total > self.max_bytes:
+            to_delete = []
+            for entry_id, size in AnalysisCacheEntry.objects.order_by('last_accessed_at').values_list('id', 'size_bytes'):
+                if total <= self.max_bytes:
+                    break
+                to_delete.append(entry_id)
+                total -= size
+            deleted += AnalysisCacheEntry.objects.filter(id__in=to_delete).delete()[0]
+
+        if deleted:
+            self._incr('evictions', deleted)
+        return deleted
+
+    def stats(self):
+        """Compteurs du processus courant + état de la table"""
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses']
+        aggregate = AnalysisCacheEntry.objects.aggregate(total=Sum('size_bytes'))
+        counters.update({
+            'hit_rate': (counters['hits'] / lookups) if lookups else 0,
+            'entries': AnalysisCacheEntry.objects.count(),
+            'size_bytes': aggregate['total'] or 0,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+        })
+        return counters
+
+
+# Instance singleton du cache
+analysis_cache = AnalysisCache()
@@ -0,0 +1,61 @@
+"""
+Analyse progressive des uploads
+L'analyse d'un contenu est découpée en étapes prioritaires: l'essentiel (résumé, concepts)
+d'abord, puis les questions/quiz, puis la carte conceptuelle et les compléments.
+La première étape est courte: le tutorat peut commencer dès qu'elle est terminée,
+les suivantes sont générées en parallèle et fusionnées au fil de l'eau.
+"""
+import json
+
+# Étapes par mode de session: (nom, champs JSON demandés), par ordre de priorité
+ANALYSIS_STAGES = {
+    'video': [
+        ('overview', ['summary', 'key_concepts', 'difficulty_level']),
+        ('questions', ['interactive_questions', 'timestamps']),
+        ('extras', ['prerequisites']),
+    ],
+    'problem': [
+        ('overview', ['problem_type', 'difficulty', 'concepts_needed']),
+        ('questions', ['solution_steps', 'final_answer']),
+        ('extras', ['similar_problems']),
+    ],
+    'document': [
+        ('overview', ['document_type', 'summary', 'main_topics']),
+        ('questions', ['quiz_questions', 'key_definitions']),
+        ('extras', ['concept_map', 'analogies', 'visual_elements', 'further_reading', 'prerequisites']),
+    ],
+    'creative': [
+        ('overview', ['analysis', 'strengths']),
+        ('questions', ['improvements', 'next_steps']),
+        ('extras', ['design_principles', 'variations', 'technique_tips', 'inspiration']),
+    ],
+}
+
+
+def analysis_stages(mode):
+    """Étapes d'analyse du mode, ou [] si le mode s'analyse en un seul appel"""
+    return ANALYSIS_STAGES.get(mode, [])
+
+
+def stage_prompt(base_prompt, stages, index, overview=None):
+    """
+    Prompt d'une étape: le prompt complet du mode (formats attendus), restreint aux champs
+    de l'étape. Les étapes suivantes reçoivent le résultat de la première pour rester cohérentes.
+    """
+    name, fields = stages[index]
+    prompt = f"""{base_prompt}
+        ÉTAPE {index + 1}/{len(stages)}: fournis UNIQUEMENT les champs suivants: {", ".join(f'"{field}"' for field in fields)}.
+        Les autres champs sont générés séparément: ne les inclus pas.
+        """
+    if overview:
+        prompt += f"""
+        Analyse déjà établie (à respecter pour rester cohérent):
+        {json.dumps(overview, ensure_ascii=False)}
+        """
+    return prompt
+
+
+def stage_fields(analysis, stages, index):
+    """Ne garde que les champs de l'étape (le modèle en ajoute parfois d'autres)"""
+    _, fields = stages[index]
+    return {field: analysis[field] for field in fields if field in analysis}
@@ -0,0 +1,362 @@
+"""
+Versions asynchrones des vues API (à servir via ASGI)
+Un seul worker ASGI peut ainsi multiplexer de nombreux appels Gemini en vol.
+Activées par ASYNC_API_VIEWS=True (voir main_app/urls.py).
+"""
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from django.conf import settings
+from asgiref.sync import sync_to_async
+import asyncio
+import json
+import time
+
+from .models import LearningSession, Interaction, AnalysisJob
+from .gemini_service import gemini_service
+from .session_stats import session_stats
+from .parsed_analysis import parsed_analyses
+from .views import (
+    clean_gemini_error,
+    get_mock_response,
+    handle_upload,
+    build_first_question_prompt,
+    build_chat_context,
+    build_hint_prompt,
+    record_hint,
+    record_question,
+    sse_event,
+    sse_response,
+    upload_status_payload,
+    wants_stream,
+    FALLBACK_FIRST_QUESTIONS,
+)
+
+
+async def _arelay_chunks(chunks, parts):
+    """Relaie les fragments Gemini en évènements 'token' et accumule le texte dans parts"""
+    async for text in chunks:
+        parts.append(text)
+        yield sse_event('token', {'text': text})
+
+
+async def _astream_first_question(chunks, mode):
+    parts = []
+    try:
+        async for event in _arelay_chunks(chunks, parts):
+            yield event
+    except Exception as e:
+        error_msg, status_code = clean_gemini_error(str(e))
+        if status_code in [429, 503] and not parts:
+            yield sse_event('done', {
+                'success': True,
+                'question': FALLBACK_FIRST_QUESTIONS.get(mode, "Que penses-tu de ce contenu ?"),
+                'is_fallback': True
+            })
+        else:
+            yield sse_event('error', {'success': False, 'error': error_msg})
+        return
+
+    yield sse_event('done', {
+        'success': True,
+        'question': ''.join(parts).strip().strip('"').strip("'")
+    })
+
+
+async def _astream_question_response(chunks, session, question, context, analysis_summary, meta):
+    parts = []
+    try:
+        async for event in _arelay_chunks(chunks, parts):
+            yield event
+    except Exception as e:
+        error_msg, status_code = clean_gemini_error(str(e))
+        if status_code in [429, 503] and not parts:
+            yield sse_event('done', {
+                'success': True,
+                'response': get_mock_response(question, analysis_summary),
+                'is_mock': True
+            })
+        else:
+            yield sse_event('error', {'success': False, 'error': error_msg})
+        return
+
+    response = ''.join(parts)
+    interaction = await sync_to_async(record_question)(session, question, response, context, meta.get('model', ''))
+    yield sse_event('done', {
+        'success': True,
+        'response': response,
+        'interaction_id': str(interaction.id)
+    })
+
+
+async def _astream_hint(chunks, session, hint_prompt, problem, meta):
+    parts = []
+    try:
+        async for event in _arelay_chunks(chunks, parts):
+            yield event
+        hint_data = json.loads(''.join(parts))
+        await sync_to_async(record_hint)(session, hint_prompt, hint_data, problem, meta.get('model', ''))
+    except Exception as e:
+        error_msg, status_code = clean_gemini_error(str(e))
+        yield sse_event('error', {'success': False, 'error': error_msg})
+        return
+
+    yield sse_event('done', {
+        'success': True,
+        'hint': hint_data.get('hint'),
+        'encouragement': hint_data.get('encouragement')
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def upload_content(request):
+    """
+    Upload et analyse du contenu (version async)
+
+    Le parsing multipart et l'écriture sur disque sont bloquants dans Django:
+    ils s'exécutent dans un thread, l'analyse Gemini passe par la file d'attente.
+    """
+    return await sync_to_async(handle_upload, thread_sensitive=False)(request)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def generate_first_question(request):
+    """Génère la première question socratique (version async)"""
+    mode = None
+    try:
+        data = json.loads(request.body)
+        session_id = data.get('session_id')
+        mode = data.get('mode')
+
+        session = await LearningSession.objects.aget(id=session_id)
+        latest_upload = await session.uploads.ready().defer('analysis').alast()
+
+        if not latest_upload:
+            return JsonResponse({
+                'success': False,
+                'error': 'No completed analysis found'
+            }, status=404)
+
+        analysis = await parsed_analyses.aget(latest_upload)
+        prompt = build_first_question_prompt(mode, analysis)
+
+        def full_context():
+            return f"""
+            Session Mode: {session.get_mode_display()}
+            Content Analysis: {json.dumps(analysis, indent=2)}
+            """
+
+        if wants_stream(request, data):
+            return sse_response(_astream_first_question(
+                gemini_service.astream_session_message(session_id, prompt, context=full_context, upload=latest_upload, route='first_question'), mode
+            ))
+        question = await gemini_service.asend_session_message(session_id, prompt, context=full_context, upload=latest_upload, route='first_question')
+
+        return JsonResponse({
+            'success': True,
+            'question': question.strip().strip('"').strip("'")
+        })
+
+    except LearningSession.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Session not found'
+        }, status=404)
+    except Exception as e:
+        error_msg, status_code = clean_gemini_error(str(e))
+
+        if status_code in [429, 503]:
+            return JsonResponse({
+                'success': True,
+                'question': FALLBACK_FIRST_QUESTIONS.get(mode, "Que penses-tu de ce contenu ?"),
+                'is_fallback': True
+            })
+
+        return JsonResponse({
+            'success': False,
+            'error': error_msg
+        }, status=status_code)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def ask_question(request):
+    """Pose une question interactive pendant une session (version async)"""
+    analysis_summary = {}
+    question = None
+    try:
+        data = json.loads(request.body)
+        session_id = data.get('session_id')
+        question = data.get('question')
+        context = data.get('context', {})
+
+        session = await LearningSession.objects.aget(id=session_id)
+        latest_upload = await session.uploads.ready().defer('analysis').alast()
+        if latest_upload:
+            analysis_summary = await parsed_analyses.aget(latest_upload)
+
+        def full_context():
+            return build_chat_context(session, analysis_summary if latest_upload else None, context)
+
+        meta = {}
+        if wants_stream(request, data):
+            return sse_response(_astream_question_response(
+                gemini_service.astream_session_message(session_id, question, context=full_context, upload=latest_upload, meta=meta),
+                session, question, context, analysis_summary, meta
+            ))
+        response = await gemini_service.asend_session_message(session_id, question, context=full_context, upload=latest_upload, meta=meta)
+
+        interaction = await sync_to_async(record_question)(session, question, response, context, meta.get('model', ''))
+
+        return JsonResponse({
+            'success': True,
+            'response': response,
+            'interaction_id': str(interaction.id)
+        })
+
+    except LearningSession.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Session introuvable'
+        }, status=404)
+    except Exception as e:
+        error_msg, status_code = clean_gemini_error(str(e))
+
+        if status_code in [429, 503]:
+            print(f"DEBUG: QUOTA HIT during Chat! Activating Mock Response.")
+            return JsonResponse({
+                'success': True,
+                'response': get_mock_response(question, analysis_summary),
+                'is_mock': True
+            })
+
+        return JsonResponse({
+            'success': False,
+            'error': error_msg
+        }, status=status_code)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def submit_answer(request):
+    """Soumet une réponse de l'utilisateur pour évaluation (version async)"""
+    try:
+        data = json.loads(request.body)
+        session_id = data.get('session_id')
+        question = data.get('question')
+        user_answer = data.get('user_answer')
+        context = data.get('context', {})
+
+        session = await LearningSession.objects.aget(id=session_id)
+
+        meta = {}
+        evaluation = await gemini_service.aevaluate_answer(
+            question=question,
+            user_answer=user_answer,
+            correct_answer=data.get('correct_answer'),
+            context=json.dumps(context),
+            meta=meta
+        )
+
+        interaction = await Interaction.objects.acreate(
+            session=session,
+            interaction_type='answer',
+            gemini_prompt=question,
+            gemini_response=evaluation.get('feedback', ''),
+            user_response=user_answer,
+            is_correct=evaluation.get('is_correct', False),
+            model_name=meta.get('model', ''),
+            context_data=context
+        )
+
+        await session_stats.arecord(session, correct=1 if evaluation.get('is_correct') else 0)
+
+        return JsonResponse({
+            'success': True,
+            'evaluation': evaluation,
+            'interaction_id': str(interaction.id)
+        })
+
+    except LearningSession.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Session not found'
+        }, status=404)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def request_hint(request):
+    """Demande un indice pour un problème (version async)"""
+    try:
+        data = json.loads(request.body)
+        session_id = data.get('session_id')
+        problem = data.get('problem')
+
+        session = await LearningSession.objects.aget(id=session_id)
+        hint_prompt = build_hint_prompt(problem, data.get('current_progress', ''))
+
+        hint_context = f"Session Mode: {session.get_mode_display()}"
+        meta = {}
+        if wants_stream(request, data):
+            return sse_response(_astream_hint(
+                gemini_service.astream_session_message(session_id, hint_prompt, context=hint_context, route='hint', meta=meta),
+                session, hint_prompt, problem, meta
+            ))
+        response = await gemini_service.asend_session_message(session_id, hint_prompt, context=hint_context, route='hint', meta=meta)
+        hint_data = json.loads(response)
+
+        await sync_to_async(record_hint)(session, hint_prompt, hint_data, problem, meta.get('model', ''))
+
+        return JsonResponse({
+            'success': True,
+            'hint': hint_data.get('hint'),
+            'encouragement': hint_data.get('encouragement')
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+async def stream_upload_status(job_id):
+    """Flux SSE d'une analyse: 'status' à chaque progression, 'done' une fois terminée ou en échec"""
+    interval = getattr(settings, 'ANALYSIS_EVENTS_POLL_INTERVAL', 0.5)
+    deadline = time.monotonic() + getattr(settings, 'ANALYSIS_EVENTS_TIMEOUT', 600)
+    last_state = None
+    while time.monotonic() < deadline:
+        job = await AnalysisJob.objects.select_related('upload').aget(id=job_id)
+        payload = upload_status_payload(job)
+        if job.status in ('completed', 'failed'):
+            yield sse_event('done', payload)
+            return
+        state = (job.status, job.progress, job.upload.analysis_stage)
+        if state != last_state:
+            last_state = state
+            yield sse_event('status', payload)
+        await asyncio.sleep(interval)
+    # Le client reprend alors le suivi via /api/upload/<job_id>/status/
+    yield sse_event('timeout', {'success': True, 'job_id': str(job_id)})
+
+
+@require_http_methods(["GET"])
+async def get_upload_events(request, job_id):
+    """
+    Suivi d'une analyse en Server-Sent Events (alternative au polling de get_upload_status)
+    Uniquement en ASGI: l'attente entre deux lectures ne bloque pas de worker
+    """
+    if not await AnalysisJob.objects.filter(id=job_id).aexists():
+        return JsonResponse({
+            'success': False,
+            'error': 'Job not found'
+        }, status=404)
+    return sse_response(stream_upload_status(job_id))
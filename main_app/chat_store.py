@@ -0,0 +1,234 @@
+"""
+Stockage de l'état des conversations Gemini
+Remplace le dict _active_chats (non borné, privé à chaque worker) par un store sérialisé:
+- LocalChatStore: LRU en mémoire avec expiration par inactivité
+- DatabaseChatStore: table ChatSessionState partagée entre les workers
+- TieredChatStore: LRU local validé par la version stockée en base
+
+Un état est un dict {"context", "user_level", "history", "version", "analysis_version"}.
+set() est une écriture conditionnelle (compare-and-set): l'état de version N+1 n'est enregistré que
+si le store est encore à la version N, sinon ChatStateConflict (deux tours simultanés de la même session).
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from collections import OrderedDict
+from datetime import timedelta
+import threading
+import time
+
+from .models import ChatSessionState
+
+
+class ChatStateConflict(Exception):
+    """Un autre tour de la même conversation a été enregistré entre la lecture et l'écriture"""
+    pass
+
+
+class LocalChatStore:
+    """LRU en mémoire, borné en nombre d'entrées et expiré après inactivité"""
+
+    def __init__(self, max_entries=None, idle_ttl=None, clock=None):
+        self.max_entries = max_entries or getattr(settings, 'CHAT_STORE_MAX_ENTRIES', 1000)
+        self.idle_ttl = idle_ttl or getattr(settings, 'CHAT_STORE_IDLE_TTL_SECONDS', 2 * 3600)
+        self._clock = clock or time.monotonic  # Injectable (tests)
+        self._entries = OrderedDict()  # session_id -> (last_access, state)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, session_id):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or now - entry[0] > self.idle_ttl:
+                if entry is not None:
+                    del self._entries[session_id]
+                    self._counters['evictions'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries[session_id] = (now, entry[1])
+            self._entries.move_to_end(session_id)
+            self._counters['hits'] += 1
+            return entry[1]
+
+    def set(self, session_id, state):
+        """Écrit la version N+1 si l'entrée est encore à la version N (ou absente)"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            live = entry is not None and self._clock() - entry[0] <= self.idle_ttl
+            if live and entry[1]['version'] != state['version'] - 1:
+                raise ChatStateConflict(session_id)
+            self._put(session_id, state)
+
+    def store(self, session_id, state):
+        """Écrit sans vérifier la version (copie locale d'un état déjà validé par le store partagé)"""
+        with self._lock:
+            self._put(session_id, state)
+
+    def _put(self, session_id, state):
+        now = self._clock()
+        self._entries[session_id] = (now, state)
+        self._entries.move_to_end(session_id)
+        self._evict(now)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def _evict(self, now):
+        # Entrées inactives (les plus anciennes sont en tête)
+        while self._entries:
+            oldest_id, (last_access, _) = next(iter(self._entries.items()))
+            if now - last_access <= self.idle_ttl:
+                break
+            del self._entries[oldest_id]
+            self._counters['evictions'] += 1
+        # Plafond du nombre d'entrées
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), max_entries=self.max_entries)
+
+
+class DatabaseChatStore:
+    """États persistés dans ChatSessionState: n'importe quel worker peut reprendre la conversation"""
+
+    PURGE_EVERY = 100  # Purge des états expirés toutes les N écritures
+
+    def __init__(self, idle_ttl=None):
+        self.idle_ttl = idle_ttl or getattr(settings, 'CHAT_STORE_IDLE_TTL_SECONDS', 2 * 3600)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'writes': 0, 'conflicts': 0, 'evictions': 0}
+
+    def _incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+            return self._counters[name]
+
+    def _fresh(self):
+        return ChatSessionState.objects.filter(updated_at__gt=timezone.now() - timedelta(seconds=self.idle_ttl))
+
+    def get(self, session_id):
+        row = self._fresh().filter(session_id=session_id).first()
+        if row is None:
+            self._incr('misses')
+            return None
+        self._incr('hits')
+        return {
+            'context': row.context,
+            'user_level': row.user_level,
+            'history': row.history,
+            'version': row.version,
+            'analysis_version': row.analysis_version,
+        }
+
+    def get_version(self, session_id):
+        """Version seule: lecture par clé primaire d'un entier, sans charger l'historique"""
+        return self._fresh().filter(session_id=session_id).values_list('version', flat=True).first()
+
+    def set(self, session_id, state):
+        """Écrit la version N+1 si la ligne est encore à la version N (premier tour: création)"""
+        fields = {
+            'context': state['context'],
+            'user_level': state['user_level'],
+            'history': state['history'],
+            'version': state['version'],
+            'analysis_version': state.get('analysis_version', ''),
+            'updated_at': timezone.now(),  # update() ne déclenche pas auto_now
+        }
+        rows = ChatSessionState.objects.filter(session_id=session_id)
+        expected = state['version'] - 1
+        if expected > 0:
+            written = rows.filter(version=expected).update(**fields)
+        else:
+            # Premier tour: une ligne expirée (get() ne la voyait plus) est remplacée, sinon créée
+            written = rows.filter(updated_at__lte=timezone.now() - timedelta(seconds=self.idle_ttl)).update(**fields)
+            if not written:
+                try:
+                    with transaction.atomic():
+                        ChatSessionState.objects.create(session_id=session_id, **fields)
+                    written = 1
+                except IntegrityError:
+                    written = 0
+        if not written:
+            self._incr('conflicts')
+            raise ChatStateConflict(session_id)
+        if self._incr('writes') % self.PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def delete(self, session_id):
+        ChatSessionState.objects.filter(session_id=session_id).delete()
+
+    def purge_expired(self):
+        deadline = timezone.now() - timedelta(seconds=self.idle_ttl)
+        deleted, _ = ChatSessionState.objects.filter(updated_at__lte=deadline).delete()
+        if deleted:
+            self._incr('evictions', deleted)
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters['entries'] = ChatSessionState.objects.count()
+        return counters
+
+
+class TieredChatStore:
+    """LRU local devant le store partagé; l'état local n'est réutilisé que si sa version est à jour
+
+    Chaque get() interroge la base pour la version (une requête par tour de conversation):
+    un autre worker a pu faire avancer la conversation depuis. Cette requête ne lit qu'un
+    entier par clé primaire; ce que le LRU économise, c'est la désérialisation de
+    l'historique, un JSON qui grossit à chaque tour.
+    Pas de regroupement des vérifications: les tours d'une même session sont séquentiels
+    et ne partagent pas de requête, et sauter la vérification servirait un état périmé.
+    """
+
+    def __init__(self, local=None, shared=None):
+        self.local = local or LocalChatStore()
+        self.shared = shared or DatabaseChatStore()
+
+    def get(self, session_id):
+        state = self.local.get(session_id)
+        if state is not None and self.shared.get_version(session_id) == state['version']:
+            return state
+
+        state = self.shared.get(session_id)
+        if state is None:
+            self.local.delete(session_id)
+        else:
+            self.local.store(session_id, state)
+        return state
+
+    def set(self, session_id, state):
+        try:
+            self.shared.set(session_id, state)
+        except ChatStateConflict:
+            # La copie locale est périmée: le prochain get() relira la base
+            self.local.delete(session_id)
+            raise
+        self.local.store(session_id, state)
+
+    def delete(self, session_id):
+        self.shared.delete(session_id)
+        self.local.delete(session_id)
+
+    def stats(self):
+        return {'local': self.local.stats(), 'shared': self.shared.stats()}
+
+
+def build_chat_store(backend=None):
+    """Construit le store configuré par CHAT_STORE_BACKEND (memory | database | tiered)"""
+    backend = backend or getattr(settings, 'CHAT_STORE_BACKEND', 'tiered')
+    if backend == 'memory':
+        return LocalChatStore()
+    if backend == 'database':
+        return DatabaseChatStore()
+    return TieredChatStore()
+
+
+# Instance singleton du store
+chat_store = build_chat_store()
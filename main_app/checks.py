@@ -0,0 +1,20 @@
+"""
+Vérifications de configuration (system checks Django)
+Affichées par runserver, check et migrate, et non à chaque import des settings.
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def gemini_api_key_check(app_configs, **kwargs):
+    """Sans clé API, l'application démarre mais les fonctions IA renvoient une erreur de configuration"""
+    if getattr(settings, 'GOOGLE_API_KEY', ''):
+        return []
+    return [
+        Warning(
+            "GOOGLE_API_KEY not found in environment variables. AI features will require setup.",
+            hint="Add GOOGLE_API_KEY to your .env file.",
+            id='main_app.W001',
+        )
+    ]
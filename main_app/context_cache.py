@@ -0,0 +1,163 @@
+"""
+Cache de contexte explicite Gemini (client.caches)
+L'instruction système du tuteur, qui contient l'analyse du contenu, est envoyée une seule fois,
+puis référencée par son nom de cache à chaque tour de chat (tokens facturés au tarif "cached").
+Seule cette instruction est mise en cache: le chat ne renvoie ni le média ni les prompts d'analyse,
+qui ne servent qu'à l'analyse elle-même (un seul appel par upload).
+
+Un cache Gemini est lié à un modèle: un upload garde un cache par modèle (model_router peut
+alterner entre paliers), et les caches remplacés expirent d'eux-mêmes (TTL) au lieu d'être supprimés.
+"""
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+import hashlib
+import threading
+
+from .lazy_imports import lazy_module
+
+types = lazy_module('google.genai.types')
+
+
+def make_context_key(model_name, system_instruction):
+    """Clé SHA-256 du contexte (un cache Gemini est lié à un modèle)"""
+    return hashlib.sha256(f"{model_name}\n{system_instruction}".encode('utf-8')).hexdigest()
+
+
+def estimate_tokens(text):
+    """Estimation grossière (~4 caractères par token), suffisante pour le seuil minimal de Gemini"""
+    return len(text) // 4
+
+
+class ContextCacheManager:
+    """
+    Crée, rafraîchit et évince les caches de contexte Gemini.
+
+    Les caches liés à un upload sont tracés sur UploadedContent.context_caches
+    ({modèle: {key, name, expires_at}}) pour être réutilisés par tous les workers;
+    les autres restent dans un index local.
+    """
+
+    def __init__(self, ttl=None, refresh_margin=None, min_tokens=None, enabled=None):
+        self.ttl = ttl or getattr(settings, 'GEMINI_CONTEXT_CACHE_TTL_SECONDS', 3600)
+        self.refresh_margin = refresh_margin or getattr(settings, 'GEMINI_CONTEXT_CACHE_REFRESH_SECONDS', 300)
+        self.min_tokens = min_tokens or getattr(settings, 'GEMINI_CONTEXT_CACHE_MIN_TOKENS', 1024)
+        self.enabled = getattr(settings, 'GEMINI_CONTEXT_CACHE_ENABLED', True) if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._local = {}  # key -> (name, expires_at)
+        self._counters = {'hits': 0, 'creates': 0, 'refreshes': 0, 'evictions': 0, 'skipped': 0, 'errors': 0}
+
+    def _incr(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _ttl(self):
+        return f"{int(self.ttl)}s"
+
+    def _expires_at(self, cached):
+        return getattr(cached, 'expire_time', None) or timezone.now() + timedelta(seconds=self.ttl)
+
+    def _lookup(self, key, model_name, upload):
+        entry = (upload.context_caches or {}).get(model_name) if upload is not None else None
+        if entry and entry.get('key') == key and entry.get('name'):
+            return entry['name'], parse_datetime(entry.get('expires_at') or '')
+        with self._lock:
+            return self._local.get(key, (None, None))
+
+    def _remember(self, key, model_name, name, expires_at, upload):
+        now = timezone.now()
+        with self._lock:
+            # Les caches expirés côté Gemini n'ont plus rien à référencer
+            for stale in [k for k, (_, expiry) in self._local.items() if expiry <= now]:
+                del self._local[stale]
+            self._local[key] = (name, expires_at)
+        if upload is not None:
+            # Les entrées des autres modèles sont conservées (et expirées par leur TTL)
+            caches = {
+                model: entry for model, entry in (upload.context_caches or {}).items()
+                if (parse_datetime(entry.get('expires_at') or '') or now) > now
+            }
+            caches[model_name] = {'key': key, 'name': name, 'expires_at': expires_at.isoformat()}
+            upload.context_caches = caches
+            upload.save(update_fields=['context_caches'])
+
+    def _forget(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def get_chat_cache(self, client, model_name, system_instruction, upload=None):
+        """
+        Nom du cache contenant l'instruction système, ou None (contexte trop court,
+        cache désactivé ou erreur: l'appelant envoie alors l'instruction en clair).
+        """
+        if not self.enabled or client is None:
+            return None
+        if estimate_tokens(system_instruction) < self.min_tokens:
+            self._incr('skipped')
+            return None
+
+        key = make_context_key(model_name, system_instruction)
+        name, expires_at = self._lookup(key, model_name, upload)
+        now = timezone.now()
+
+        if name and expires_at and expires_at > now + timedelta(seconds=self.refresh_margin):
+            self._incr('hits')
+            return name
+
+        try:
+            if name and expires_at and expires_at > now:
+                # Bientôt expiré: prolonger plutôt que recréer
+                cached = client.caches.update(
+                    name=name,
+                    config=types.UpdateCachedContentConfig(ttl=self._ttl())
+                )
+                self._incr('refreshes')
+            else:
+                cached = client.caches.create(
+                    model=model_name,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=system_instruction,
+                        display_name=f"kachele-{key[:16]}",
+                        ttl=self._ttl()
+                    )
+                )
+                self._incr('creates')
+            self._remember(key, model_name, cached.name, self._expires_at(cached), upload)
+            return cached.name
+        except Exception as e:
+            print(f"DEBUG: Context cache unavailable, sending full context ({e})")
+            self._incr('errors')
+            self._forget(key)
+            return None
+
+    async def aget_chat_cache(self, client, model_name, system_instruction, upload=None):
+        """Version asynchrone de get_chat_cache (accès DB et client bloquants dans un thread)"""
+        return await sync_to_async(self.get_chat_cache)(client, model_name, system_instruction, upload)
+
+    def _delete(self, client, name):
+        try:
+            client.caches.delete(name=name)
+            self._incr('evictions')
+        except Exception as e:
+            print(f"DEBUG: Could not delete context cache {name}: {e}")
+
+    def evict(self, client, upload):
+        """Supprime les caches Gemini d'un upload, tous modèles confondus (ex: contenu remplacé ou supprimé)"""
+        if not upload.context_caches:
+            return
+        for entry in upload.context_caches.values():
+            if client is not None and entry.get('name'):
+                self._delete(client, entry['name'])
+            self._forget(entry.get('key'))
+        upload.context_caches = {}
+        upload.save(update_fields=['context_caches'])
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, local_entries=len(self._local))
+
+
+# Instance singleton du gestionnaire
+context_cache = ContextCacheManager()
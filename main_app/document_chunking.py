@@ -0,0 +1,227 @@
+"""
+Analyse map-reduce des documents volumineux
+Le document est découpé en plages de pages (PDF, via pypdf) ou en sections
+(texte brut); chaque morceau est analysé séparément, puis les résultats partiels
+(carte conceptuelle, définitions, quiz...) sont fusionnés.
+"""
+from django.conf import settings
+from collections import namedtuple
+import hashlib
+import importlib.util
+import os
+import re
+
+from .scratch import scratch_space
+from .lazy_imports import lazy_module
+
+pypdf = lazy_module('pypdf')  # Importé au premier PDF découpé (pypdf charge aussi Pillow)
+
+# Morceau de document: fichier PDF extrait (path) ou texte (text)
+DocumentChunk = namedtuple('DocumentChunk', ['index', 'label', 'path', 'text', 'content_hash'])
+
+TEXT_EXTENSIONS = ['.txt', '.md']
+LEVEL_ORDER = {'easy': 0, 'medium': 1, 'hard': 2}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _ranges(total, size, max_chunks):
+    """Plages [début, fin) de taille size, agrandies si elles dépassent max_chunks"""
+    size = max(size, -(-total // max_chunks))
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def pdf_available():
+    # Dans requirements.txt; sans pypdf, les PDF sont analysés d'un bloc
+    return importlib.util.find_spec('pypdf') is not None
+
+
+def _split_pdf(path):
+    if not pdf_available():
+        print("DEBUG: pypdf is not installed, PDF analysed as a whole")
+        return []
+    reader = pypdf.PdfReader(path)
+    pages = len(reader.pages)
+    if pages < _setting('DOCUMENT_CHUNK_MIN_PAGES', 40):
+        return []
+
+    chunks = []
+    for index, (start, end) in enumerate(_ranges(pages, _setting('DOCUMENT_CHUNK_PAGES', 25), _setting('DOCUMENT_CHUNK_MAX', 20))):
+        writer = pypdf.PdfWriter()
+        for page in reader.pages[start:end]:
+            writer.add_page(page)
+        chunk_path = scratch_space.path_for('chunk.pdf')
+        with open(chunk_path, 'wb') as f:
+            writer.write(f)
+        with open(chunk_path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        chunks.append(DocumentChunk(index, f"pages {start + 1}-{end}", chunk_path, None, content_hash))
+    return chunks
+
+
+def _split_text(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    chunk_chars = _setting('DOCUMENT_CHUNK_CHARS', 100000)
+    if len(text) < chunk_chars * 1.5:
+        return []
+
+    # Découpe sur les paragraphes pour ne pas couper une section en plein milieu
+    paragraphs = re.split(r'\n\s*\n', text)
+    sections, current = [], ''
+    for paragraph in paragraphs:
+        if current and len(current) + len(paragraph) > chunk_chars:
+            sections.append(current)
+            current = ''
+        current += paragraph + '\n\n'
+    if current.strip():
+        sections.append(current)
+
+    total = len(sections)
+    return [
+        DocumentChunk(index, f"section {index + 1}/{total}", None, section, '')
+        for index, section in enumerate(sections)
+    ]
+
+
+def plan_chunks(path):
+    """Morceaux à analyser séparément, ou [] si le document tient en un seul appel"""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == '.pdf':
+            return _split_pdf(path)
+        if extension in TEXT_EXTENSIONS:
+            return _split_text(path)
+    except Exception as e:
+        print(f"DEBUG: Document chunking failed, analysing as a whole ({e})")
+    return []
+
+
+def cleanup_chunks(chunks):
+    for chunk in chunks:
+        scratch_space.release(chunk.path)
+
+
+def chunk_prompt(chunk, total, focus_areas=""):
+    return f"""
+        Tu analyses la partie {chunk.index + 1}/{total} ({chunk.label}) d'un document volumineux.
+        {f"Focus spécifique sur: {focus_areas}" if focus_areas else ""}
+
+        Fournis une réponse JSON pour CETTE partie uniquement, avec:
+        1. "summary": Résumé de cette partie (5-8 phrases)
+        2. "main_topics": Sujets principaux abordés
+        3. "concept_map": {{"nodes": [{{"id": "unique_id", "label": "Concept", "level": 1-3, "description": "...", "category": "..."}}],
+                            "edges": [{{"from": "id1", "to": "id2", "relationship": "prérequis/compose/illustre/..."}}]}}
+        4. "key_definitions": {{term: definition}}
+        5. "quiz_questions": 3 questions [{{"level": "easy/medium/hard", "question": "...", "options": [...], "correct": 0, "explanation": "..."}}]
+        6. "analogies": Analogies concrètes pour les concepts abstraits
+        7. "visual_elements": Description des diagrammes/images de cette partie (si présents)
+
+        IMPORTANT: Utilise TOUJOURS le format LaTeX pour les équations mathématiques ($...$ pour en ligne, $$...$$ pour bloc).
+        Réponds uniquement par le JSON valide.
+        """
+
+
+def reduce_prompt(merged, focus_areas=""):
+    summaries = "\n".join(f"- {summary}" for summary in merged.get('section_summaries', []))
+    return f"""
+        Voici les résumés successifs des parties d'un document, et ses sujets principaux.
+        {f"Focus spécifique sur: {focus_areas}" if focus_areas else ""}
+
+        Résumés des parties:
+        {summaries}
+
+        Sujets: {", ".join(merged.get('main_topics', []))}
+
+        Fournis une réponse JSON avec:
+        1. "document_type": Type de document (académique, technique, cours, article...)
+        2. "summary": Résumé exécutif complet du document entier
+        3. "prerequisites": Connaissances préalables recommandées
+        4. "further_reading": Suggestions de lectures complémentaires
+
+        Réponds uniquement par le JSON valide.
+        """
+
+
+def _as_list(value):
+    if isinstance(value, list):
+        return value
+    if value:
+        return [value]
+    return []
+
+
+def _normalize(label):
+    return re.sub(r'\s+', ' ', str(label)).strip().lower()
+
+
+def merge_chunk_analyses(partials, quiz_size=10):
+    """
+    Fusionne les analyses partielles (dict index -> analyse), dans l'ordre du document.
+    Les nœuds de même libellé sont dédoublonnés et les arêtes renumérotées en conséquence.
+    """
+    merged = {
+        'section_summaries': [],
+        'main_topics': [],
+        'concept_map': {'nodes': [], 'edges': []},
+        'key_definitions': {},
+        'quiz_questions': [],
+        'analogies': [],
+        'visual_elements': [],
+    }
+    seen_topics = set()
+    node_by_label = {}
+    seen_edges = set()
+    quiz_by_chunk = []
+
+    for index in sorted(partials):
+        partial = partials[index] or {}
+        if partial.get('summary'):
+            merged['section_summaries'].append(partial['summary'])
+
+        for topic in _as_list(partial.get('main_topics')):
+            if _normalize(topic) not in seen_topics:
+                seen_topics.add(_normalize(topic))
+                merged['main_topics'].append(topic)
+
+        cmap = partial.get('concept_map') or {}
+        id_map = {}
+        for node in cmap.get('nodes', []):
+            key = _normalize(node.get('label', node.get('id', '')))
+            if key in node_by_label:
+                id_map[node.get('id')] = node_by_label[key]
+                continue
+            new_id = f"c{index}_{node.get('id')}"
+            id_map[node.get('id')] = new_id
+            node_by_label[key] = new_id
+            merged['concept_map']['nodes'].append(dict(node, id=new_id))
+        for edge in cmap.get('edges', []):
+            source, target = id_map.get(edge.get('from')), id_map.get(edge.get('to'))
+            if not source or not target or source == target:
+                continue
+            signature = (source, target, edge.get('relationship'))
+            if signature not in seen_edges:
+                seen_edges.add(signature)
+                merged['concept_map']['edges'].append(dict(edge, **{'from': source, 'to': target}))
+
+        definitions = partial.get('key_definitions')
+        if isinstance(definitions, dict):
+            for term, definition in definitions.items():
+                merged['key_definitions'].setdefault(term, definition)
+
+        quiz_by_chunk.append(_as_list(partial.get('quiz_questions')))
+        merged['analogies'].extend(_as_list(partial.get('analogies')))
+        merged['visual_elements'].extend(_as_list(partial.get('visual_elements')))
+
+    # Quiz: tour de rôle entre les parties (couverture du document), puis progression facile -> difficile
+    quiz = []
+    for round_index in range(max((len(q) for q in quiz_by_chunk), default=0)):
+        for questions in quiz_by_chunk:
+            if round_index < len(questions) and len(quiz) < quiz_size:
+                quiz.append(questions[round_index])
+    merged['quiz_questions'] = sorted(quiz, key=lambda q: LEVEL_ORDER.get(str(q.get('level', '')).lower(), 1) if isinstance(q, dict) else 1)
+
+    merged['summary'] = "\n\n".join(merged['section_summaries'])
+    return merged
@@ -0,0 +1,160 @@
+"""
+Suivi partagé des fichiers Gemini en cours de traitement (état PROCESSING)
+Un seul thread interroge client.files.get pour tous les uploads en attente, avec un
+intervalle qui croît à chaque vérification, et résout un Future par fichier.
+"""
+from concurrent.futures import Future
+from django.conf import settings
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Profils de vérification par type de contenu (secondes)
+POLL_PROFILES = {
+    'video': {'initial': 2.0, 'max_interval': 10.0, 'timeout': 300},
+    'document': {'initial': 0.5, 'max_interval': 5.0, 'timeout': 120},
+}
+BACKOFF_FACTOR = 1.6
+
+TIMEOUT_MESSAGES = {
+    'video': "Le traitement de la vidéo prend trop de temps. Veuillez réessayer avec un fichier plus court.",
+    'document': "Le traitement du document prend trop de temps. Veuillez réessayer avec un fichier plus léger.",
+}
+FAILED_MESSAGES = {
+    'video': "Video processing failed",
+    'document': "Le traitement du document a échoué. Vérifiez le format du fichier.",
+}
+
+
+class _PendingFile:
+    def __init__(self, client, name, kind, profile):
+        self.client = client
+        self.name = name
+        self.kind = kind
+        self.future = Future()
+        self.interval = profile['initial']
+        self.max_interval = profile['max_interval']
+        self.deadline = time.monotonic() + profile['timeout']
+        self.started = time.monotonic()
+        self.polls = 0
+
+
+class FilePoller:
+    """Thread unique qui surveille les fichiers Gemini jusqu'à ACTIVE / FAILED / timeout"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._heap = []  # (prochaine vérification, compteur, _PendingFile)
+        self._sequence = itertools.count()
+        self._thread = None
+        self._pid = None
+        self._counters = {'watched': 0, 'polls': 0, 'active': 0, 'failed': 0, 'timeouts': 0}
+
+    def _profile(self, kind):
+        profile = dict(POLL_PROFILES.get(kind, POLL_PROFILES['document']))
+        timeouts = getattr(settings, 'GEMINI_FILE_PROCESSING_TIMEOUTS', {})
+        if kind in timeouts:
+            profile['timeout'] = timeouts[kind]
+        return profile
+
+    def _ensure_thread(self):
+        # Appelé sous self._lock; redémarre le thread après un fork
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        if self._pid != os.getpid():
+            self._heap = []
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="gemini-file-poller", daemon=True)
+        self._thread.start()
+
+    def watch(self, client, file, kind='document'):
+        """Renvoie un Future résolu avec le fichier ACTIVE (ou une exception si échec / timeout)"""
+        pending = _PendingFile(client, file.name, kind, self._profile(kind))
+        with self._lock:
+            self._counters['watched'] += 1
+        if not self._resolve(pending, file):
+            with self._lock:
+                self._ensure_thread()
+                heapq.heappush(self._heap, (time.monotonic() + pending.interval, next(self._sequence), pending))
+                self._wakeup.notify()
+        return pending.future
+
+    def wait(self, client, file, kind='document'):
+        """Version bloquante de watch"""
+        return self.watch(client, file, kind).result()
+
+    def _resolve(self, pending, file):
+        """Résout le Future si le fichier a quitté l'état PROCESSING; renvoie True si terminé"""
+        state = file.state.name if file.state else "ACTIVE"
+        if state == "PROCESSING":
+            return False
+
+        elapsed = time.monotonic() - pending.started
+        print(f"DEBUG: File {pending.name} is {state} after {elapsed:.1f}s ({pending.polls} polls)")
+        with self._lock:
+            if state == "FAILED":
+                self._counters['failed'] += 1
+            else:
+                self._counters['active'] += 1
+        if state == "FAILED":
+            pending.future.set_exception(ValueError(FAILED_MESSAGES.get(pending.kind, FAILED_MESSAGES['document'])))
+        else:
+            if state != "ACTIVE":
+                print(f"DEBUG: Warning - Unexpected state: {state}")
+            pending.future.set_result(file)
+        return True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._heap:
+                    self._wakeup.wait()
+                due, _, pending = self._heap[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._wakeup.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+
+            try:
+                self._poll(pending)
+            except Exception:
+                logger.exception("File poller error for %s", pending.name)
+
+    def _poll(self, pending):
+        pending.polls += 1
+        with self._lock:
+            self._counters['polls'] += 1
+        try:
+            file = pending.client.files.get(name=pending.name)
+            if self._resolve(pending, file):
+                return
+        except Exception as e:
+            # Erreur réseau passagère: on réessaie au prochain intervalle
+            print(f"DEBUG: files.get failed for {pending.name}: {e}")
+
+        if time.monotonic() >= pending.deadline:
+            print(f"DEBUG: ❌ Processing timeout for {pending.name}")
+            with self._lock:
+                self._counters['timeouts'] += 1
+            pending.future.set_exception(TimeoutError(TIMEOUT_MESSAGES.get(pending.kind, TIMEOUT_MESSAGES['document'])))
+            return
+
+        pending.interval = min(pending.interval * BACKOFF_FACTOR, pending.max_interval)
+        next_check = min(time.monotonic() + pending.interval, pending.deadline)
+        with self._lock:
+            heapq.heappush(self._heap, (next_check, next(self._sequence), pending))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, pending=len(self._heap))
+
+
+# Instance singleton du poller
+file_poller = FilePoller()
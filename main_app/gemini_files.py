@@ -0,0 +1,160 @@
+"""
+Registre des fichiers uploadés sur l'API Gemini Files
+Associe le hash du contenu local au fichier distant (nom, état, expiration) pour
+éviter de ré-uploader les mêmes octets à chaque analyse ou nouvelle tentative.
+Le chat n'envoie pas le média (il travaille sur l'analyse): le registre ne sert qu'aux analyses.
+Un fichier est rattaché aux uploads qui ont le même content_hash.
+"""
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from datetime import timedelta
+import asyncio
+import threading
+
+from .models import GeminiFile, UploadedContent
+from .file_poller import file_poller
+from .lazy_imports import lazy_module
+
+types = lazy_module('google.genai.types')
+
+
+class GeminiFileRegistry:
+    """Réutilise les fichiers Gemini encore actifs et nettoie ceux qui ne servent plus"""
+
+    def __init__(self, reuse_margin=None, idle_ttl=None):
+        # Un fichier qui expire dans moins de reuse_margin est ré-uploadé (analyse + chat à venir)
+        self.reuse_margin = reuse_margin or getattr(settings, 'GEMINI_FILE_REUSE_MARGIN_SECONDS', 3600)
+        self.idle_ttl = idle_ttl or getattr(settings, 'GEMINI_FILE_IDLE_TTL_SECONDS', 24 * 3600)
+        self._lock = threading.Lock()
+        self._counters = {'reused': 0, 'uploaded': 0, 'deleted': 0}
+
+    def _incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def lookup(self, content_hash):
+        """Entrée du registre encore utilisable pour ce contenu, ou None"""
+        if not content_hash:
+            return None
+        deadline = timezone.now() + timedelta(seconds=self.reuse_margin)
+        return GeminiFile.objects.filter(
+            content_hash=content_hash,
+            state='ACTIVE'
+        ).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=deadline)).first()
+
+    def as_file(self, entry):
+        """Référence types.File utilisable directement dans contents=[...]"""
+        return types.File(
+            name=entry.name,
+            uri=entry.uri,
+            mime_type=entry.mime_type,
+            state=types.FileState.ACTIVE
+        )
+
+    def _record(self, content_hash, remote):
+        entry, _ = GeminiFile.objects.update_or_create(
+            content_hash=content_hash,
+            defaults={
+                'name': remote.name,
+                'uri': remote.uri or '',
+                'mime_type': remote.mime_type or '',
+                'state': remote.state.name if remote.state else 'ACTIVE',
+                'size_bytes': remote.size_bytes or 0,
+                'expires_at': remote.expiration_time,
+                'last_used_at': timezone.now(),
+            }
+        )
+        return entry
+
+    def _reuse(self, content_hash):
+        entry = self.lookup(content_hash)
+        if entry is None:
+            return None
+        print(f"DEBUG: ♻️ Reusing Gemini file {entry.name} for {content_hash[:12]}")
+        GeminiFile.objects.filter(pk=entry.pk).update(last_used_at=timezone.now())
+        self._incr('reused')
+        return self.as_file(entry)
+
+    def get_or_upload(self, client, path, content_hash, kind='document'):
+        """
+        Fichier Gemini ACTIVE pour ce contenu: réutilisé si le registre en connaît un
+        valide, sinon uploadé puis attendu via le poller partagé.
+        """
+        reused = self._reuse(content_hash)
+        if reused is not None:
+            return reused
+
+        print(f"DEBUG: SDK Uploading {kind} from {path}...")
+        remote = client.files.upload(file=path)
+        self._incr('uploaded')
+        if content_hash:
+            self._record(content_hash, remote)
+
+        remote = file_poller.wait(client, remote, kind)
+        if content_hash:
+            self._record(content_hash, remote)
+        return remote
+
+    async def aget_or_upload(self, client, path, content_hash, kind='document'):
+        """Version asynchrone de get_or_upload (upload via client.aio, attente sur le Future du poller)"""
+        reused = await sync_to_async(self._reuse)(content_hash)
+        if reused is not None:
+            return reused
+
+        print(f"DEBUG: SDK (async) Uploading {kind} from {path}...")
+        remote = await client.aio.files.upload(file=path)
+        self._incr('uploaded')
+        if content_hash:
+            await sync_to_async(self._record)(content_hash, remote)
+
+        remote = await asyncio.wrap_future(file_poller.watch(client, remote, kind))
+        if content_hash:
+            await sync_to_async(self._record)(content_hash, remote)
+        return remote
+
+    def cleanup(self, client, dry_run=False):
+        """
+        Supprime les entrées expirées (déjà effacées côté Google) et les fichiers distants
+        qui ne sont plus rattachés à aucun upload ou inutilisés depuis idle_ttl.
+        """
+        now = timezone.now()
+        expired = GeminiFile.objects.filter(expires_at__lte=now)
+        # Un fichier sans upload rattaché peut être en cours d'analyse: délai de grâce avant suppression
+        grace = now - timedelta(seconds=self.reuse_margin)
+        attached = UploadedContent.objects.filter(content_hash=OuterRef('content_hash'))
+        unused = GeminiFile.objects.filter(expires_at__gt=now).filter(
+            Q(~Exists(attached), last_used_at__lt=grace) |
+            Q(last_used_at__lt=now - timedelta(seconds=self.idle_ttl))
+        )
+
+        report = {'expired': expired.count(), 'deleted': 0, 'errors': 0}
+        if dry_run:
+            report['deleted'] = unused.count()
+            return report
+
+        expired.delete()
+        for entry in list(unused):
+            try:
+                client.files.delete(name=entry.name)
+            except Exception as e:
+                # Déjà supprimé côté Google: seule l'entrée locale reste à effacer
+                if '404' not in str(e) and 'NOT_FOUND' not in str(e):
+                    print(f"DEBUG: Could not delete Gemini file {entry.name}: {e}")
+                    report['errors'] += 1
+                    continue
+            entry.delete()
+            report['deleted'] += 1
+        self._incr('deleted', report['deleted'])
+        return report
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters['entries'] = GeminiFile.objects.count()
+        return counters
+
+
+# Instance singleton du registre
+gemini_file_registry = GeminiFileRegistry()
@@ -0,0 +1,375 @@
+"""
+Résilience des appels Gemini
+- Nouvelles tentatives (tenacity) avec backoff exponentiel aléatoire, en respectant les délais
+  indiqués par l'API (en-tête Retry-After ou RetryInfo), dans un budget propre à chaque opération
+- Disjoncteur par modèle: après une série d'erreurs serveur, les appels échouent immédiatement
+  (503) pour que les vues basculent sur leur failover, puis un appel test referme le circuit
+- Requêtes doublées (hedging, optionnel) pour les tours de chat: si la réponse tarde au-delà
+  du p95 observé, un second appel identique est lancé et le premier qui répond l'emporte
+"""
+from django.conf import settings
+from django.db import close_old_connections
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
+import asyncio
+import re
+import threading
+import time
+
+from .gemini_scheduler import gemini_scheduler, cancellable
+from .lazy_imports import lazy_module
+
+errors = lazy_module('google.genai.errors')
+tenacity = lazy_module('tenacity')
+httpx = lazy_module('httpx')
+
+# Budget de nouvelles tentatives par opération (mêmes noms que les priorités de gemini_scheduler)
+DEFAULT_RETRY_POLICIES = {
+    'interactive': {'attempts': 3, 'budget_seconds': 12, 'base': 0.5, 'max_wait': 4},
+    'analysis': {'attempts': 4, 'budget_seconds': 90, 'base': 2, 'max_wait': 30},
+    'bulk': {'attempts': 5, 'budget_seconds': 180, 'base': 2, 'max_wait': 60},
+}
+RETRYABLE_CODES = (429, 500, 502, 503, 504)
+UNHEALTHY_CODES = (500, 502, 503, 504)  # 429 = quota, pas une panne: ne déclenche pas le disjoncteur
+RETRY_DELAY = re.compile(r"^([0-9.]+)s$")
+
+
+class CircuitOpenError(Exception):
+    """Le modèle est considéré indisponible: l'appel n'est pas tenté"""
+    def __init__(self, model, retry_in):
+        super().__init__(f"503 UNAVAILABLE: Gemini circuit open for {model} (retry in {retry_in:.0f}s)")
+
+
+def is_retryable(exc):
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_CODES
+    return isinstance(exc, (httpx.TransportError, httpx.TimeoutException))
+
+
+def is_unhealthy(exc):
+    if isinstance(exc, errors.APIError):
+        return exc.code in UNHEALTHY_CODES
+    return isinstance(exc, (httpx.TransportError, httpx.TimeoutException))
+
+
+def retry_after(exc):
+    """Délai (secondes) demandé par l'API: en-tête Retry-After, sinon RetryInfo.retryDelay"""
+    response = getattr(exc, 'response', None)
+    header = response.headers.get('retry-after') if getattr(response, 'headers', None) is not None else None
+    if header:
+        try:
+            return max(float(header), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(header).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+
+    details = getattr(exc, 'details', None)
+    error = details.get('error', details) if isinstance(details, dict) else {}
+    for detail in error.get('details', []) if isinstance(error, dict) else []:
+        match = RETRY_DELAY.match(str(detail.get('retryDelay', ''))) if isinstance(detail, dict) else None
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class _RetryWait:
+    """Backoff exponentiel avec jitter complet, allongé jusqu'au délai demandé par l'API"""
+
+    def __init__(self, base, max_wait):
+        self.jitter = tenacity.wait_random_exponential(multiplier=base, max=max_wait)
+
+    def __call__(self, retry_state):
+        delay = self.jitter(retry_state)
+        hint = retry_after(retry_state.outcome.exception())
+        return max(delay, hint) if hint is not None else delay
+
+
+class CircuitBreaker:
+    """closed -> open (après N erreurs serveur consécutives) -> half_open (un appel test) -> closed"""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened_count = 0
+        self.short_circuited = 0
+
+    def before_call(self, model):
+        if self.state == 'closed':
+            return
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        if self.state == 'open' and remaining <= 0:
+            self.state = 'half_open'
+        if self.state == 'half_open' and not self.probing:
+            self.probing = True  # Un seul appel test à la fois
+            return
+        self.short_circuited += 1
+        raise CircuitOpenError(model, max(remaining, 0))
+
+    def record_success(self):
+        self.state = 'closed'
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == 'half_open' or self.failures >= self.threshold:
+            if self.state != 'open':
+                self.opened_count += 1
+                print(f"DEBUG: ⚠️ Gemini circuit opened after {self.failures} failures")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opened': self.opened_count,
+            'short_circuited': self.short_circuited,
+        }
+
+
+class LatencyTracker:
+    """Dernières durées d'un type d'appel, pour le p95 utilisé par le hedging"""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def p95(self):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class GeminiResilience:
+    """Politique de nouvelles tentatives, disjoncteurs et hedging partagés par GeminiService"""
+
+    def __init__(self):
+        self.policies = dict(DEFAULT_RETRY_POLICIES, **getattr(settings, 'GEMINI_RETRY_POLICIES', {}))
+        self.breaker_threshold = getattr(settings, 'GEMINI_BREAKER_FAILURE_THRESHOLD', 5)
+        self.breaker_cooldown = getattr(settings, 'GEMINI_BREAKER_COOLDOWN_SECONDS', 30)
+        self.hedge_enabled = getattr(settings, 'GEMINI_HEDGE_ENABLED', False)
+        self.hedge_min_delay = getattr(settings, 'GEMINI_HEDGE_MIN_DELAY', 2.0)
+        self.hedge_min_samples = getattr(settings, 'GEMINI_HEDGE_MIN_SAMPLES', 20)
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._latency = {}
+        self._executor = None
+        self._counters = {'calls': 0, 'retries': 0, 'failures': 0, 'hedged': 0, 'hedge_wins': 0}
+
+    def _incr(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _breaker(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+            return self._breakers[model]
+
+    def _tracker(self, operation):
+        with self._lock:
+            return self._latency.setdefault(operation, LatencyTracker())
+
+    def _retry_kwargs(self, operation):
+        policy = self.policies.get(operation, self.policies['analysis'])
+
+        def log_retry(retry_state):
+            self._incr('retries')
+            print(f"DEBUG: Gemini {operation} call failed ({retry_state.outcome.exception()}), "
+                  f"retrying in {retry_state.upcoming_sleep:.1f}s (attempt {retry_state.attempt_number})")
+
+        return {
+            'retry': tenacity.retry_if_exception(is_retryable),
+            'stop': tenacity.stop_after_attempt(policy['attempts']) | tenacity.stop_before_delay(policy['budget_seconds']),
+            'wait': _RetryWait(policy['base'], policy['max_wait']),
+            'before_sleep': log_retry,
+            'reraise': True,
+        }
+
+    def _before(self, model):
+        breaker = self._breaker(model)
+        with self._lock:
+            breaker.before_call(model)
+
+    def _after(self, model, exc=None):
+        breaker = self._breaker(model)
+        with self._lock:
+            if exc is None or (isinstance(exc, errors.APIError) and not is_unhealthy(exc)):
+                breaker.record_success()  # L'API répond (éventuellement par une erreur client ou un 429)
+            elif is_unhealthy(exc):
+                breaker.record_failure()
+            else:
+                breaker.probing = False  # Erreur locale (file d'attente...): le test sera refait
+
+    def circuit_state(self, model):
+        """État du disjoncteur du modèle (closed | open | half_open), consulté par model_router"""
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                return 'closed'
+            if breaker.state == 'open' and time.monotonic() >= breaker.opened_at + breaker.cooldown:
+                return 'half_open'
+            return breaker.state
+
+    def call(self, operation, model, fn, track=True):
+        """
+        Exécute fn() avec disjoncteur et nouvelles tentatives selon la politique de l'opération.
+        track: la durée alimente le p95 de l'opération (utilisé par le hedging)
+        """
+        self._incr('calls')
+        started = time.monotonic()
+        try:
+            for attempt in tenacity.Retrying(**self._retry_kwargs(operation)):
+                with attempt:
+                    self._before(model)
+                    try:
+                        result = fn()
+                    except Exception as e:
+                        self._after(model, e)
+                        raise
+                    self._after(model)
+        except Exception:
+            self._incr('failures')
+            raise
+        if track:
+            self._tracker(operation).add(time.monotonic() - started)
+        return result
+
+    async def acall(self, operation, model, fn, track=True):
+        """Version asynchrone de call (fn renvoie une coroutine)"""
+        self._incr('calls')
+        started = time.monotonic()
+        try:
+            async for attempt in tenacity.AsyncRetrying(**self._retry_kwargs(operation)):
+                with attempt:
+                    self._before(model)
+                    try:
+                        result = await fn()
+                    except Exception as e:
+                        self._after(model, e)
+                        raise
+                    self._after(model)
+        except Exception:
+            self._incr('failures')
+            raise
+        if track:
+            self._tracker(operation).add(time.monotonic() - started)
+        return result
+
+    # ---- Hedging ----
+
+    def hedge_delay(self, operation='interactive'):
+        """Délai avant la requête doublée (p95 observé), ou None si le hedging ne s'applique pas"""
+        if not self.hedge_enabled:
+            return None
+        tracker = self._tracker(operation)
+        if len(tracker.samples) < self.hedge_min_samples:
+            return None
+        return max(tracker.p95(), self.hedge_min_delay)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'GEMINI_HEDGE_WORKERS', 8), thread_name_prefix="gemini-hedge"
+                )
+            return self._executor
+
+    def hedged(self, fn, operation='interactive'):
+        """
+        fn() une fois, ou deux fois si la première exécution dépasse le p95: le premier succès est renvoyé.
+        fn doit être indépendant (ex: son propre objet chat). Dès qu'un résultat est retenu, le perdant
+        est abandonné: annulé s'il n'a pas démarré, sinon il quitte la file de l'ordonnanceur et ne
+        retente plus (un appel HTTP déjà parti garde son créneau jusqu'à sa réponse, ignorée).
+        """
+        delay = self.hedge_delay(operation)
+        if delay is None:
+            return fn()
+
+        abandon = threading.Event()
+
+        def run():
+            try:
+                with cancellable(abandon):
+                    return fn()
+            finally:
+                close_old_connections()  # Threads du pool: hors du cycle de requête Django
+
+        pool = self._pool()
+        primary = pool.submit(run)
+        done, pending = wait({primary}, timeout=delay)
+        if not done:
+            self._incr('hedged')
+            print(f"DEBUG: Gemini {operation} call slower than p95 ({delay:.1f}s), sending hedged request")
+            pending.add(pool.submit(run))
+
+        try:
+            error = None
+            while True:
+                for future in done:
+                    if future.exception() is None:
+                        if future is not primary:
+                            self._incr('hedge_wins')
+                        return future.result()
+                    error = future.exception()
+                if not pending:
+                    raise error
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        finally:
+            abandon.set()
+            for future in pending:
+                future.cancel()
+            gemini_scheduler.wake()
+
+    async def ahedged(self, fn, operation='interactive'):
+        """Version asynchrone de hedged (fn renvoie une coroutine; le perdant est annulé)"""
+        delay = self.hedge_delay(operation)
+        if delay is None:
+            return await fn()
+
+        primary = asyncio.ensure_future(fn())
+        done, pending = await asyncio.wait({primary}, timeout=delay)
+        if not done:
+            self._incr('hedged')
+            print(f"DEBUG: Gemini {operation} call slower than p95 ({delay:.1f}s), sending hedged request")
+            pending.add(asyncio.ensure_future(fn()))
+        try:
+            error = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._incr('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counters,
+                breakers={model: breaker.stats() for model, breaker in self._breakers.items()},
+                p95_seconds={operation: tracker.p95() for operation, tracker in self._latency.items()},
+                hedge_enabled=self.hedge_enabled,
+            )
+
+
+# Instance singleton de la politique de résilience
+gemini_resilience = GeminiResilience()
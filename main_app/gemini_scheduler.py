@@ -0,0 +1,302 @@
+"""
+Ordonnanceur des appels Gemini
+Budgets par modèle (requêtes et tokens par minute, sur une fenêtre glissante de 60 s comme
+les quotas de l'API), plafond d'appels simultanés et file d'attente par priorité: les tours
+de chat passent avant les analyses, elles-mêmes avant les travaux de fond (exercices, documents).
+Un appel qui ne peut pas partir tout de suite attend son tour au lieu de provoquer un 429.
+
+Les budgets s'appliquent par processus: les répartir entre les workers (ex: quota / nombre de workers).
+"""
+from django.conf import settings
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+from .lazy_imports import lazy_module
+
+types = lazy_module('google.genai.types')
+
+# Ordre de passage (plus petit = prioritaire)
+PRIORITIES = {
+    'interactive': 0,  # Tours de chat, indices, évaluation d'une réponse
+    'analysis': 1,     # Analyse d'un upload (vidéo, image)
+    'bulk': 2,         # Exercices, documents (morceaux compris)
+}
+WINDOW_SECONDS = 60
+
+# Estimations avant l'appel (corrigées ensuite avec usage_metadata)
+IMAGE_TOKEN_ESTIMATE = 1120  # Image en MEDIA_RESOLUTION_HIGH
+FILE_TOKEN_ESTIMATE = 32000  # Fichier Gemini (vidéo/document) de taille inconnue
+
+
+# Signal d'abandon du thread courant (requête doublée perdante, voir gemini_resilience.hedged)
+_local = threading.local()
+
+
+class SlotCancelled(Exception):
+    """L'appel a été abandonné avant d'obtenir un créneau"""
+    def __init__(self, model):
+        super().__init__(f"Gemini call to {model} abandoned while waiting for a slot")
+
+
+@contextmanager
+def cancellable(event):
+    """Dans ce bloc, les attentes de créneau du thread courant s'arrêtent dès que event est levé"""
+    previous = getattr(_local, 'cancel', None)
+    _local.cancel = event
+    try:
+        yield
+    finally:
+        _local.cancel = previous
+
+
+def slot_cancelled():
+    event = getattr(_local, 'cancel', None)
+    return event is not None and event.is_set()
+
+
+class SchedulerTimeout(Exception):
+    """Aucun créneau libéré à temps: traité comme un quota atteint (failover existant)"""
+    def __init__(self, model, waited):
+        super().__init__(f"429 RESOURCE_EXHAUSTED: Gemini scheduler queue timeout for {model} after {waited:.0f}s")
+
+
+def estimate_tokens(contents):
+    """Estimation grossière des tokens d'entrée d'une requête (texte: ~4 caractères par token)"""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents) // 4 + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(item) for item in contents)
+    if isinstance(contents, types.Content):
+        return estimate_tokens(contents.parts or [])
+    if isinstance(contents, types.File):
+        return FILE_TOKEN_ESTIMATE
+    if isinstance(contents, types.Part):
+        if contents.text:
+            return estimate_tokens(contents.text)
+        if contents.inline_data is not None:
+            return IMAGE_TOKEN_ESTIMATE
+        if contents.file_data is not None:
+            return FILE_TOKEN_ESTIMATE
+    return 0
+
+
+def usage_tokens(response):
+    """Tokens réellement consommés (entrée + sortie), si l'API les renvoie"""
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'total_token_count', None) if usage is not None else None
+
+
+class _ModelLane:
+    """État d'un modèle: appels en cours, fenêtre glissante et file d'attente"""
+
+    def __init__(self, rpm, tpm, concurrency):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.concurrency = concurrency
+        self.active = 0
+        self.requests = deque()  # Horodatages des appels de la fenêtre
+        self.tokens = deque()  # [horodatage, tokens] des appels de la fenêtre
+        self.token_total = 0
+        self.waiters = []  # Tas (priorité, ordre d'arrivée)
+        self.counters = {'granted': 0, 'queued': 0, 'timeouts': 0, 'cancelled': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+
+class GeminiScheduler:
+    """Attribue les créneaux d'appel Gemini, par modèle, dans l'ordre des priorités"""
+
+    def __init__(self, max_wait=None, clock=None):
+        self.max_wait = max_wait or getattr(settings, 'GEMINI_SCHEDULER_MAX_WAIT', 120)
+        self._clock = clock or time.monotonic  # Injectable (tests)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._lanes = {}
+        self._order = itertools.count()
+
+    def _lane(self, model):
+        lane = self._lanes.get(model)
+        if lane is None:
+            limits = getattr(settings, 'GEMINI_RATE_LIMITS', {}).get(model, {})
+            lane = self._lanes[model] = _ModelLane(
+                rpm=limits.get('rpm', getattr(settings, 'GEMINI_RPM', 1000)),
+                tpm=limits.get('tpm', getattr(settings, 'GEMINI_TPM', 1000000)),
+                concurrency=limits.get('concurrency', getattr(settings, 'GEMINI_MAX_CONCURRENCY', 16)),
+            )
+        return lane
+
+    def _prune(self, lane, now):
+        horizon = now - WINDOW_SECONDS
+        while lane.requests and lane.requests[0] <= horizon:
+            lane.requests.popleft()
+        while lane.tokens and lane.tokens[0][0] <= horizon:
+            lane.token_total -= lane.tokens.popleft()[1]
+
+    def _delay(self, lane, tokens, now):
+        """Secondes avant de pouvoir partir (0: maintenant, None: attendre la fin d'un appel)"""
+        if lane.active >= lane.concurrency:
+            return None
+        delay = 0.0
+        if lane.rpm and len(lane.requests) >= lane.rpm:
+            delay = max(delay, lane.requests[-lane.rpm] + WINDOW_SECONDS - now)
+        if lane.tpm and lane.tokens and lane.token_total + tokens > lane.tpm:
+            # Attendre que les appels les plus anciens sortent de la fenêtre
+            excess, released = lane.token_total + tokens - lane.tpm, 0
+            for started, spent in lane.tokens:
+                released += spent
+                if released >= excess:
+                    break
+            delay = max(delay, started + WINDOW_SECONDS - now)
+        return delay
+
+    def _attempt(self, lane, entry, tokens):
+        """Sous verrou: ticket si l'entrée (en tête de file) peut partir, sinon délai d'attente"""
+        now = self._clock()
+        self._prune(lane, now)
+        if lane.waiters[0] is not entry:
+            return None, None
+        delay = self._delay(lane, tokens, now)
+        if delay is None or delay > 0:
+            return None, delay
+
+        heapq.heappop(lane.waiters)
+        lane.active += 1
+        lane.requests.append(now)
+        record = [now, tokens]
+        lane.tokens.append(record)
+        lane.token_total += tokens
+        return (lane, record), 0
+
+    def _enqueue(self, lane, priority):
+        entry = (PRIORITIES.get(priority, PRIORITIES['analysis']), next(self._order))
+        heapq.heappush(lane.waiters, entry)
+        return entry
+
+    def _leave(self, lane, entry, queued_at, granted, cancelled=False):
+        waited = self._clock() - queued_at
+        if not granted:
+            lane.waiters.remove(entry)
+            heapq.heapify(lane.waiters)
+            lane.counters['cancelled' if cancelled else 'timeouts'] += 1
+        else:
+            lane.counters['granted'] += 1
+            lane.counters['wait_seconds'] += waited
+            lane.counters['max_wait_seconds'] = max(lane.counters['max_wait_seconds'], waited)
+            if waited > 0.01:
+                lane.counters['queued'] += 1
+        self._cond.notify_all()
+        return waited
+
+    def acquire(self, model, priority='analysis', tokens=0):
+        """Attend un créneau (bloquant) et renvoie un ticket à rendre avec release()"""
+        queued_at = self._clock()
+        deadline = queued_at + self.max_wait
+        with self._cond:
+            lane = self._lane(model)
+            entry = self._enqueue(lane, priority)
+            ticket = None
+            cancelled = False
+            try:
+                while True:
+                    if slot_cancelled():
+                        cancelled = True
+                        raise SlotCancelled(model)
+                    ticket, delay = self._attempt(lane, entry, tokens)
+                    if ticket is not None:
+                        return ticket
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        raise SchedulerTimeout(model, self.max_wait)
+                    self._cond.wait(remaining if delay is None else min(delay, remaining))
+            finally:
+                self._leave(lane, entry, queued_at, ticket is not None, cancelled)
+
+    async def aacquire(self, model, priority='analysis', tokens=0):
+        """Version asynchrone de acquire (la boucle n'est jamais bloquée; annulable)"""
+        queued_at = self._clock()
+        deadline = queued_at + self.max_wait
+        with self._lock:
+            lane = self._lane(model)
+            entry = self._enqueue(lane, priority)
+        ticket = None
+        try:
+            while True:
+                with self._lock:
+                    ticket, delay = self._attempt(lane, entry, tokens)
+                if ticket is not None:
+                    return ticket
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    raise SchedulerTimeout(model, self.max_wait)
+                # Pas de notification côté asyncio: on revérifie régulièrement
+                await asyncio.sleep(min(delay or 0.05, remaining, 0.5))
+        finally:
+            with self._lock:
+                self._leave(lane, entry, queued_at, ticket is not None)
+
+    def wake(self):
+        """Réveille les appels en attente (ex: pour qu'un appel abandonné quitte la file)"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self, ticket, tokens=None):
+        """Rend le créneau; tokens (consommation réelle) corrige l'estimation dans la fenêtre"""
+        lane, record = ticket
+        with self._cond:
+            lane.active -= 1
+            if tokens is not None and record[0] > self._clock() - WINDOW_SECONDS:
+                lane.token_total += tokens - record[1]
+                record[1] = tokens
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, model, priority='analysis', tokens=0):
+        """with scheduler.slot(...) as usage: ... usage['tokens'] = consommation réelle"""
+        ticket = self.acquire(model, priority, tokens)
+        usage = {'tokens': None}
+        try:
+            yield usage
+        finally:
+            self.release(ticket, usage['tokens'])
+
+    @asynccontextmanager
+    async def aslot(self, model, priority='analysis', tokens=0):
+        ticket = await self.aacquire(model, priority, tokens)
+        usage = {'tokens': None}
+        try:
+            yield usage
+        finally:
+            self.release(ticket, usage['tokens'])
+
+    def queue_depth(self, model):
+        """Appels en attente d'un créneau pour ce modèle"""
+        with self._lock:
+            lane = self._lanes.get(model)
+            return len(lane.waiters) if lane else 0
+
+    def stats(self):
+        with self._lock:
+            now = self._clock()
+            result = {}
+            for model, lane in self._lanes.items():
+                self._prune(lane, now)
+                result[model] = dict(
+                    lane.counters,
+                    active=lane.active,
+                    waiting=len(lane.waiters),
+                    requests_last_minute=len(lane.requests),
+                    tokens_last_minute=lane.token_total,
+                    rpm=lane.rpm,
+                    tpm=lane.tpm,
+                    concurrency=lane.concurrency,
+                )
+            return result
+
+
+# Instance singleton de l'ordonnanceur
+gemini_scheduler = GeminiScheduler()
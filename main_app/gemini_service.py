@@ -2,33 +2,106 @@
 Service d'intégration avec l'API Gemini 3 (SDK v1.0+)
 Gère toutes les interactions avec le modèle d'IA
 """
-from google import genai
-from google.genai import types
 from django.conf import settings
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 import json
 import base64
-from PIL import Image
 import io
 import os
+import threading
+import time
+
+from .chat_store import chat_store, ChatStateConflict
+from .context_cache import context_cache
+from .gemini_files import gemini_file_registry
+from .image_preprocessing import image_preprocessor
+from .video_keyframes import keyframe_extractor
+from .gemini_scheduler import gemini_scheduler, estimate_tokens, usage_tokens
+from .gemini_resilience import gemini_resilience
+from .model_router import model_router, route_for, adapt_config
+from .gemini_transport import http_options
+from .analysis_stages import analysis_stages, stage_prompt, stage_fields
+from .document_chunking import plan_chunks, cleanup_chunks, chunk_prompt, reduce_prompt, merge_chunk_analyses
+from .lazy_imports import lazy_module
+
+genai = lazy_module('google.genai')
+types = lazy_module('google.genai.types')
+
+# Tours simultanés de la même session: nombre d'essais d'enregistrement avant d'abandonner
+CHAT_SAVE_ATTEMPTS = 3
 
 class GeminiService:
-    """Service principal pour interagir avec Gemini 3 (Nouveau SDK)"""
+    """Service principal pour interagir avec Gemini 3 (Nouveau SDK)
+    
+    Chaque méthode existe en version bloquante et en version asynchrone
+    (préfixe "a", ex: aanalyze_video) basée sur client.aio, pour les vues ASGI.
+    Le modèle de chaque appel est choisi par model_router (paliers par route);
+    model_name est le modèle nominal, utilisé quand aucun modèle n'est imposé.
+    """
     
     def __init__(self, model_name="gemini-3-flash-preview"):
         """
-        Initialise le client Gemini
+        Initialise le service; le client Gemini est créé à la première utilisation (voir client)
         """
         self.api_key = settings.GOOGLE_API_KEY
         self.model_name = model_name
-        self.client = None
         self.chat = None
-        self._active_chats = {}  # Pour gérer plusieurs sessions
-        
-        if self.api_key:
+        self._client = None
+        self._client_pid = None
+        self._client_lock = threading.Lock()
+
+    def _create_client(self):
+        if not self.api_key:
+            return None
+        try:
+            return genai.Client(api_key=self.api_key, http_options=http_options())
+        except Exception as e:
+            print(f"Error initializing Gemini client: {e}")
+            return None
+
+    @property
+    def client(self):
+        """
+        Client Gemini du processus courant (pool de connexions: voir gemini_transport).
+        Créé à la première utilisation, et recréé après un fork (workers gunicorn):
+        les connexions héritées du processus parent ne sont jamais réutilisées.
+        """
+        if self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client_pid != os.getpid():
+                    self._client = self._create_client()
+                    self._client_pid = os.getpid()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        """Client fourni de l'extérieur (ex: outils, tests) pour le processus courant"""
+        self._client = value
+        self._client_pid = os.getpid()
+
+    def warm_up(self, background=True):
+        """
+        Ouvre les connexions HTTP (DNS, TLS) du processus avant la première requête
+        utilisateur, par un appel léger (métadonnées du modèle, sans tokens).
+        Seul le client synchrone est préchauffé: le pool de client.aio dépend de la boucle asyncio.
+        """
+        if not self.api_key:
+            return
+
+        def run():
+            started = time.monotonic()
             try:
-                self.client = genai.Client(api_key=self.api_key)
+                self.client.models.get(model=self.model_name)
+                print(f"DEBUG: 🔥 Gemini client warmed up in {time.monotonic() - started:.2f}s (pid {os.getpid()})")
             except Exception as e:
-                print(f"Error initializing Gemini client: {e}")
+                print(f"DEBUG: Gemini warm-up failed: {e}")
+
+        if background:
+            threading.Thread(target=run, name="gemini-warmup", daemon=True).start()
+        else:
+            run()
     
     def _check_config(self):
         """Vérifie si le service est prêt"""
@@ -44,7 +117,372 @@ class GeminiService:
             }
         return None
 
-    def analyze_video(self, video_file, context="", speed_mode=False):
+    # ============================================
+    # PROMPTS ET CONFIGURATIONS (partagés sync/async)
+    # ============================================
+
+    def _analysis_config(self, speed_mode=False):
+        """Configuration adaptée selon le mode (rapide ou qualité)"""
+        if speed_mode:
+            # Mode rapide : ~40% plus rapide, qualité légèrement réduite
+            return types.GenerateContentConfig(
+                response_mime_type="application/json",
+                temperature=0.7,
+                media_resolution="MEDIA_RESOLUTION_MEDIUM"
+            )
+        # Mode qualité : Analyse profonde avec HIGH thinking
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            temperature=0.85,
+            thinking_config=types.ThinkingConfig(thinking_level="HIGH"),
+            media_resolution="MEDIA_RESOLUTION_HIGH"
+        )
+
+    def _video_prompt(self, context=""):
+        return f"""
+        Analyse cette vidéo en profondeur. {context}
+        
+        Fournis une réponse structurée en JSON avec:
+        1. "summary": Un résumé complet du contenu
+        2. "key_concepts": Liste des concepts principaux abordés
+        3. "difficulty_level": Niveau estimé (beginner/intermediate/advanced)
+        4. "timestamps": Moments clés avec description
+        5. "interactive_questions": 5-7 questions à poser pendant le visionnage
+           Format: [{{"timestamp": "MM:SS", "question": "...", "hint": "...", "answer": "..."}}]
+        6. "prerequisites": Connaissances préalables recommandées
+        
+        IMPORTANT: Utilise TOUJOURS le format LaTeX pour les équations mathématiques ($...$ pour en ligne, $$...$$ pour bloc).
+        Réponds uniquement par le JSON.
+        """
+
+    def _image_problem_prompt(self, subject_hint=""):
+        return f"""
+        Tu es un tuteur expert utilisant la méthode socratique.
+        Analyse ce problème {subject_hint} et fournis une réponse JSON avec:
+        
+        1. "problem_type": Type de problème identifié
+        2. "difficulty": Niveau de difficulté (1-10)
+        3. "concepts_needed": Liste des concepts requis
+        4. "solution_steps": Liste d'étapes (sans révéler la solution complète)
+           Format: [{{"step": 1, "hint": "...", "question": "...", "concepts": [...]}}]
+        5. "final_answer": La solution complète (sera cachée initialement)
+        6. "similar_problems": 3 problèmes similaires pour pratiquer
+        
+        IMPORTANT: Guide l'étudiant, ne donne pas directement la réponse! 
+        Utilise TOUJOURS le format LaTeX pour les équations mathématiques ($...$ pour en ligne, $$...$$ pour bloc).
+        Réponds uniquement par le JSON.
+        """
+
+    def _document_prompt(self, focus_areas=""):
+        return f"""
+        Analyse ce document (PDF, Word, texte, Markdown, etc.) de manière approfondie et multimodale.
+        {f"Focus spécifique sur: {focus_areas}" if focus_areas else ""}
+        
+        Fournis une réponse JSON structurée avec:
+        1. "document_type": Type de document détecté (académique, technique, cours, article...)
+        2. "summary": Résumé exécutif complet du contenu
+        3. "main_topics": Liste des sujets principaux identifiés
+        4. "concept_map": Carte conceptuelle interactive
+           - "nodes": [{{"id": "unique_id", "label": "Concept", "level": 1-3, "description": "...", "category": "..."}}]
+           - "edges": [{{"from": "id1", "to": "id2", "relationship": "prérequis/compose/illustre/..."}}]
+        5. "key_definitions": Dictionnaire des termes techniques importants {{term: definition}}
+        6. "quiz_questions": 10 questions adaptatives de niveaux progressifs
+           Format: [{{"level": "easy/medium/hard", "question": "...", "options": [...], "correct": 0, "explanation": "..."}}]
+        7. "analogies": Analogies concrètes pour simplifier les concepts abstraits
+        8. "visual_elements": Description des diagrammes/images intégrés (si présents)
+        9. "further_reading": Suggestions de lectures complémentaires
+        10. "prerequisites": Connaissances préalables recommandées
+        
+        IMPORTANT: 
+        - Utilise TOUJOURS le format LaTeX pour les équations mathématiques ($...$ pour en ligne, $$...$$ pour bloc).
+        - Conserve la structure hiérarchique du document original.
+        - Si le document contient des images/diagrammes, décris leur contenu et leur relation avec le texte.
+        
+        Réponds uniquement par le JSON valide.
+        """
+
+    def _creative_prompt(self, creative_goal=""):
+        return f"""
+        Tu es un mentor créatif expert en design, architecture, et arts visuels.
+        Analyse cette création/esquisse. {creative_goal}
+        
+        Fournis une réponse JSON avec:
+        1. "analysis": Analyse détaillée de ce qui est présenté
+        2. "strengths": Points forts du design (3-5 éléments)
+        3. "improvements": Suggestions d'amélioration (5-7 éléments)
+           Format: [{{"aspect": "...", "suggestion": "...", "why": "...", "priority": "high/medium/low"}}]
+        4. "design_principles": Principes de design applicables
+        5. "variations": 3 variations/alternatives à explorer
+        6. "technique_tips": Conseils techniques spécifiques
+        7. "inspiration": Références/artistes similaires
+        8. "next_steps": Plan d'action pour développer le projet
+        
+        Réponds uniquement par le JSON.
+        """
+
+    def _chat_system_instruction(self, context, user_level="intermediate"):
+        """Instruction système du tuteur (contexte de session inclus)"""
+        return f"""
+        Tu es Kachele NeuralSync AI, le tuteur adaptatif multimodal d'élite.
+        
+        TES CAPACITÉS MULTIMODALES NATIVES :
+        1. 📹 APPRENTISSAGE VIDÉO INTERACTIF : Tu identifies les moments clés dans les vidéos éducatives pour poser des questions stimulantes et vérifier la compréhension en temps réel.
+        2. 🖼️ RÉSOLUTION VISUELLE SOCRATIQUE : Tu analyses des photos de problèmes (mathématiques, physique, schémas techniques) et guides l'utilisateur étape par étape sans donner la solution.
+        3. 📚 INTELLIGENCE DOCUMENTAIRE UNIVERSELLE : Tu traites TOUS types de documents (PDF, Word, Markdown, texte, HTML, EPUB...) pour créer des cartes conceptuelles interactives, identifier les concepts clés et générer des quiz adaptatifs.
+        4. 🎨 ATELIER CRÉATIF : Tu agis comme un mentor expert pour perfectionner les travaux créatifs (design, architecture, code, art visuel) avec des critiques constructives et des suggestions concrètes.
+
+        TES 4 PILIERS FONDAMENTAUX :
+        1. 💬 DIALOGUE SOCRATIQUE : 
+           - Ne donne JAMAIS la réponse finale, un code complet ou une solution d'équation directe.
+           - Guide l'utilisateur par des questions ciblées qui provoquent le "déclic".
+           - Si l'utilisateur stagne, fournis un indice (hint) ou une analogie, mais jamais le résultat complet.
+        
+        2. 🧠 SUIVI COGNITIF (Cognitive Tracking) : 
+           - Analyse chaque réponse pour identifier les lacunes de connaissances (knowledge gaps).
+           - Ajuste dynamiquement la difficulté de tes questions selon la charge cognitive apparente.
+           - Détecte quand l'utilisateur maîtrise un concept pour passer au suivant.
+        
+        3. 🔍 ANALYSE MULTIMODALE PROFONDE : 
+           - Tu comprends simultanément vidéo, images, texte structuré (dans TOUS formats de documents) et code.
+           - Utilise les détails visuels, temporels ou structurels du contenu analysé pour ancrer tes explications.
+           - Si un document contient des diagrammes ou équations, réfère-toi explicitement à eux.
+        
+        4. ⚡ PRATIQUE GÉNÉRATIVE : 
+           - Génère de nouveaux problèmes uniques adaptés au niveau actuel de l'utilisateur.
+           - Ne recycle jamais les mêmes exercices : chaque problème doit tester la compréhension profonde.
+           - Propose des variations progressives pour consolider la maîtrise.
+
+        FORMAT ET STYLE :
+        - Langue : Détecte automatiquement la langue de l'utilisateur et réponds dans CETTE langue (français, anglais, espagnol, etc.). Ton naturel, expert mais encourageant et bienveillant.
+        - Mathématiques/Sciences : Utilise EXCLUSIVEMENT le format LaTeX ($...$ pour en ligne, $$...$$ pour les blocs).
+        - Exemple : "La dérivée de $x^n$ est $\\frac{{d}}{{dx}} x^n = nx^{{n-1}}$."
+        - Code : Utilise des blocs de code Markdown avec coloration syntaxique appropriée.
+
+        CONTEXTE DE SESSION : 
+        {context}
+        
+        NIVEAU DE L'APPRENANT : 
+        {user_level}
+        
+        RAPPEL : Tu n'es pas un simple assistant, mais un MENTOR SOCRATIQUE qui fait ÉMERGER la compréhension plutôt que de la transmettre passivement.
+        """
+
+    def _chat_config(self, system_instruction, cached_content=None):
+        """
+        Configuration de chat: l'instruction système est soit référencée via le cache
+        de contexte Gemini (cached_content), soit envoyée en clair à chaque tour.
+        """
+        if cached_content:
+            instruction = {"cached_content": cached_content}
+        else:
+            instruction = {"system_instruction": system_instruction}
+        
+        # Configuration avancée basée sur Google AI Studio
+        return types.GenerateContentConfig(
+            temperature=0.85,
+            thinking_config=types.ThinkingConfig(
+                thinking_level="HIGH",
+            ),
+            media_resolution="MEDIA_RESOLUTION_HIGH",
+            **instruction
+        )
+
+    def _evaluation_prompt(self, question, user_answer, correct_answer, context=""):
+        return f"""
+        Évalue cette réponse d'étudiant avec bienveillance et pédagogie.
+        {context}
+        
+        Question: {question}
+        Réponse de l'étudiant: {user_answer}
+        Réponse attendue: {correct_answer}
+        
+        Fournis une réponse JSON, incluant pourcentage, feedback, what_was_good, what_to_improve.
+        """
+
+    def _practice_prompt(self, topic, difficulty, count=5):
+        return f"""
+        Génère {count} problèmes de pratique sur: {topic}
+        Niveau de difficulté: {difficulty}
+        Format JSON requis: list under key "problems".
+        """
+
+    def _remote_file(self, local_file, kind):
+        """
+        Fichier Gemini ACTIVE pour local_file (objet avec .path et éventuellement .content_hash):
+        réutilisé depuis le registre si ces octets ont déjà été uploadés, sinon uploadé.
+        """
+        return gemini_file_registry.get_or_upload(
+            self.client, local_file.path, getattr(local_file, 'content_hash', ''), kind
+        )
+
+    async def _aremote_file(self, local_file, kind):
+        """Version asynchrone de _remote_file"""
+        return await gemini_file_registry.aget_or_upload(
+            self.client, local_file.path, getattr(local_file, 'content_hash', ''), kind
+        )
+
+    # ---- Appels Gemini via l'ordonnanceur (budgets RPM/TPM, concurrence, priorité) ----
+
+    def _generate(self, contents, config=None, priority='analysis', route=None, meta=None):
+        """
+        generate_content une fois un créneau obtenu auprès de gemini_scheduler, avec les
+        nouvelles tentatives et le disjoncteur de gemini_resilience (chaque tentative reprend un créneau)
+        
+        Le modèle est choisi par model_router selon la route (par défaut celle de la priorité);
+        meta (dict optionnel) reçoit le modèle utilisé ('model').
+        """
+        route = route or route_for(priority)
+        model = model_router.pick(route)
+        if meta is not None:
+            meta['model'] = model
+        config = adapt_config(config, model)
+
+        def attempt():
+            with gemini_scheduler.slot(model, priority, estimate_tokens(contents)) as usage:
+                response = self.client.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+                usage['tokens'] = usage_tokens(response)
+            return response
+
+        with model_router.measure(route, model):
+            return gemini_resilience.call(priority, model, attempt)
+
+    async def _agenerate(self, contents, config=None, priority='analysis', route=None, meta=None):
+        """Version asynchrone de _generate"""
+        route = route or route_for(priority)
+        model = model_router.pick(route)
+        if meta is not None:
+            meta['model'] = model
+        config = adapt_config(config, model)
+
+        async def attempt():
+            async with gemini_scheduler.aslot(model, priority, estimate_tokens(contents)) as usage:
+                response = await self.client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+                usage['tokens'] = usage_tokens(response)
+            return response
+
+        with model_router.measure(route, model):
+            return await gemini_resilience.acall(priority, model, attempt)
+
+    # ---- Appel d'analyse: en un seul appel, ou par étapes prioritaires (voir analysis_stages) ----
+
+    def _staged(self, mode, on_progress):
+        """L'analyse par étapes n'a d'intérêt que si quelqu'un suit la progression"""
+        # Chaque étape renvoie le média et le prompt de base: ~1 appel et ~1x les jetons de plus par étape
+        return bool(on_progress) and getattr(settings, 'ANALYSIS_STAGED', False) and bool(analysis_stages(mode))
+
+    def _generate_analysis(self, media, prompt, speed_mode=False, mode='', on_progress=None):
+        """
+        Analyse JSON de media (liste de parts) selon prompt.
+        En mode progressif, on_progress(étapes terminées, total, analyse_partielle) est appelé après chaque étape.
+        """
+        priority = 'bulk' if mode == 'document' else 'analysis'
+        route = 'analysis_fast' if speed_mode else route_for(priority)
+        if not self._staged(mode, on_progress):
+            response = self._generate(
+                media + [prompt],
+                config=self._analysis_config(speed_mode),
+                priority=priority,
+                route=route
+            )
+            return json.loads(response.text)
+
+        stages = analysis_stages(mode)
+
+        def run_stage(index, overview=None):
+            response = self._generate(
+                media + [stage_prompt(prompt, stages, index, overview)],
+                config=self._analysis_config(speed_mode),
+                priority=priority,
+                route=route
+            )
+            return stage_fields(json.loads(response.text), stages, index)
+
+        # Étape 1 seule (l'erreur est celle de l'analyse), puis les suivantes en parallèle
+        overview = run_stage(0)
+        analysis = dict(overview)
+        on_progress(1, len(stages), dict(analysis))
+
+        missing, done = [], 1
+        with ThreadPoolExecutor(max_workers=len(stages) - 1, thread_name_prefix="analysis-stage") as pool:
+            futures = {pool.submit(run_stage, index, overview): index for index in range(1, len(stages))}
+            for future in as_completed(futures):
+                name = stages[futures[future]][0]
+                done += 1
+                try:
+                    analysis.update(future.result())
+                except Exception as e:
+                    print(f"DEBUG: Analysis stage '{name}' failed: {e}")
+                    missing.append(name)
+                on_progress(done, len(stages), dict(analysis))
+
+        if missing:
+            analysis['missing_stages'] = missing
+        return analysis
+
+    async def _agenerate_analysis(self, media, prompt, speed_mode=False, mode='', on_progress=None):
+        """Version asynchrone de _generate_analysis"""
+        priority = 'bulk' if mode == 'document' else 'analysis'
+        route = 'analysis_fast' if speed_mode else route_for(priority)
+        if not self._staged(mode, on_progress):
+            response = await self._agenerate(
+                media + [prompt],
+                config=self._analysis_config(speed_mode),
+                priority=priority,
+                route=route
+            )
+            return json.loads(response.text)
+
+        stages = analysis_stages(mode)
+        # on_progress est synchrone et écrit en base: hors de la boucle d'événements
+        on_progress = sync_to_async(on_progress)
+
+        async def run_stage(index, overview=None):
+            response = await self._agenerate(
+                media + [stage_prompt(prompt, stages, index, overview)],
+                config=self._analysis_config(speed_mode),
+                priority=priority,
+                route=route
+            )
+            return stage_fields(json.loads(response.text), stages, index)
+
+        overview = await run_stage(0)
+        analysis = dict(overview)
+        await on_progress(1, len(stages), dict(analysis))
+
+        async def run_later_stage(index):
+            try:
+                return index, await run_stage(index, overview), None
+            except Exception as e:
+                return index, None, e
+
+        missing, done = [], 1
+        for next_done in asyncio.as_completed([run_later_stage(index) for index in range(1, len(stages))]):
+            index, fields, error = await next_done
+            done += 1
+            if error is None:
+                analysis.update(fields)
+            else:
+                print(f"DEBUG: Analysis stage '{stages[index][0]}' failed: {error}")
+                missing.append(stages[index][0])
+            await on_progress(done, len(stages), dict(analysis))
+
+        if missing:
+            analysis['missing_stages'] = missing
+        return analysis
+
+    # ============================================
+    # ANALYSES
+    # ============================================
+
+    def analyze_video(self, video_file, context="", speed_mode=False, on_progress=None):
         """
         Analyse une vidéo et extrait les concepts clés
         
@@ -52,80 +490,24 @@ class GeminiService:
             video_file: Fichier vidéo à analyser
             context: Contexte additionnel
             speed_mode: Si True, analyse plus rapide (30-50% gain) avec profondeur légèrement réduite
+            on_progress: Si fourni, analyse par étapes (voir analysis_stages) avec progression
         """
         config_error = self._check_config()
         if config_error:
             return config_error
 
         try:
-            print(f"DEBUG: SDK Uploading video from {video_file.path}...")
-            upload_result = self.client.files.upload(file=video_file.path)
-            
-            # Attendre que le fichier soit prêt (si nécessaire, le SDK gère souvent ça mieux)
-            # Mais pour la vidéo, c'est mieux d'attendre l'état ACTIVE
-            import time
-            start_time = time.time()
-            timeout = 300 # 5 minutes max
-            
-            print(f"DEBUG: Processing video {upload_result.name}...")
-            while upload_result.state.name == "PROCESSING":
-                elapsed = int(time.time() - start_time)
-                if elapsed > timeout:
-                    print(f"DEBUG: ❌ Processing timeout after {timeout}s")
-                    raise TimeoutError("Le traitement de la vidéo prend trop de temps. Veuillez réessayer avec un fichier plus court.")
-                
-                print(f"DEBUG: Still processing... ({elapsed}s elapsed)")
-                time.sleep(5) # Augmenté à 5s pour moins de requêtes
-                upload_result = self.client.files.get(name=upload_result.name)
-            
-            print(f"DEBUG: Video State: {upload_result.state.name}")
-            if upload_result.state.name == "FAILED":
-                raise ValueError("Video processing failed")
-            elif upload_result.state.name != "ACTIVE":
-                print(f"DEBUG: Warning - Unexpected state: {upload_result.state.name}")
-
-            prompt = f"""
-            Analyse cette vidéo en profondeur. {context}
-            
-            Fournis une réponse structurée en JSON avec:
-            1. "summary": Un résumé complet du contenu
-            2. "key_concepts": Liste des concepts principaux abordés
-            3. "difficulty_level": Niveau estimé (beginner/intermediate/advanced)
-            4. "timestamps": Moments clés avec description
-            5. "interactive_questions": 5-7 questions à poser pendant le visionnage
-               Format: [{{"timestamp": "MM:SS", "question": "...", "hint": "...", "answer": "..."}}]
-            6. "prerequisites": Connaissances préalables recommandées
-            
-            IMPORTANT: Utilise TOUJOURS le format LaTeX pour les équations mathématiques ($...$ pour en ligne, $$...$$ pour bloc).
-            Réponds uniquement par le JSON.
-            """
-            
-            # Configuration adaptée selon le mode (rapide ou qualité)
-            if speed_mode:
-                # Mode rapide : ~40% plus rapide, qualité légèrement réduite
-                generate_config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.7,
-                    media_resolution="MEDIA_RESOLUTION_MEDIUM"
-                )
+            # Vidéo longue + ffmpeg disponible: lot d'images clés horodatées au lieu de la vidéo
+            prompt = self._video_prompt(context)
+            contents = keyframe_extractor.prepare(video_file.path, prompt)
+            if contents is None:
+                # Upload (ou réutilisation) puis attente de l'état ACTIVE
+                media = [self._remote_file(video_file, 'video')]
             else:
-                # Mode qualité : Analyse profonde avec HIGH thinking
-                generate_config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.85,
-                    thinking_config=types.ThinkingConfig(thinking_level="HIGH"),
-                    media_resolution="MEDIA_RESOLUTION_HIGH"
-                )
+                media = contents[:-1]  # Images clés horodatées (le prompt est ajouté par étape)
 
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[upload_result, prompt],
-                config=generate_config
-            )
-            
-            # Parse la réponse JSON
             # Avec le nouveau SDK et response_mime_type, response.text est déjà du JSON propre
-            analysis = json.loads(response.text)
+            analysis = self._generate_analysis(media, prompt, speed_mode, 'video', on_progress)
             
             return {
                 "success": True,
@@ -137,59 +519,50 @@ class GeminiService:
                 "success": False,
                 "error": str(e)
             }
+
+    async def aanalyze_video(self, video_file, context="", speed_mode=False, on_progress=None):
+        """Version asynchrone de analyze_video"""
+        config_error = self._check_config()
+        if config_error:
+            return config_error
+
+        try:
+            prompt = self._video_prompt(context)
+            contents = await asyncio.to_thread(keyframe_extractor.prepare, video_file.path, prompt)
+            if contents is None:
+                media = [await self._aremote_file(video_file, 'video')]
+            else:
+                media = contents[:-1]
+
+            return {
+                "success": True,
+                "analysis": await self._agenerate_analysis(media, prompt, speed_mode, 'video', on_progress)
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
     
-    def analyze_image_problem(self, image_file, subject_hint="", speed_mode=False):
+    def analyze_image_problem(self, image_file, subject_hint="", speed_mode=False, content_hash="", on_progress=None):
         """
         Analyse une image d'un problème
         
         Args:
             speed_mode: Si True, analyse plus rapide avec thinking_level désactivé
+            content_hash: SHA-256 du fichier (clé du cache d'images préparées)
+            on_progress: Si fourni, analyse par étapes (voir analysis_stages) avec progression
         """
         config_error = self._check_config()
         if config_error:
             return config_error
 
         try:
-            img = Image.open(image_file)
-            
-            prompt = f"""
-            Tu es un tuteur expert utilisant la méthode socratique.
-            Analyse ce problème {subject_hint} et fournis une réponse JSON avec:
-            
-            1. "problem_type": Type de problème identifié
-            2. "difficulty": Niveau de difficulté (1-10)
-            3. "concepts_needed": Liste des concepts requis
-            4. "solution_steps": Liste d'étapes (sans révéler la solution complète)
-               Format: [{{"step": 1, "hint": "...", "question": "...", "concepts": [...]}}]
-            5. "final_answer": La solution complète (sera cachée initialement)
-            6. "similar_problems": 3 problèmes similaires pour pratiquer
-            
-            IMPORTANT: Guide l'étudiant, ne donne pas directement la réponse! 
-            Utilise TOUJOURS le format LaTeX pour les équations mathématiques ($...$ pour en ligne, $$...$$ pour bloc).
-            Réponds uniquement par le JSON.
-            """
-            
-            if speed_mode:
-                generate_config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.7,
-                    media_resolution="MEDIA_RESOLUTION_MEDIUM"
-                )
-            else:
-                generate_config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.85,
-                    thinking_config=types.ThinkingConfig(thinking_level="HIGH"),
-                    media_resolution="MEDIA_RESOLUTION_HIGH"
-                )
+            # Orientation EXIF + réduction + JPEG (voir image_preprocessing)
+            img = image_preprocessor.prepare(image_file, 'problem', speed_mode, content_hash)
 
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[img, prompt],
-                config=generate_config
-            )
-            
-            analysis = json.loads(response.text)
+            analysis = self._generate_analysis([img], self._image_problem_prompt(subject_hint), speed_mode, 'problem', on_progress)
             
             return {
                 "success": True,
@@ -201,79 +574,54 @@ class GeminiService:
                 "success": False,
                 "error": str(e)
             }
+
+    async def aanalyze_image_problem(self, image_file, subject_hint="", speed_mode=False, content_hash="", on_progress=None):
+        """Version asynchrone de analyze_image_problem"""
+        config_error = self._check_config()
+        if config_error:
+            return config_error
+
+        try:
+            img = await asyncio.to_thread(image_preprocessor.prepare, image_file, 'problem', speed_mode, content_hash)
+
+            return {
+                "success": True,
+                "analysis": await self._agenerate_analysis([img], self._image_problem_prompt(subject_hint), speed_mode, 'problem', on_progress)
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
     
-    def analyze_document(self, document_file, focus_areas="", speed_mode=False):
+    def analyze_document(self, document_file, focus_areas="", speed_mode=False, on_progress=None):
         """
         Analyse un document de tout format et crée une carte conceptuelle interactive.
         
         Formats supportés: PDF, DOCX, TXT, MD, HTML, RTF, EPUB, et autres formats textuels.
         Le modèle Gemini 3 peut traiter nativement la mise en page, les images intégrées et le texte structuré.
+        
+        Les documents volumineux sont analysés par morceaux en parallèle (voir document_chunking),
+        les autres par étapes (voir analysis_stages) si on_progress est fourni;
+        on_progress(terminés, total, analyse_partielle) est appelé à chaque morceau ou étape terminé.
         """
         config_error = self._check_config()
         if config_error:
             return config_error
 
+        chunks = plan_chunks(document_file.path)
         try:
-            print(f"DEBUG: SDK Uploading document from {document_file.path}...")
-            upload_result = self.client.files.upload(file=document_file.path)
-            
-            # Attente active si nécessaire pour les documents volumineux (PDF, DOCX, etc.)
-            import time
-            while upload_result.state.name == "PROCESSING":
-                time.sleep(1)
-                upload_result = self.client.files.get(name=upload_result.name)
-            
-            if upload_result.state.name == "FAILED":
-                raise ValueError(f"Le traitement du document a échoué. Vérifiez le format du fichier.")
-            
-            prompt = f"""
-            Analyse ce document (PDF, Word, texte, Markdown, etc.) de manière approfondie et multimodale.
-            {f"Focus spécifique sur: {focus_areas}" if focus_areas else ""}
-            
-            Fournis une réponse JSON structurée avec:
-            1. "document_type": Type de document détecté (académique, technique, cours, article...)
-            2. "summary": Résumé exécutif complet du contenu
-            3. "main_topics": Liste des sujets principaux identifiés
-            4. "concept_map": Carte conceptuelle interactive
-               - "nodes": [{{"id": "unique_id", "label": "Concept", "level": 1-3, "description": "...", "category": "..."}}]
-               - "edges": [{{"from": "id1", "to": "id2", "relationship": "prérequis/compose/illustre/..."}}]
-            5. "key_definitions": Dictionnaire des termes techniques importants {{term: definition}}
-            6. "quiz_questions": 10 questions adaptatives de niveaux progressifs
-               Format: [{{"level": "easy/medium/hard", "question": "...", "options": [...], "correct": 0, "explanation": "..."}}]
-            7. "analogies": Analogies concrètes pour simplifier les concepts abstraits
-            8. "visual_elements": Description des diagrammes/images intégrés (si présents)
-            9. "further_reading": Suggestions de lectures complémentaires
-            10. "prerequisites": Connaissances préalables recommandées
-            
-            IMPORTANT: 
-            - Utilise TOUJOURS le format LaTeX pour les équations mathématiques ($...$ pour en ligne, $$...$$ pour bloc).
-            - Conserve la structure hiérarchique du document original.
-            - Si le document contient des images/diagrammes, décris leur contenu et leur relation avec le texte.
-            
-            Réponds uniquement par le JSON valide.
-            """
-            
-            if speed_mode:
-                generate_config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.7,
-                    media_resolution="MEDIA_RESOLUTION_MEDIUM"
-                )
-            else:
-                generate_config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.85,
-                    thinking_config=types.ThinkingConfig(thinking_level="HIGH"),
-                    media_resolution="MEDIA_RESOLUTION_HIGH"
-                )
-            
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[upload_result, prompt],
-                config=generate_config
-            )
+            if chunks:
+                return {
+                    "success": True,
+                    "analysis": self._analyze_document_chunked(chunks, focus_areas, speed_mode, on_progress)
+                }
+
+            # Upload (ou réutilisation) puis attente si nécessaire pour les documents volumineux
+            upload_result = self._remote_file(document_file, 'document')
             
-            analysis = json.loads(response.text)
+            analysis = self._generate_analysis([upload_result], self._document_prompt(focus_areas), speed_mode, 'document', on_progress)
             
             return {
                 "success": True,
@@ -286,55 +634,152 @@ class GeminiService:
                 "success": False,
                 "error": str(e)
             }
-    
-    def creative_workshop(self, image_file, creative_goal="", speed_mode=False):
-        """Atelier créatif: analyse un design/esquisse"""
+        finally:
+            cleanup_chunks(chunks)
+
+    async def aanalyze_document(self, document_file, focus_areas="", speed_mode=False, on_progress=None):
+        """Version asynchrone de analyze_document"""
         config_error = self._check_config()
         if config_error:
             return config_error
 
+        chunks = await asyncio.to_thread(plan_chunks, document_file.path)
         try:
-            img = Image.open(image_file)
-            
-            prompt = f"""
-            Tu es un mentor créatif expert en design, architecture, et arts visuels.
-            Analyse cette création/esquisse. {creative_goal}
-            
-            Fournis une réponse JSON avec:
-            1. "analysis": Analyse détaillée de ce qui est présenté
-            2. "strengths": Points forts du design (3-5 éléments)
-            3. "improvements": Suggestions d'amélioration (5-7 éléments)
-               Format: [{{"aspect": "...", "suggestion": "...", "why": "...", "priority": "high/medium/low"}}]
-            4. "design_principles": Principes de design applicables
-            5. "variations": 3 variations/alternatives à explorer
-            6. "technique_tips": Conseils techniques spécifiques
-            7. "inspiration": Références/artistes similaires
-            8. "next_steps": Plan d'action pour développer le projet
+            if chunks:
+                return {
+                    "success": True,
+                    "analysis": await self._aanalyze_document_chunked(chunks, focus_areas, speed_mode, on_progress)
+                }
+
+            upload_result = await self._aremote_file(document_file, 'document')
             
-            Réponds uniquement par le JSON.
-            """
+            return {
+                "success": True,
+                "analysis": await self._agenerate_analysis([upload_result], self._document_prompt(focus_areas), speed_mode, 'document', on_progress)
+            }
             
-            if speed_mode:
-                generate_config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.7,
-                    media_resolution="MEDIA_RESOLUTION_MEDIUM"
-                )
+        except Exception as e:
+            print(f"!!! GEMINI SERVICE ERROR in aanalyze_document: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        finally:
+            cleanup_chunks(chunks)
+
+    # ---- Documents volumineux: map (morceaux en parallèle) puis reduce ----
+
+    def _finish_chunked_document(self, partials, failures, total):
+        """Vérifie qu'au moins un morceau a abouti et fusionne les analyses partielles"""
+        if not partials:
+            raise ValueError(f"Aucune partie du document n'a pu être analysée ({failures[0]})")
+        merged = merge_chunk_analyses(partials)
+        merged['chunks'] = {'total': total, 'analysed': len(partials), 'failed': failures}
+        return merged
+
+    def _apply_document_overview(self, merged, response_text):
+        """Complète l'analyse fusionnée avec la synthèse globale (reduce)"""
+        try:
+            overview = json.loads(response_text)
+            for key in ('document_type', 'summary', 'prerequisites', 'further_reading'):
+                if overview.get(key):
+                    merged[key] = overview[key]
+        except ValueError as e:
+            print(f"DEBUG: Document overview unusable, keeping section summaries ({e})")
+        return merged
+
+    def _analyze_document_chunk(self, chunk, total, focus_areas, speed_mode):
+        source = chunk.text if chunk.text is not None else self._remote_file(chunk, 'document')
+        response = self._generate(
+            [source, chunk_prompt(chunk, total, focus_areas)],
+            config=self._analysis_config(speed_mode),
+            priority='bulk'
+        )
+        return json.loads(response.text)
+
+    def _analyze_document_chunked(self, chunks, focus_areas, speed_mode, on_progress=None):
+        total = len(chunks)
+        workers = min(getattr(settings, 'DOCUMENT_CHUNK_WORKERS', 4), total)
+        print(f"DEBUG: 📚 Chunked document analysis: {total} parts, {workers} workers")
+        partials, failures = {}, []
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="document-chunk") as pool:
+            futures = {
+                pool.submit(self._analyze_document_chunk, chunk, total, focus_areas, speed_mode): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    partials[chunk.index] = future.result()
+                except Exception as e:
+                    print(f"DEBUG: Document part {chunk.label} failed: {e}")
+                    failures.append(f"{chunk.label}: {e}")
+                if on_progress:
+                    on_progress(len(partials) + len(failures), total, merge_chunk_analyses(partials))
+
+        merged = self._finish_chunked_document(partials, failures, total)
+        try:
+            response = self._generate(
+                reduce_prompt(merged, focus_areas),
+                config=self._analysis_config(speed_mode=True),
+                priority='bulk'
+            )
+            return self._apply_document_overview(merged, response.text)
+        except Exception as e:
+            print(f"DEBUG: Document overview failed, keeping section summaries ({e})")
+            return merged
+
+    async def _aanalyze_document_chunked(self, chunks, focus_areas, speed_mode, on_progress=None):
+        total = len(chunks)
+        semaphore = asyncio.Semaphore(getattr(settings, 'DOCUMENT_CHUNK_WORKERS', 4))
+        partials, failures = {}, []
+
+        async def analyse(chunk):
+            async with semaphore:
+                try:
+                    source = chunk.text if chunk.text is not None else await self._aremote_file(chunk, 'document')
+                    response = await self._agenerate(
+                        [source, chunk_prompt(chunk, total, focus_areas)],
+                        config=self._analysis_config(speed_mode),
+                        priority='bulk'
+                    )
+                    return chunk, json.loads(response.text), None
+                except Exception as e:
+                    return chunk, None, e
+
+        for next_done in asyncio.as_completed([analyse(chunk) for chunk in chunks]):
+            chunk, partial, error = await next_done
+            if error is None:
+                partials[chunk.index] = partial
             else:
-                generate_config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.85,
-                    thinking_config=types.ThinkingConfig(thinking_level="HIGH"),
-                    media_resolution="MEDIA_RESOLUTION_HIGH"
-                )
+                print(f"DEBUG: Document part {chunk.label} failed: {error}")
+                failures.append(f"{chunk.label}: {error}")
+            if on_progress:
+                await sync_to_async(on_progress)(len(partials) + len(failures), total, merge_chunk_analyses(partials))
 
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[img, prompt],
-                config=generate_config
+        merged = self._finish_chunked_document(partials, failures, total)
+        try:
+            response = await self._agenerate(
+                reduce_prompt(merged, focus_areas),
+                config=self._analysis_config(speed_mode=True),
+                priority='bulk'
             )
-            
-            analysis = json.loads(response.text)
+            return self._apply_document_overview(merged, response.text)
+        except Exception as e:
+            print(f"DEBUG: Document overview failed, keeping section summaries ({e})")
+            return merged
+    
+    def creative_workshop(self, image_file, creative_goal="", speed_mode=False, content_hash="", on_progress=None):
+        """Atelier créatif: analyse un design/esquisse"""
+        config_error = self._check_config()
+        if config_error:
+            return config_error
+
+        try:
+            img = image_preprocessor.prepare(image_file, 'creative', speed_mode, content_hash)
+
+            analysis = self._generate_analysis([img], self._creative_prompt(creative_goal), speed_mode, 'creative', on_progress)
             
             return {
                 "success": True,
@@ -346,77 +791,191 @@ class GeminiService:
                 "success": False,
                 "error": str(e)
             }
-    
-    def start_interactive_session(self, context, user_level="intermediate"):
-        """Démarre une session de chat interactive"""
+
+    async def acreative_workshop(self, image_file, creative_goal="", speed_mode=False, content_hash="", on_progress=None):
+        """Version asynchrone de creative_workshop"""
         config_error = self._check_config()
         if config_error:
-            raise ValueError(config_error['error'])
-
-        system_instruction = f"""
-        Tu es Kachele NeuralSync AI, le tuteur adaptatif multimodal d'élite.
-        
-        TES CAPACITÉS MULTIMODALES NATIVES :
-        1. 📹 APPRENTISSAGE VIDÉO INTERACTIF : Tu identifies les moments clés dans les vidéos éducatives pour poser des questions stimulantes et vérifier la compréhension en temps réel.
-        2. 🖼️ RÉSOLUTION VISUELLE SOCRATIQUE : Tu analyses des photos de problèmes (mathématiques, physique, schémas techniques) et guides l'utilisateur étape par étape sans donner la solution.
-        3. 📚 INTELLIGENCE DOCUMENTAIRE UNIVERSELLE : Tu traites TOUS types de documents (PDF, Word, Markdown, texte, HTML, EPUB...) pour créer des cartes conceptuelles interactives, identifier les concepts clés et générer des quiz adaptatifs.
-        4. 🎨 ATELIER CRÉATIF : Tu agis comme un mentor expert pour perfectionner les travaux créatifs (design, architecture, code, art visuel) avec des critiques constructives et des suggestions concrètes.
+            return config_error
 
-        TES 4 PILIERS FONDAMENTAUX :
-        1. 💬 DIALOGUE SOCRATIQUE : 
-           - Ne donne JAMAIS la réponse finale, un code complet ou une solution d'équation directe.
-           - Guide l'utilisateur par des questions ciblées qui provoquent le "déclic".
-           - Si l'utilisateur stagne, fournis un indice (hint) ou une analogie, mais jamais le résultat complet.
-        
-        2. 🧠 SUIVI COGNITIF (Cognitive Tracking) : 
-           - Analyse chaque réponse pour identifier les lacunes de connaissances (knowledge gaps).
-           - Ajuste dynamiquement la difficulté de tes questions selon la charge cognitive apparente.
-           - Détecte quand l'utilisateur maîtrise un concept pour passer au suivant.
-        
-        3. 🔍 ANALYSE MULTIMODALE PROFONDE : 
-           - Tu comprends simultanément vidéo, images, texte structuré (dans TOUS formats de documents) et code.
-           - Utilise les détails visuels, temporels ou structurels du contenu analysé pour ancrer tes explications.
-           - Si un document contient des diagrammes ou équations, réfère-toi explicitement à eux.
-        
-        4. ⚡ PRATIQUE GÉNÉRATIVE : 
-           - Génère de nouveaux problèmes uniques adaptés au niveau actuel de l'utilisateur.
-           - Ne recycle jamais les mêmes exercices : chaque problème doit tester la compréhension profonde.
-           - Propose des variations progressives pour consolider la maîtrise.
+        try:
+            img = await asyncio.to_thread(image_preprocessor.prepare, image_file, 'creative', speed_mode, content_hash)
 
-        FORMAT ET STYLE :
-        - Langue : Détecte automatiquement la langue de l'utilisateur et réponds dans CETTE langue (français, anglais, espagnol, etc.). Ton naturel, expert mais encourageant et bienveillant.
-        - Mathématiques/Sciences : Utilise EXCLUSIVEMENT le format LaTeX ($...$ pour en ligne, $$...$$ pour les blocs).
-        - Exemple : "La dérivée de $x^n$ est $\\frac{{d}}{{dx}} x^n = nx^{{n-1}}$."
-        - Code : Utilise des blocs de code Markdown avec coloration syntaxique appropriée.
+            return {
+                "success": True,
+                "analysis": await self._agenerate_analysis([img], self._creative_prompt(creative_goal), speed_mode, 'creative', on_progress)
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
 
-        CONTEXTE DE SESSION : 
-        {context}
-        
-        NIVEAU DE L'APPRENANT : 
-        {user_level}
+    # ============================================
+    # SESSIONS INTERACTIVES
+    # ============================================
+    
+    def start_interactive_session(self, context, user_level="intermediate", history=None, upload=None, model=None, route='chat'):
+        """
+        Démarre une session de chat interactive (éventuellement avec un historique sérialisé)
         
-        RAPPEL : Tu n'es pas un simple assistant, mais un MENTOR SOCRATIQUE qui fait ÉMERGER la compréhension plutôt que de la transmettre passivement.
+        Le contexte est placé dans un cache Gemini explicite (tracé sur upload s'il est fourni)
+        lorsqu'il est assez long: les tours suivants ne renvoient plus l'instruction système.
+        model: modèle choisi par model_router (par défaut le modèle nominal du service)
+        route: route model_router du tour (niveau de réflexion propre à la route, ex: indices)
         """
+        config_error = self._check_config()
+        if config_error:
+            raise ValueError(config_error['error'])
         
-        # Configuration avancée basée sur Google AI Studio
-        generate_config = types.GenerateContentConfig(
-            temperature=0.85,
-            thinking_config=types.ThinkingConfig(
-                thinking_level="HIGH",
-            ),
-            media_resolution="MEDIA_RESOLUTION_HIGH",
-            system_instruction=system_instruction
-        )
+        model = model or self.model_name
+        system_instruction = self._chat_system_instruction(context, user_level)
+        cached_content = context_cache.get_chat_cache(self.client, model, system_instruction, upload)
         
         # Nouveau SDK: client.chats.create
         chat = self.client.chats.create(
-            model=self.model_name,
-            config=generate_config
+            model=model,
+            config=adapt_config(self._chat_config(system_instruction, cached_content), model, route),
+            history=self._deserialize_history(history)
         )
         
         return chat
+
+    async def astart_interactive_session(self, context, user_level="intermediate", history=None, upload=None, model=None, route='chat'):
+        """Démarre une session de chat asynchrone (client.aio.chats)"""
+        config_error = self._check_config()
+        if config_error:
+            raise ValueError(config_error['error'])
+        
+        model = model or self.model_name
+        system_instruction = self._chat_system_instruction(context, user_level)
+        cached_content = await context_cache.aget_chat_cache(self.client, model, system_instruction, upload)
+        
+        # La création du chat est locale: aucun appel réseau à attendre
+        return self.client.aio.chats.create(
+            model=model,
+            config=adapt_config(self._chat_config(system_instruction, cached_content), model, route),
+            history=self._deserialize_history(history)
+        )
+
+    # ---- Conversations par session (état repris depuis chat_store) ----
+
+    def serialize_history(self, chat):
+        """Historique du chat sérialisable en JSON (les signatures de pensée sont encodées en base64)"""
+        return [content.model_dump(mode='json', exclude_none=True) for content in chat.get_history()]
+
+    def _deserialize_history(self, history):
+        return [types.Content.model_validate(content) for content in history or []]
+
+    def _load_chat_state(self, session_id, context, user_level, upload=None):
+        """
+        État existant de la conversation, ou nouvel état (le contexte n'est construit que si nécessaire).
+        Le contexte est reconstruit (historique conservé) quand l'analyse de l'upload a progressé
+        depuis sa construction: le tuteur démarre sur la première étape puis profite des suivantes.
+        """
+        analysis_version = upload.analysis_version if upload is not None else ''
+        state = chat_store.get(str(session_id))
+        if state is None:
+            state = {
+                'context': context() if callable(context) else context,
+                'user_level': user_level,
+                'history': [],
+                'version': 0,
+            }
+        elif callable(context) and analysis_version and state.get('analysis_version') != analysis_version:
+            state = dict(state, context=context())
+        return dict(state, analysis_version=analysis_version)
+
+    def _save_chat_state(self, session_id, chat, state):
+        """
+        Enregistre le tour (écriture conditionnelle sur la version lue). Si un autre worker a
+        enregistré un tour de la même session entre-temps, ce tour est ajouté à la suite de
+        l'historique le plus récent plutôt que de l'écraser.
+        """
+        history = self.serialize_history(chat)
+        new_turn = history[len(state['history']):]
+        for attempt in range(CHAT_SAVE_ATTEMPTS):
+            try:
+                chat_store.set(str(session_id), {
+                    'context': state['context'],
+                    'user_level': state['user_level'],
+                    'history': history,
+                    'version': state['version'] + 1,
+                    'analysis_version': state['analysis_version'],
+                })
+                return
+            except ChatStateConflict:
+                if attempt == CHAT_SAVE_ATTEMPTS - 1:
+                    raise
+                print(f"DEBUG: Concurrent chat turn for session {session_id}, appending this turn to the latest history")
+                latest = chat_store.get(str(session_id)) or {'history': [], 'version': 0}
+                state = dict(state, version=latest['version'])
+                history = latest['history'] + new_turn
+
+    def _pick_chat_model(self, route, meta):
+        model = model_router.pick(route)
+        if meta is not None:
+            meta['model'] = model
+        return model
+
+    def send_session_message(self, session_id, message, context="", user_level="intermediate", upload=None,
+                             route='chat', meta=None):
+        """
+        Envoie un message dans la conversation d'une session d'apprentissage.
+        
+        L'historique est repris depuis le chat store partagé (n'importe quel worker peut
+        continuer la conversation) puis sauvegardé après la réponse.
+        context peut être une fonction: il n'est alors construit que pour une nouvelle conversation.
+        upload (UploadedContent analysé) porte le cache de contexte Gemini de la conversation.
+        route: palier de modèles (voir model_router: 'chat', 'hint'...); meta reçoit le modèle utilisé.
+        """
+        state = self._load_chat_state(session_id, context, user_level, upload)
+        model = self._pick_chat_model(route, meta)
+
+        def turn():
+            # Chaque exécution a son propre objet chat: une requête doublée (hedging) ne touche pas l'autre
+            chat = self.start_interactive_session(state['context'], state['user_level'], history=state['history'], upload=upload, model=model, route=route)
+            return chat, self.send_message(message, chat_session=chat, model=model, route=route)
+
+        chat, text = gemini_resilience.hedged(turn)
+        self._save_chat_state(session_id, chat, state)
+        return text
+
+    def stream_session_message(self, session_id, message, context="", user_level="intermediate", upload=None,
+                               route='chat', meta=None):
+        """Version streaming de send_session_message (l'état est sauvegardé à la fin du flux)"""
+        state = self._load_chat_state(session_id, context, user_level, upload)
+        model = self._pick_chat_model(route, meta)
+        chat = self.start_interactive_session(state['context'], state['user_level'], history=state['history'], upload=upload, model=model, route=route)
+        yield from self.stream_message(message, chat_session=chat, model=model, route=route)
+        self._save_chat_state(session_id, chat, state)
+
+    async def asend_session_message(self, session_id, message, context="", user_level="intermediate", upload=None,
+                                    route='chat', meta=None):
+        """Version asynchrone de send_session_message"""
+        state = await sync_to_async(self._load_chat_state)(session_id, context, user_level, upload)
+        model = self._pick_chat_model(route, meta)
+
+        async def turn():
+            chat = await self.astart_interactive_session(state['context'], state['user_level'], history=state['history'], upload=upload, model=model, route=route)
+            return chat, await self.asend_message(message, chat_session=chat, model=model, route=route)
+
+        chat, text = await gemini_resilience.ahedged(turn)
+        await sync_to_async(self._save_chat_state)(session_id, chat, state)
+        return text
+
+    async def astream_session_message(self, session_id, message, context="", user_level="intermediate", upload=None,
+                                      route='chat', meta=None):
+        """Version asynchrone de stream_session_message"""
+        state = await sync_to_async(self._load_chat_state)(session_id, context, user_level, upload)
+        model = self._pick_chat_model(route, meta)
+        chat = await self.astart_interactive_session(state['context'], state['user_level'], history=state['history'], upload=upload, model=model, route=route)
+        async for text in self.astream_message(message, chat_session=chat, model=model, route=route):
+            yield text
+        await sync_to_async(self._save_chat_state)(session_id, chat, state)
     
-    def send_message(self, message, chat_session=None):
+    def send_message(self, message, chat_session=None, model=None, route='chat'):
         """Envoie un message dans une session interactive"""
         config_error = self._check_config()
         if config_error:
@@ -429,34 +988,127 @@ class GeminiService:
             # Mais idéalement views.py doit gérer les sessions
             raise ValueError("No active chat session provided.")
         
-        response = chat.send_message(message)
+        model = model or self.model_name
+
+        # Tour de chat: prioritaire sur les analyses et les travaux de fond
+        # (l'historique du chat n'est complété qu'en cas de succès: la tentative peut être rejouée)
+        def attempt():
+            with gemini_scheduler.slot(model, 'interactive', estimate_tokens(message)) as usage:
+                response = chat.send_message(message)
+                usage['tokens'] = usage_tokens(response)
+            return response
+
+        with model_router.measure(route, model):
+            return gemini_resilience.call('interactive', model, attempt).text
+
+    async def asend_message(self, message, chat_session=None, model=None, route='chat'):
+        """Version asynchrone de send_message (chat_session issu de astart_interactive_session)"""
+        config_error = self._check_config()
+        if config_error:
+            return f"Error: {config_error['error']}"
+
+        if not chat_session:
+            raise ValueError("No active chat session provided.")
+        
+        model = model or self.model_name
+
+        async def attempt():
+            async with gemini_scheduler.aslot(model, 'interactive', estimate_tokens(message)) as usage:
+                response = await chat_session.send_message(message)
+                usage['tokens'] = usage_tokens(response)
+            return response
+
+        with model_router.measure(route, model):
+            response = await gemini_resilience.acall('interactive', model, attempt)
         return response.text
     
-    def evaluate_answer(self, question, user_answer, correct_answer, context=""):
-        """Évalue la réponse d'un utilisateur"""
+    def stream_message(self, message, chat_session=None, model=None, route='chat'):
+        """Envoie un message et renvoie les fragments de texte au fil de la génération (send_message_stream)"""
         config_error = self._check_config()
         if config_error:
-            return {"error": config_error['error']}
+            yield f"Error: {config_error['error']}"
+            return
 
-        prompt = f"""
-        Évalue cette réponse d'étudiant avec bienveillance et pédagogie.
-        {context}
+        chat = chat_session or self.chat
+        if not chat:
+            raise ValueError("No active chat session provided.")
         
-        Question: {question}
-        Réponse de l'étudiant: {user_answer}
-        Réponse attendue: {correct_answer}
+        # Le créneau est tenu jusqu'à la fin du flux (le dernier fragment porte usage_metadata).
+        # Seule l'ouverture du flux (jusqu'au premier fragment) est rejouée en cas d'erreur:
+        # au-delà, du texte a déjà été envoyé au client
+        # Pour model_router, la latence mesurée est celle du premier fragment
+        model = model or self.model_name
+
+        def open_stream():
+            stream = chat.send_message_stream(message)
+            return stream, next(stream, None)
+
+        with gemini_scheduler.slot(model, 'interactive', estimate_tokens(message)) as usage:
+            with model_router.measure(route, model):
+                stream, chunk = gemini_resilience.call('interactive', model, open_stream, track=False)
+            while chunk is not None:
+                usage['tokens'] = usage_tokens(chunk) or usage['tokens']
+                if chunk.text:
+                    yield chunk.text
+                chunk = next(stream, None)
+
+    async def astream_message(self, message, chat_session=None, model=None, route='chat'):
+        """Version asynchrone de stream_message"""
+        config_error = self._check_config()
+        if config_error:
+            yield f"Error: {config_error['error']}"
+            return
+
+        if not chat_session:
+            raise ValueError("No active chat session provided.")
         
-        Fournis une réponse JSON, incluant pourcentage, feedback, what_was_good, what_to_improve.
-        """
+        model = model or self.model_name
+
+        async def open_stream():
+            stream = await chat_session.send_message_stream(message)
+            return stream, await anext(stream, None)
+
+        async with gemini_scheduler.aslot(model, 'interactive', estimate_tokens(message)) as usage:
+            with model_router.measure(route, model):
+                stream, chunk = await gemini_resilience.acall('interactive', model, open_stream, track=False)
+            while chunk is not None:
+                usage['tokens'] = usage_tokens(chunk) or usage['tokens']
+                if chunk.text:
+                    yield chunk.text
+                chunk = await anext(stream, None)
+    
+    def evaluate_answer(self, question, user_answer, correct_answer, context="", meta=None):
+        """Évalue la réponse d'un utilisateur (meta reçoit le modèle utilisé)"""
+        config_error = self._check_config()
+        if config_error:
+            return {"error": config_error['error']}
         
         generate_config = types.GenerateContentConfig(
             response_mime_type="application/json"
         )
         
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=prompt,
-            config=generate_config
+        response = self._generate(
+            self._evaluation_prompt(question, user_answer, correct_answer, context),
+            config=generate_config,
+            priority='interactive',
+            route='evaluation',
+            meta=meta
+        )
+        
+        return json.loads(response.text)
+
+    async def aevaluate_answer(self, question, user_answer, correct_answer, context="", meta=None):
+        """Version asynchrone de evaluate_answer"""
+        config_error = self._check_config()
+        if config_error:
+            return {"error": config_error['error']}
+        
+        response = await self._agenerate(
+            self._evaluation_prompt(question, user_answer, correct_answer, context),
+            config=types.GenerateContentConfig(response_mime_type="application/json"),
+            priority='interactive',
+            route='evaluation',
+            meta=meta
         )
         
         return json.loads(response.text)
@@ -466,21 +1118,30 @@ class GeminiService:
         config_error = self._check_config()
         if config_error:
             return []
-
-        prompt = f"""
-        Génère {count} problèmes de pratique sur: {topic}
-        Niveau de difficulté: {difficulty}
-        Format JSON requis: list under key "problems".
-        """
         
         generate_config = types.GenerateContentConfig(
             response_mime_type="application/json"
         )
         
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=prompt,
-            config=generate_config
+        response = self._generate(
+            self._practice_prompt(topic, difficulty, count),
+            config=generate_config,
+            priority='bulk'
+        )
+        
+        result = json.loads(response.text)
+        return result.get("problems", [])
+
+    async def agenerate_practice_problems(self, topic, difficulty, count=5):
+        """Version asynchrone de generate_practice_problems"""
+        config_error = self._check_config()
+        if config_error:
+            return []
+        
+        response = await self._agenerate(
+            self._practice_prompt(topic, difficulty, count),
+            config=types.GenerateContentConfig(response_mime_type="application/json"),
+            priority='bulk'
         )
         
         result = json.loads(response.text)
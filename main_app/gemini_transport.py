@@ -0,0 +1,43 @@
+"""
+Transport HTTP du client Gemini
+Pool de connexions réglable (connexions max, connexions gardées ouvertes et leur durée)
+partagé par tous les appels d'un processus, et HTTP/2 si le paquet h2 est installé
+(plusieurs requêtes multiplexées sur une seule connexion TLS).
+"""
+from django.conf import settings
+import importlib.util
+
+from .lazy_imports import lazy_module
+
+types = lazy_module('google.genai.types')
+httpx = lazy_module('httpx')
+
+
+def http2_enabled():
+    # Paquet h2 optionnel (requis par httpx pour HTTP/2): sans lui, HTTP/1.1 avec keep-alive
+    return getattr(settings, 'GEMINI_HTTP2', True) and importlib.util.find_spec('h2') is not None
+
+
+def pool_limits():
+    return httpx.Limits(
+        max_connections=getattr(settings, 'GEMINI_HTTP_MAX_CONNECTIONS', 64),
+        max_keepalive_connections=getattr(settings, 'GEMINI_HTTP_MAX_KEEPALIVE', 32),
+        keepalive_expiry=getattr(settings, 'GEMINI_HTTP_KEEPALIVE_EXPIRY', 120),
+    )
+
+
+def http_options():
+    """HttpOptions du client Gemini: mêmes réglages de pool pour le client sync et client.aio"""
+    client_args = {'limits': pool_limits(), 'http2': http2_enabled()}
+    return types.HttpOptions(client_args=client_args, async_client_args=dict(client_args))
+
+
+def describe():
+    """Réglages effectifs (pour les statistiques)"""
+    limits = pool_limits()
+    return {
+        'max_connections': limits.max_connections,
+        'max_keepalive_connections': limits.max_keepalive_connections,
+        'keepalive_expiry': limits.keepalive_expiry,
+        'http2': http2_enabled(),
+    }
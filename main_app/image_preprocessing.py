@@ -0,0 +1,116 @@
+"""
+Préparation des images avant envoi à Gemini
+Orientation EXIF, réduction au côté long cible (selon le mode et speed_mode),
+ré-encodage JPEG, et cache des octets produits par hash du contenu.
+
+Sans cette étape, le SDK ré-encode toute image non-JPEG en PNG à pleine résolution.
+"""
+from django.conf import settings
+from collections import OrderedDict
+import hashlib
+import io
+import os
+import threading
+
+from .lazy_imports import lazy_module
+
+types = lazy_module('google.genai.types')
+Image = lazy_module('PIL.Image')
+ImageOps = lazy_module('PIL.ImageOps')
+
+JPEG_QUALITY = 88
+
+
+def target_edge(mode, speed_mode=False):
+    """Côté long maximal (pixels) pour ce mode de session, voir IMAGE_MAX_EDGES (qualité, speed_mode)"""
+    edges = settings.IMAGE_MAX_EDGES.get(mode) or settings.IMAGE_MAX_EDGES['creative']
+    return edges[1] if speed_mode else edges[0]
+
+
+def _flatten(img):
+    """Convertit en RGB (JPEG), en posant la transparence sur fond blanc"""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def preprocess_image(path, max_edge):
+    """
+    Renvoie (octets, mime_type) prêts à envoyer.
+    Un JPEG déjà assez petit et correctement orienté est envoyé tel quel (aucun ré-encodage).
+    """
+    with Image.open(path) as img:
+        orientation = img.getexif().get(0x0112, 1)  # Tag EXIF Orientation
+        if img.format == 'JPEG' and orientation == 1 and max(img.size) <= max_edge:
+            with open(path, 'rb') as f:
+                return f.read(), 'image/jpeg'
+
+        img = ImageOps.exif_transpose(img)
+        if max(img.size) > max_edge:
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        img = _flatten(img)
+
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        return buffer.getvalue(), 'image/jpeg'
+
+
+class ImagePreprocessor:
+    """Prépare les images et garde les résultats récents en mémoire (LRU borné en octets)"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or getattr(settings, 'IMAGE_PREPROCESS_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        self._entries = OrderedDict()  # (content_hash, max_edge) -> (octets, mime_type)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def _file_hash(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def prepare(self, path, mode, speed_mode=False, content_hash=''):
+        """Part Gemini (octets préparés) pour l'image située à path"""
+        max_edge = target_edge(mode, speed_mode)
+        key = (content_hash or self._file_hash(path), max_edge)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+        if cached is None:
+            data, mime_type = preprocess_image(path, max_edge)
+            cached = (data, mime_type)
+            self._store(key, cached, path)
+
+        return types.Part.from_bytes(data=cached[0], mime_type=cached[1])
+
+    def _store(self, key, value, path):
+        size = len(value[0])
+        with self._lock:
+            self._counters['misses'] += 1
+            self._counters['bytes_in'] += os.path.getsize(path)
+            self._counters['bytes_out'] += size
+            if key not in self._entries:
+                self._entries[key] = value
+                self._size += size
+            while self._size > self.max_bytes and self._entries:
+                _, (data, _) = self._entries.popitem(last=False)
+                self._size -= len(data)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), bytes=self._size)
+
+
+# Instance singleton du préprocesseur
+image_preprocessor = ImagePreprocessor()
@@ -0,0 +1,150 @@
+"""
+Archivage des interactions anciennes
+Les interactions plus anciennes que INTERACTION_ARCHIVE_AFTER_DAYS quittent la table Interaction
+(la plus volumineuse, écrite à chaque tour de chat) pour InteractionArchive:
+- les prompts sont dédupliqués par SHA-256 dans PromptBlob (les prompts gabarits, comme celui des
+  indices ou de la première question, reviennent à l'identique d'une session à l'autre);
+- prompts et réponses au-delà de INTERACTION_COMPRESS_MIN_BYTES sont compressés (zstd ou zlib);
+- chaque ligne porte sa partition mensuelle (AAAAMM).
+Traitement par lots, chacun dans une transaction: relancer la commande après une interruption est sans risque.
+Un seul archivage à la fois (verrou de fichier): la purge des prompts orphelins ne peut pas supprimer
+un prompt qu'un archivage concurrent vient de créer ou de retrouver.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from contextlib import contextmanager
+from datetime import timedelta
+import hashlib
+import os
+import tempfile
+
+from .models import Interaction, InteractionArchive, PromptBlob
+from . import text_codec
+
+try:
+    import fcntl
+except ImportError:  # Dépendance système optionnelle: pas de verrou entre processus
+    fcntl = None
+
+
+class ArchiveInProgress(Exception):
+    """Un autre archivage est en cours"""
+    pass
+
+
+def partition_for(timestamp):
+    return timestamp.year * 100 + timestamp.month
+
+
+class InteractionArchiver:
+    """Déplace les interactions anciennes vers l'archive compressée"""
+
+    def __init__(self, after_days=None, batch_size=None, lock_path=None):
+        self.after_days = after_days or getattr(settings, 'INTERACTION_ARCHIVE_AFTER_DAYS', 90)
+        self.batch_size = batch_size or getattr(settings, 'INTERACTION_ARCHIVE_BATCH_SIZE', 500)
+        # Hors de l'espace temporaire des uploads (balayé) et des verrous d'analyse
+        self.lock_path = lock_path or getattr(settings, 'INTERACTION_ARCHIVE_LOCK_PATH', '') \
+            or os.path.join(tempfile.gettempdir(), 'kachele_archive_interactions.lock')
+
+    @contextmanager
+    def exclusive(self):
+        """Verrou exclusif de l'archivage (ArchiveInProgress si un autre processus le détient)"""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        with open(self.lock_path, 'a') as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise ArchiveInProgress("Another archive_interactions run is in progress")
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def candidates(self, after_days=None):
+        cutoff = timezone.now() - timedelta(days=after_days or self.after_days)
+        return Interaction.objects.filter(timestamp__lt=cutoff).order_by('timestamp')
+
+    def _prompt_blobs(self, prompts):
+        """({sha256: PromptBlob}, prompts créés, octets stockés) pour les prompts du lot"""
+        by_hash = {hashlib.sha256(prompt.encode('utf-8')).hexdigest(): prompt for prompt in prompts}
+        existing = PromptBlob.objects.in_bulk(list(by_hash), field_name='sha256')
+        missing = []
+        for sha256, prompt in by_hash.items():
+            if sha256 not in existing:
+                codec, data = text_codec.compress(prompt)
+                missing.append(PromptBlob(sha256=sha256, codec=codec, data=data, size_bytes=len(prompt.encode('utf-8'))))
+        if missing:
+            # ignore_conflicts: un archivage concurrent peut avoir créé le même prompt
+            PromptBlob.objects.bulk_create(missing, ignore_conflicts=True)
+            existing = PromptBlob.objects.in_bulk(list(by_hash), field_name='sha256')
+        return existing, len(missing), sum(len(blob.data) for blob in missing)
+
+    def archive_batch(self, interactions):
+        """Archive une liste d'Interaction; renvoie les compteurs du lot"""
+        blobs, new_prompts, stored_bytes = self._prompt_blobs([interaction.gemini_prompt for interaction in interactions])
+        rows, original_bytes = [], 0
+        for interaction in interactions:
+            prompt = blobs[hashlib.sha256(interaction.gemini_prompt.encode('utf-8')).hexdigest()]
+            codec, data = text_codec.compress(interaction.gemini_response)
+            original_bytes += len(interaction.gemini_prompt.encode('utf-8')) + len(interaction.gemini_response.encode('utf-8'))
+            stored_bytes += len(data)
+            rows.append(InteractionArchive(
+                id=interaction.id,
+                session_id=interaction.session_id,
+                interaction_type=interaction.interaction_type,
+                timestamp=interaction.timestamp,
+                partition=partition_for(interaction.timestamp),
+                prompt=prompt,
+                response_codec=codec,
+                response_data=data,
+                user_response=interaction.user_response,
+                is_correct=interaction.is_correct,
+                model_name=interaction.model_name,
+                context_data=interaction.context_data,
+            ))
+
+        with transaction.atomic():
+            InteractionArchive.objects.bulk_create(rows, ignore_conflicts=True)
+            Interaction.objects.filter(id__in=[row.id for row in rows]).delete()
+        return {'archived': len(rows), 'new_prompts': new_prompts, 'original_bytes': original_bytes, 'stored_bytes': stored_bytes}
+
+    def archive(self, after_days=None, limit=None, on_batch=None):
+        """Archive par lots toutes les interactions plus anciennes que after_days (au plus limit)"""
+        totals = {'archived': 0, 'new_prompts': 0, 'original_bytes': 0, 'stored_bytes': 0}
+        while limit is None or totals['archived'] < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - totals['archived'])
+            batch = list(self.candidates(after_days)[:size])
+            if not batch:
+                break
+            counts = self.archive_batch(batch)
+            for name, value in counts.items():
+                totals[name] += value
+            if on_batch:
+                on_batch(totals)
+        return totals
+
+    def purge_orphan_prompts(self):
+        """
+        Supprime les prompts qui ne sont plus référencés (sessions supprimées).
+        À appeler sous exclusive(): sans verrou, un archivage concurrent perdrait ses nouveaux prompts.
+        """
+        used = InteractionArchive.objects.filter(prompt=OuterRef('pk'))
+        deleted, _ = PromptBlob.objects.exclude(Exists(used)).delete()
+        return deleted
+
+    def vacuum(self):
+        """Rend l'espace libéré au système de fichiers (taille des fichiers et des sauvegardes)"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('VACUUM')
+            elif connection.vendor == 'postgresql':
+                cursor.execute(f'VACUUM ANALYZE {Interaction._meta.db_table}')
+
+
+# Instance singleton de l'archivage
+interaction_archiver = InteractionArchiver()
@@ -0,0 +1,332 @@
+"""
+File d'attente des analyses Gemini
+Table AnalysisJob + pool de workers locaux (threads), sans broker externe
+"""
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import os
+import socket
+import threading
+import time
+
+from .models import AnalysisJob, ConceptMap
+from .gemini_service import gemini_service
+from .analysis_cache import analysis_cache, make_cache_key
+from .context_cache import context_cache
+from .scratch import scratch_space
+from .singleflight import analysis_flights
+
+logger = logging.getLogger(__name__)
+
+# Noms de fichiers pour lesquels le failover de démonstration est autorisé
+MOCK_FAILOVER_KEYWORDS = ["demo", "code", "math", "pdf", "rapport", "test"]
+
+
+class TempFileWrapper:
+    """Expose un chemin local (.path) et le hash du contenu (.content_hash) attendus par GeminiService"""
+    def __init__(self, path, content_hash=''):
+        self.path = path
+        self.content_hash = content_hash
+
+
+def enqueue_analysis(upload, file_path, context="", speed_mode=False):
+    """Crée une tâche d'analyse et réveille le pool de workers"""
+    job = AnalysisJob.objects.create(
+        upload=upload,
+        file_path=file_path,
+        context=context,
+        speed_mode=speed_mode
+    )
+    if getattr(settings, 'ANALYSIS_WORKERS_IN_PROCESS', True):
+        worker_pool.start()
+    worker_pool.notify()
+    return job
+
+
+def run_gemini_analysis(mode, content_type, file_path, context="", speed_mode=False, content_hash='', on_progress=None):
+    """Appelle la bonne méthode GeminiService selon le mode de session et le type de contenu"""
+    if mode == 'video' and content_type == 'video':
+        return gemini_service.analyze_video(
+            TempFileWrapper(file_path, content_hash),
+            context=context,
+            speed_mode=speed_mode,
+            on_progress=on_progress
+        )
+    if mode == 'problem' and content_type == 'image':
+        return gemini_service.analyze_image_problem(
+            file_path,  # PIL.Image.open accepte directement le chemin
+            subject_hint=context,
+            speed_mode=speed_mode,
+            content_hash=content_hash,
+            on_progress=on_progress
+        )
+    if mode == 'document' and content_type == 'document':
+        return gemini_service.analyze_document(
+            TempFileWrapper(file_path, content_hash),
+            focus_areas=context,
+            speed_mode=speed_mode,
+            on_progress=on_progress
+        )
+    if mode == 'creative' and content_type == 'image':
+        return gemini_service.creative_workshop(
+            file_path,
+            creative_goal=context,
+            speed_mode=speed_mode,
+            content_hash=content_hash,
+            on_progress=on_progress
+        )
+    return None
+
+
+def _update_job(job, **fields):
+    """Met à jour uniquement les colonnes modifiées de la tâche (et son heartbeat)"""
+    fields.setdefault('heartbeat_at', timezone.now())
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=list(fields.keys()))
+
+
+def process_analysis_job(job):
+    """Exécute une tâche d'analyse et persiste son résultat (ou le failover)"""
+    from .views import clean_gemini_error, get_mock_analysis
+
+    upload = job.upload
+    session = upload.session
+
+    try:
+        _update_job(job, progress=10)
+        print(f"DEBUG: [job {job.id}] Calling Gemini (Mode: {session.mode})...")
+        if job.speed_mode:
+            print(f"DEBUG: ⚡ SPEED MODE activated for {upload.filename}")
+
+        def report_progress(done, total, partial_analysis):
+            # Analyse progressive (étapes, ou morceaux d'un document volumineux): le résultat partiel
+            # est consultable par le client et l'upload devient exploitable par le tuteur
+            _update_job(job, progress=10 + (80 * done) // total, result=partial_analysis)
+            if not any(partial_analysis.values()):
+                return
+            fields = upload.set_analysis(partial_analysis)
+            upload.analysis_stage = done
+            upload.analysis_stage_count = total
+            upload.save(update_fields=fields + ['analysis_stage', 'analysis_stage_count'])
+
+        def analyse(on_progress):
+            result = run_gemini_analysis(
+                session.mode,
+                upload.content_type,
+                job.file_path,
+                context=job.context,
+                speed_mode=job.speed_mode,
+                content_hash=upload.content_hash,
+                on_progress=on_progress
+            )
+            # Mise en cache avant de rendre la main: les workers en attente la trouvent.
+            # Une analyse dont une étape a échoué n'est pas mise en cache (elle sera refaite)
+            if result and result.get('success') and not result['analysis'].get('missing_stages'):
+                analysis_cache.set(
+                    upload.content_hash,
+                    session.mode,
+                    result['analysis'],
+                    context=job.context,
+                    speed_mode=job.speed_mode
+                )
+            return result
+
+        def cached_result():
+            cached = analysis_cache.get(upload.content_hash, session.mode, context=job.context, speed_mode=job.speed_mode)
+            return {"success": True, "analysis": cached} if cached is not None else None
+
+        # Uploads identiques analysés en même temps: un seul appel Gemini (voir singleflight)
+        flight_key = make_cache_key(upload.content_hash, session.mode, job.context, job.speed_mode)[0] if upload.content_hash else ''
+        analysis_result = analysis_flights.run(flight_key, analyse, recheck=cached_result, on_progress=report_progress)
+
+        if analysis_result and analysis_result.get('success'):
+            analysis_data = analysis_result.get('analysis', {})
+            _update_job(job, progress=90)
+
+            # Sauvegarder l'analyse
+            upload.analysis_completed = True
+            upload.set_analysis(analysis_data)
+            upload.save()
+            session.save(update_fields=['updated_at'])  # Les compteurs sont incrémentés par session_stats
+
+            # Le chat porte désormais sur ce contenu: libérer les caches de contexte des uploads précédents
+            for previous in session.uploads.exclude(id=upload.id).exclude(context_caches={}):
+                context_cache.evict(gemini_service.client, previous)
+
+            if session.mode == 'document' and 'concept_map' in analysis_data:
+                cmap_data = analysis_data.get('concept_map', {})
+                ConceptMap.objects.create(
+                    session=session,
+                    nodes=cmap_data.get('nodes', []),
+                    edges=cmap_data.get('edges', [])
+                )
+
+            _update_job(job, status='completed', progress=100, result=analysis_data, finished_at=timezone.now())
+            return
+
+        raw_error = analysis_result.get('error', 'Analysis failed') if analysis_result else 'No analysis performed'
+        print(f"DEBUG: [job {job.id}] FAILED! Raw Error from Gemini: {raw_error}")
+        error_msg, status_code = clean_gemini_error(raw_error)
+
+        # FAILOVER: If quota hit or model overloaded, use MOCK data
+        if status_code in [429, 503] and any(x in upload.filename.lower() for x in MOCK_FAILOVER_KEYWORDS):
+            print(f"DEBUG: QUOTA HIT! Activating Mock Failover for {upload.filename}")
+            mock_data = get_mock_analysis(upload.filename, session.mode)
+            upload.analysis_completed = True
+            upload.set_analysis(mock_data)
+            upload.save()
+            _update_job(job, status='completed', progress=100, result=mock_data, is_mock=True, finished_at=timezone.now())
+            return
+
+        friendly_msg = error_msg
+        if status_code == 429:
+            friendly_msg = "Désolé, le quota Gemini (Free Tier) est atteint. Veuillez patienter 60s ou utilisez un fichier de test ('demo_math.png')."
+        elif status_code == 503:
+            friendly_msg = "Désolé, le modèle Gemini est actuellement surchargé. Veuillez réessayer dans quelques instants ou utilisez un fichier de test."
+
+        _update_job(job, status='failed', error=friendly_msg, error_code=status_code, finished_at=timezone.now())
+
+    except Exception as e:
+        logger.exception("Analysis job %s crashed", job.id)
+        _update_job(job, status='failed', error=f"Erreur {type(e).__name__}: {str(e)}", error_code=500, finished_at=timezone.now())
+
+    finally:
+        # Nettoyage : Supprimer le fichier temporaire QUOI QU'IL ARRIVE
+        scratch_space.release(job.file_path)
+
+
+class AnalysisWorkerPool:
+    """Pool de threads qui consomment la table AnalysisJob"""
+
+    def __init__(self, size=None, poll_interval=None, job_timeout=None, max_attempts=None,
+                 heartbeat_interval=None, heartbeat_timeout=None):
+        self.size = size or getattr(settings, 'ANALYSIS_WORKERS', 2)
+        self.poll_interval = poll_interval or getattr(settings, 'ANALYSIS_QUEUE_POLL_INTERVAL', 2.0)
+        self.job_timeout = job_timeout or getattr(settings, 'ANALYSIS_JOB_TIMEOUT', 600)
+        self.max_attempts = max_attempts or getattr(settings, 'ANALYSIS_JOB_MAX_ATTEMPTS', 2)
+        self.heartbeat_interval = heartbeat_interval or getattr(settings, 'ANALYSIS_JOB_HEARTBEAT_INTERVAL', 15)
+        self.heartbeat_timeout = heartbeat_timeout or getattr(settings, 'ANALYSIS_JOB_HEARTBEAT_TIMEOUT', 90)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._running = set()  # Tâches en cours dans ce processus (heartbeat)
+        self._pid = None
+        self._last_recovery = None
+
+    def start(self):
+        """Démarre les workers (idempotent, redémarre après un fork)"""
+        # Les fichiers laissés par un worker interrompu sont balayés au démarrage puis périodiquement
+        scratch_space.start()
+        with self._lock:
+            if self._pid == os.getpid() and any(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._threads = []
+            for index in range(self.size):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    args=(f"{socket.gethostname()}:{self._pid}:{index}",),
+                    name=f"analysis-worker-{index}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            # Un seul thread rafraîchit le heartbeat de toutes les tâches en cours du processus,
+            # y compris pendant un long appel Gemini sans progression
+            thread = threading.Thread(target=self._heartbeat_loop, name='analysis-heartbeat', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _worker_loop(self, worker_id):
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            job = None
+            try:
+                self.requeue_stale_jobs()
+                job = self.claim_next_job(worker_id)
+                if job is not None:
+                    with self._lock:
+                        self._running.add(job.id)
+                    try:
+                        process_analysis_job(job)
+                    finally:
+                        with self._lock:
+                            self._running.discard(job.id)
+            except Exception:
+                logger.exception("Analysis worker %s error", worker_id)
+            finally:
+                close_old_connections()
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                AnalysisJob.objects.filter(id__in=running, status='running').update(heartbeat_at=timezone.now())
+            except Exception:
+                logger.exception("Analysis heartbeat error")
+            finally:
+                close_old_connections()
+
+    def claim_next_job(self, worker_id):
+        """Réserve atomiquement la plus ancienne tâche en attente"""
+        candidates = AnalysisJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)[:5]
+        for job_id in candidates:
+            claimed = AnalysisJob.objects.filter(id=job_id, status='pending').update(
+                status='running',
+                worker_id=worker_id,
+                started_at=timezone.now(),
+                heartbeat_at=timezone.now(),
+                attempts=F('attempts') + 1
+            )
+            if claimed:
+                return AnalysisJob.objects.select_related('upload__session').get(id=job_id)
+        return None
+
+    def requeue_stale_jobs(self):
+        """
+        Remet en file les tâches d'un worker mort (au plus une fois par minute): celles dont le
+        heartbeat a expiré. Une tâche longue dont le worker est vivant n'est jamais reprise.
+        """
+        if self._last_recovery is not None and time.monotonic() - self._last_recovery < 60:
+            return
+        self._last_recovery = time.monotonic()
+
+        now = timezone.now()
+        stale = AnalysisJob.objects.filter(status='running').filter(
+            Q(heartbeat_at__lt=now - timedelta(seconds=self.heartbeat_timeout))
+            # Tâches réservées avant l'ajout du heartbeat
+            | Q(heartbeat_at__isnull=True, started_at__lt=now - timedelta(seconds=self.job_timeout))
+        )
+        stale.filter(attempts__lt=self.max_attempts).update(status='pending', worker_id='')
+        stale.filter(attempts__gte=self.max_attempts).update(
+            status='failed',
+            error="Le traitement a expiré. Veuillez réessayer.",
+            error_code=504,
+            finished_at=timezone.now()
+        )
+
+
+# Instance singleton du pool
+worker_pool = AnalysisWorkerPool()
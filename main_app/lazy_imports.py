@@ -0,0 +1,35 @@
+"""
+Imports différés des dépendances lourdes (SDK google-genai, Pillow, httpx...)
+Le module n'est importé qu'au premier accès à l'un de ses attributs: le chargement des URL,
+les commandes manage.py et le démarrage des workers ne paient pas son coût
+(google.genai seul représente l'essentiel du temps d'import de l'application).
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """Se comporte comme le module name une fois le premier attribut demandé"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.db.models.functions import Length
+
+from main_app.interaction_archive import interaction_archiver, ArchiveInProgress
+from main_app import text_codec
+
+
+class Command(BaseCommand):
+    help = "Archive les interactions anciennes (prompts dédupliqués, textes compressés, partitions mensuelles)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help="Âge minimal des interactions archivées (défaut: INTERACTION_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=None, help="Interactions par transaction")
+        parser.add_argument('--limit', type=int, default=None, help="Nombre maximal d'interactions archivées")
+        parser.add_argument('--dry-run', action='store_true', help="Affiche ce qui serait archivé sans rien modifier")
+        parser.add_argument('--purge-prompts', action='store_true',
+                            help="Supprime aussi les prompts archivés qui ne sont plus référencés (sessions supprimées)")
+        parser.add_argument('--vacuum', action='store_true', help="VACUUM après l'archivage (rend l'espace disque)")
+
+    def handle(self, *args, **options):
+        if options['batch_size']:
+            interaction_archiver.batch_size = options['batch_size']
+        days = options['older_than_days'] or interaction_archiver.after_days
+
+        if options['dry_run']:
+            candidates = interaction_archiver.candidates(days)
+            text_chars = candidates.aggregate(
+                total=Sum(Length('gemini_prompt') + Length('gemini_response'))
+            )['total'] or 0
+            self.stdout.write(f"[DRY RUN] {candidates.count()} interaction(s) older than {days} days, "
+                              f"{text_chars / 1024 / 1024:.1f} M characters of prompt/response text "
+                              f"(codec: {text_codec.default_codec()})")
+            return
+
+        def report(totals):
+            self.stdout.write(f"  ... {totals['archived']} archived")
+
+        try:
+            with interaction_archiver.exclusive():
+                totals = interaction_archiver.archive(days, limit=options['limit'], on_batch=report)
+                if not totals['archived']:
+                    self.stdout.write(f"No interaction older than {days} days")
+                else:
+                    self._summary(days, totals)
+
+                if options['purge_prompts']:
+                    purged = interaction_archiver.purge_orphan_prompts()
+                    self.stdout.write(f"Removed {purged} unreferenced archived prompt(s)")
+        except ArchiveInProgress as e:
+            raise CommandError(str(e))
+
+        if options['vacuum']:
+            interaction_archiver.vacuum()
+            self.stdout.write("Database vacuumed")
+
+    def _summary(self, days, totals):
+        ratio = totals['original_bytes'] / totals['stored_bytes'] if totals['stored_bytes'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['archived']} interaction(s) older than {days} days "
+            f"({totals['new_prompts']} new distinct prompt(s)): "
+            f"{totals['original_bytes'] / 1024:.0f} KB of text stored in {totals['stored_bytes'] / 1024:.0f} KB "
+            f"(x{ratio:.1f}, codec: {text_codec.default_codec()})"
+        ))
@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from kachele_neural_sync import db_config
+
+
+class Command(BaseCommand):
+    help = ("Mesure les écritures concurrentes (tour de chat: Interaction + compteurs de session) depuis plusieurs "
+            "processus, sur la base configurée ou (--compare) sur SQLite par défaut vs SQLite réglé")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Processus écrivains simultanés (ex: workers gunicorn)")
+        parser.add_argument('--writes', type=int, default=200, help="Tours de chat écrits par processus")
+        parser.add_argument('--compare', action='store_true',
+                            help="Compare SQLite par défaut et SQLite réglé (WAL...) sur des bases temporaires")
+        parser.add_argument('--child', action='store_true', help="(interne) processus écrivain")
+        parser.add_argument('--start-at', type=float, default=0.0, help="(interne) départ commun des écrivains")
+
+    def handle(self, *args, **options):
+        if options['child']:
+            return self._child(options['writes'], options['start_at'])
+
+        if not options['compare']:
+            label = ', '.join(f"{k}={v}" for k, v in db_config.describe(settings.DATABASES['default']).items())
+            self._report(label, self._scenario(dict(os.environ), options['workers'], options['writes']))
+            return
+
+        tmp_dir = tempfile.mkdtemp(prefix='bench_db_writes_')
+        try:
+            for tuned in (False, True):
+                path = os.path.join(tmp_dir, f"bench_{'tuned' if tuned else 'default'}.sqlite3")
+                env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", DATABASE_SQLITE_TUNED=str(tuned))
+                self._manage(['migrate', '-v', '0'], env)
+                label = 'sqlite (WAL, busy_timeout, synchronous=NORMAL, mmap)' if tuned else 'sqlite (default)'
+                self._report(label, self._scenario(env, options['workers'], options['writes']))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _manage(self, arguments, env, **kwargs):
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), *arguments]
+        return subprocess.run(command, env=env, capture_output=True, text=True, check=True, **kwargs)
+
+    def _scenario(self, env, workers, writes):
+        """Lance les écrivains avec un départ commun et agrège leurs mesures"""
+        start_at = time.time() + 3  # Le temps que chaque processus démarre Django
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_db_writes',
+                   '--child', '--writes', str(writes), '--start-at', str(start_at)]
+        processes = [subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                     for _ in range(workers)]
+
+        results = []
+        for process in processes:
+            stdout, stderr = process.communicate()
+            if process.returncode != 0:
+                raise CommandError(f"Writer failed:\n{stderr[-2000:]}")
+            results.append(json.loads(stdout.strip().splitlines()[-1]))
+
+        latencies = sorted(ms for result in results for ms in result['latencies_ms'])
+        elapsed = max(result['finished_at'] for result in results) - start_at
+        return {
+            'writes': len(latencies),
+            'locked': sum(result['locked'] for result in results),
+            'errors': sum(result['errors'] for result in results),
+            'elapsed': elapsed,
+            'p50_ms': statistics.median(latencies) if latencies else None,
+            'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        }
+
+    def _report(self, label, result):
+        self.stdout.write(f"{label}")
+        self.stdout.write(f"  {result['writes']} chat turns written in {result['elapsed']:.2f}s "
+                          f"-> {result['writes'] / result['elapsed']:.0f} turns/s")
+        if result['writes']:
+            self.stdout.write(f"  latency p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms")
+        failures = f"  'database is locked': {result['locked']}, other errors: {result['errors']}"
+        self.stdout.write(self.style.WARNING(failures) if result['locked'] or result['errors'] else failures)
+
+    def _child(self, writes, start_at):
+        from main_app.models import LearningSession, Interaction
+        from main_app.session_stats import SessionStats
+
+        stats = SessionStats(flush_interval=0)  # Une écriture par tour, comme le réglage par défaut
+        session = LearningSession.objects.create(mode='document', title='bench_db_writes')
+        time.sleep(max(0.0, start_at - time.time()))
+
+        latencies, locked, errors = [], 0, 0
+        for i in range(writes):
+            started = time.perf_counter()
+            try:
+                Interaction.objects.create(
+                    session=session,
+                    interaction_type='question',
+                    gemini_prompt=f"Question {i} ?",
+                    gemini_response='Réponse du tuteur. ' * 30,
+                    context_data={'bench': True},
+                )
+                stats.record(session, questions=1)
+                latencies.append((time.perf_counter() - started) * 1000)
+            except OperationalError as e:
+                if 'locked' in str(e):
+                    locked += 1
+                else:
+                    errors += 1
+        finished_at = time.time()
+
+        try:
+            session.delete()  # Interactions supprimées en cascade
+        except OperationalError:
+            pass
+        connection.close()
+        self.stdout.write(json.dumps({
+            'latencies_ms': latencies, 'locked': locked, 'errors': errors, 'finished_at': finished_at,
+        }))
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+
+from main_app.gemini_service import GeminiService
+
+
+class _StubResponse:
+    text = "Quelle est, selon toi, l'idée principale de ce contenu ?"
+
+
+class _StubChat:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def send_message(self, message, config=None):
+        time.sleep(self.latency)
+        return _StubResponse()
+
+
+class _AsyncStubChat(_StubChat):
+    async def send_message(self, message, config=None):
+        await asyncio.sleep(self.latency)
+        return _StubResponse()
+
+
+class _StubChats:
+    def __init__(self, chat_class, latency):
+        self.chat_class = chat_class
+        self.latency = latency
+
+    def create(self, model, config=None, history=None):
+        return self.chat_class(self.latency)
+
+
+class _StubAio:
+    def __init__(self, latency):
+        self.chats = _StubChats(_AsyncStubChat, latency)
+
+
+class StubClient:
+    """Client Gemini simulé: chaque tour de chat dure `latency` secondes (attente réseau)"""
+    def __init__(self, latency):
+        self.chats = _StubChats(_StubChat, latency)
+        self.aio = _StubAio(latency)
+
+
+class Command(BaseCommand):
+    help = "Compare le débit des tours de chat bloquants (threads) et asynchrones (une boucle ASGI) avec un client simulé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Nombre de tours de chat simulés")
+        parser.add_argument('--latency', type=float, default=0.5, help="Latence simulée d'un appel Gemini (s)")
+        parser.add_argument('--threads', type=int, default=4, help="Threads disponibles côté bloquant (ex: workers gunicorn sync)")
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        latency = options['latency']
+        threads = options['threads']
+
+        service = GeminiService()
+        service.api_key = 'benchmark'
+        service.client = StubClient(latency)
+
+        def sync_turn(i):
+            chat = service.start_interactive_session(context=f"bench {i}")
+            return service.send_message("Question ?", chat_session=chat)
+
+        async def async_turn(i):
+            chat = await service.astart_interactive_session(context=f"bench {i}")
+            return await service.asend_message("Question ?", chat_session=chat)
+
+        async def run_async():
+            return await asyncio.gather(*(async_turn(i) for i in range(total)))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(sync_turn, range(total)))
+        sync_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(run_async())
+        async_elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"{total} chat turns, simulated latency {latency}s")
+        self.stdout.write(f"  sync  ({threads} threads): {sync_elapsed:.2f}s  -> {total / sync_elapsed:.1f} req/s")
+        self.stdout.write(f"  async (1 event loop):  {async_elapsed:.2f}s  -> {total / async_elapsed:.1f} req/s")
+        self.stdout.write(self.style.SUCCESS(f"  speedup: x{sync_elapsed / async_elapsed:.1f}"))
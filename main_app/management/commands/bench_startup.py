@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Dépendances lourdes qui ne doivent pas être chargées au démarrage (voir main_app/lazy_imports.py)
+HEAVY_MODULES = ['google.genai', 'PIL', 'httpx', 'tenacity']
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+STARTUP_SCRIPT = """
+import django
+django.setup()
+import {target}
+"""
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps de démarrage (django.setup + chargement des URL) avec python -X importtime"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Nombre de démarrages mesurés (médiane)")
+        parser.add_argument('--top', type=int, default=15, help="Nombre de modules les plus coûteux affichés")
+        parser.add_argument('--target', default='kachele_neural_sync.urls', help="Module importé après django.setup()")
+        parser.add_argument('--budget-ms', type=float, default=None, help="Échec si la médiane dépasse ce budget (CI)")
+
+    def _run(self, target):
+        """Un démarrage dans un processus neuf: (durée totale des imports en ms, {module: cumulé ms})"""
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'kachele_neural_sync.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT.format(target=target)],
+            capture_output=True, text=True, env=env, cwd=os.getcwd()
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+
+        modules, total = {}, 0
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+            modules[name] = cumulative / 1000
+            if indent == 1:  # Import de premier niveau: le cumulé inclut ses dépendances
+                total += cumulative
+        return total / 1000, modules
+
+    def handle(self, *args, **options):
+        runs = [self._run(options['target']) for _ in range(max(options['runs'], 1))]
+        totals = [total for total, _ in runs]
+        median = statistics.median(totals)
+        _, modules = runs[totals.index(median)] if median in totals else runs[0]
+
+        self.stdout.write(f"Startup imports ({options['target']}), {len(runs)} run(s): "
+                          f"median {median:.0f} ms, min {min(totals):.0f} ms, max {max(totals):.0f} ms")
+
+        self.stdout.write(f"Top {options['top']} modules (cumulative ms):")
+        for name, ms in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f"  {ms:8.1f}  {name}")
+
+        loaded = [name for name in HEAVY_MODULES if name in modules]
+        if loaded:
+            self.stdout.write(self.style.WARNING(f"Heavy modules imported at startup: {', '.join(loaded)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No heavy module imported at startup"))
+
+        budget = options['budget_ms']
+        if budget is not None and median > budget:
+            raise CommandError(f"Startup imports take {median:.0f} ms, over the {budget:.0f} ms budget")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from main_app.gemini_service import gemini_service
+from main_app.gemini_files import gemini_file_registry
+
+
+class Command(BaseCommand):
+    help = "Supprime les fichiers Gemini expirés ou inutilisés (à lancer périodiquement, ex: cron horaire)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Affiche ce qui serait supprimé sans rien supprimer")
+
+    def handle(self, *args, **options):
+        if not options['dry_run'] and gemini_service.client is None:
+            self.stderr.write(self.style.ERROR("Gemini client not configured (GOOGLE_API_KEY)."))
+            return
+
+        report = gemini_file_registry.cleanup(gemini_service.client, dry_run=options['dry_run'])
+        prefix = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(f"{prefix}{report['expired']} expired entr(y/ies) removed")
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{report['deleted']} remote file(s) deleted, {report['errors']} error(s)"))
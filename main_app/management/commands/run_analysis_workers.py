@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+import time
+
+from main_app.gemini_service import gemini_service
+from main_app.job_queue import AnalysisWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Lance un pool de workers dédié qui traite la file d'attente des analyses Gemini"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Nombre de threads (défaut: ANALYSIS_WORKERS)")
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'GEMINI_WARMUP_ON_BOOT', True):
+            gemini_service.warm_up()
+        pool = AnalysisWorkerPool(size=options['workers'])
+        pool.start()
+        self.stdout.write(self.style.SUCCESS(f"{pool.size} analysis worker(s) started. Ctrl+C to stop."))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping analysis workers...")
+            pool.stop(timeout=5)
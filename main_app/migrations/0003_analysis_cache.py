@@ -0,0 +1,39 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0002_alter_uploadedcontent_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('mode', models.CharField(choices=[('video', 'Learn While You Watch'), ('problem', 'Visual Problem Solver'), ('document', 'Document Intelligence'), ('creative', 'Creative Workshop')], max_length=20)),
+                ('context_hash', models.CharField(max_length=64)),
+                ('speed_mode', models.BooleanField(default=False)),
+                ('analysis', models.JSONField(default=dict)),
+                ('size_bytes', models.IntegerField(default=0)),
+                ('hit_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_accessed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['-last_accessed_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
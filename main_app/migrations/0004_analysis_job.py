@@ -0,0 +1,39 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:05
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0003_analysis_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('progress', models.IntegerField(default=0)),
+                ('file_path', models.CharField(max_length=500)),
+                ('context', models.TextField(blank=True)),
+                ('speed_mode', models.BooleanField(default=False)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('is_mock', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('error_code', models.IntegerField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('worker_id', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='main_app.uploadedcontent')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0004_analysis_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSessionState',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='chat_state', serialize=False, to='main_app.learningsession')),
+                ('context', models.TextField(blank=True)),
+                ('user_level', models.CharField(default='intermediate', max_length=20)),
+                ('history', models.JSONField(blank=True, default=list)),
+                ('version', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
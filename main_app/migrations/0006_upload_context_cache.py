@@ -0,0 +1,28 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_chat_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='context_cache_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='context_cache_key',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='context_cache_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_upload_context_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('uri', models.CharField(blank=True, max_length=500)),
+                ('mime_type', models.CharField(blank=True, max_length=100)),
+                ('state', models.CharField(default='PROCESSING', max_length=20)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'ordering': ['-last_used_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='gemini_file',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='main_app.geminifile'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0007_gemini_file_registry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsessionstate',
+            name='analysis_version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='analysis_stage',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='analysis_stage_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
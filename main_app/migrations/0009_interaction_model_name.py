@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0008_upload_analysis_stages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interaction',
+            name='model_name',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
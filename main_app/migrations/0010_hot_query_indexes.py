@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0009_interaction_model_name'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='uploadedcontent',
+            options={'ordering': ['uploaded_at']},
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['session', 'timestamp'], name='interaction_session_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedcontent',
+            index=models.Index(fields=['session', 'uploaded_at'], name='upload_session_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedcontent',
+            index=models.Index(condition=models.Q(('analysis_completed', True), ('analysis_stage__gt', 0), _connector='OR'), fields=['session', 'uploaded_at'], name='upload_session_ready_idx'),
+        ),
+    ]
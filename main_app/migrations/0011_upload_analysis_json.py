@@ -0,0 +1,87 @@
+import json
+
+from django.db import migrations, models
+
+
+def analysis_columns(analysis):
+    # Copie de UploadedContent.set_analysis (les migrations n'utilisent pas les méthodes des modèles)
+    columns = {
+        'summary': str(analysis.get('summary') or ''),
+        'difficulty': str(analysis.get('difficulty_level') or analysis.get('difficulty') or '')[:32],
+        'problem_type': str(analysis.get('problem_type') or '')[:255],
+    }
+    if 'key_concepts' in analysis:
+        columns['key_concepts'] = analysis['key_concepts']
+    return columns
+
+
+def text_to_json(apps, schema_editor):
+    UploadedContent = apps.get_model('main_app', 'UploadedContent')
+    batch = []
+    for upload in UploadedContent.objects.exclude(analysis_summary='').iterator(chunk_size=500):
+        try:
+            analysis = json.loads(upload.analysis_summary)
+        except ValueError:
+            analysis = {'summary': upload.analysis_summary}
+        if not isinstance(analysis, dict):
+            analysis = {'summary': str(analysis)}
+        upload.analysis = analysis
+        for name, value in analysis_columns(analysis).items():
+            setattr(upload, name, value)
+        batch.append(upload)
+        if len(batch) >= 500:
+            UploadedContent.objects.bulk_update(batch, ['analysis', 'summary', 'key_concepts', 'difficulty', 'problem_type'])
+            batch = []
+    if batch:
+        UploadedContent.objects.bulk_update(batch, ['analysis', 'summary', 'key_concepts', 'difficulty', 'problem_type'])
+
+
+def json_to_text(apps, schema_editor):
+    UploadedContent = apps.get_model('main_app', 'UploadedContent')
+    batch = []
+    for upload in UploadedContent.objects.exclude(analysis={}).iterator(chunk_size=500):
+        upload.analysis_summary = json.dumps(upload.analysis)
+        batch.append(upload)
+        if len(batch) >= 500:
+            UploadedContent.objects.bulk_update(batch, ['analysis_summary'])
+            batch = []
+    if batch:
+        UploadedContent.objects.bulk_update(batch, ['analysis_summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='analysis',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='summary',
+            field=models.TextField(blank=True, default=''),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='difficulty',
+            field=models.CharField(blank=True, default='', max_length=32),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='problem_type',
+            field=models.CharField(blank=True, default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(text_to_json, json_to_text),
+        migrations.RemoveField(
+            model_name='uploadedcontent',
+            name='analysis_summary',
+        ),
+    ]
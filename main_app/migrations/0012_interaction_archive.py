@@ -0,0 +1,62 @@
+# Generated by Django 5.2.10 on 2026-10-17 02:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0011_upload_analysis_json'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionArchive',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('interaction_type', models.CharField(choices=[('question', 'Question'), ('answer', 'Answer'), ('hint', 'Hint'), ('explanation', 'Explanation'), ('feedback', 'Feedback')], max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('partition', models.PositiveIntegerField(db_index=True)),
+                ('response_codec', models.CharField(default='raw', max_length=8)),
+                ('response_data', models.BinaryField()),
+                ('user_response', models.TextField(blank=True)),
+                ('is_correct', models.BooleanField(blank=True, null=True)),
+                ('model_name', models.CharField(blank=True, max_length=64)),
+                ('context_data', models.JSONField(blank=True, default=dict)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PromptBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('codec', models.CharField(default='raw', max_length=8)),
+                ('data', models.BinaryField()),
+                ('size_bytes', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['timestamp'], name='interaction_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='interactionarchive',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_interactions', to='main_app.learningsession'),
+        ),
+        migrations.AddField(
+            model_name='interactionarchive',
+            name='prompt',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='interactions', to='main_app.promptblob'),
+        ),
+        migrations.AddIndex(
+            model_name='interactionarchive',
+            index=models.Index(fields=['session', 'timestamp'], name='archive_session_time_idx'),
+        ),
+    ]
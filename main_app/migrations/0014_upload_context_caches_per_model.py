@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+# Les caches déjà créés ne sont pas repris (modèle inconnu): Gemini les supprime à l'expiration de leur TTL
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0013_analysis_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='uploadedcontent',
+            name='context_cache_expires_at',
+        ),
+        migrations.RemoveField(
+            model_name='uploadedcontent',
+            name='context_cache_key',
+        ),
+        migrations.RemoveField(
+            model_name='uploadedcontent',
+            name='context_cache_name',
+        ),
+        migrations.AddField(
+            model_name='uploadedcontent',
+            name='context_caches',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
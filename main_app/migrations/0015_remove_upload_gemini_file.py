@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-17 03:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0014_upload_context_caches_per_model'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='uploadedcontent',
+            name='gemini_file',
+        ),
+    ]
@@ -0,0 +1,204 @@
+"""
+Routage des appels Gemini vers des paliers de modèles
+Chaque type d'appel (route) a une liste ordonnée de modèles, du plus capable au plus rapide.
+Le routeur descend d'un palier quand le modèle courant est sous pression (disjoncteur ouvert,
+file d'attente de l'ordonnanceur, latence au-delà de l'objectif de la route, taux d'erreurs)
+et remonte quand le palier supérieur est de nouveau sain, avec un délai minimal entre deux
+changements pour ne pas osciller.
+"""
+from django.conf import settings
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+
+from .gemini_scheduler import gemini_scheduler, SchedulerTimeout
+from .gemini_resilience import gemini_resilience, CircuitOpenError, is_retryable
+from .lazy_imports import lazy_module
+
+types = lazy_module('google.genai.types')
+
+DEFAULT_MODEL = "gemini-3-flash-preview"
+
+# Paliers par route (le premier modèle est le modèle nominal)
+DEFAULT_MODEL_TIERS = {
+    'chat': [DEFAULT_MODEL, 'gemini-2.5-flash', 'gemini-2.5-flash-lite'],
+    'hint': [DEFAULT_MODEL, 'gemini-2.5-flash-lite'],
+    'first_question': [DEFAULT_MODEL, 'gemini-2.5-flash-lite'],
+    'evaluation': [DEFAULT_MODEL, 'gemini-2.5-flash'],
+    'analysis': [DEFAULT_MODEL, 'gemini-2.5-flash'],
+    'analysis_fast': [DEFAULT_MODEL, 'gemini-2.5-flash', 'gemini-2.5-flash-lite'],
+    'bulk': [DEFAULT_MODEL, 'gemini-2.5-flash'],
+}
+
+# Objectif de latence par route (secondes, p95 de l'appel complet: attente et nouvelles tentatives comprises)
+DEFAULT_ROUTE_SLO_SECONDS = {
+    'chat': 15,
+    'hint': 8,
+    'first_question': 8,
+    'evaluation': 15,
+    'analysis': 120,
+    'analysis_fast': 60,
+    'bulk': 240,
+}
+
+# Niveau de réflexion par route (les autres gardent celui de leur configuration): les indices et la
+# première question doivent arriver vite, dès le palier nominal
+DEFAULT_ROUTE_THINKING = {'hint': 'LOW', 'first_question': 'LOW'}
+
+# Route par défaut selon la priorité de l'ordonnanceur
+PRIORITY_ROUTES = {'interactive': 'chat', 'analysis': 'analysis', 'bulk': 'bulk'}
+
+# Les modèles antérieurs à Gemini 3 n'acceptent pas thinking_level: budget équivalent (-1 = dynamique)
+THINKING_BUDGETS = {'LOW': 1024, 'HIGH': -1}
+
+
+def route_for(priority):
+    return PRIORITY_ROUTES.get(priority, 'analysis')
+
+
+def adapt_config(config, model, route=None):
+    """
+    Configuration compatible avec model (thinking_level -> thinking_budget hors Gemini 3),
+    avec le niveau de réflexion propre à la route s'il y en a un
+    """
+    thinking = getattr(config, 'thinking_config', None)
+    route_thinking = dict(DEFAULT_ROUTE_THINKING, **getattr(settings, 'GEMINI_ROUTE_THINKING', {})).get(route)
+    if route_thinking and thinking is not None:
+        thinking = types.ThinkingConfig(thinking_level=route_thinking)
+        config = config.model_copy(update={'thinking_config': thinking})
+    if model.startswith('gemini-3') or thinking is None or thinking.thinking_level is None:
+        return config
+    level = str(getattr(thinking.thinking_level, 'value', thinking.thinking_level)).upper()
+    return config.model_copy(update={
+        'thinking_config': types.ThinkingConfig(thinking_budget=THINKING_BUDGETS.get(level, -1))
+    })
+
+
+class _RouteHealth:
+    """Derniers appels (horodatage, durée, échec) d'un modèle sur une route"""
+
+    def __init__(self, size=100):
+        self.calls = deque(maxlen=size)
+
+    def recent(self, now, window):
+        return [call for call in self.calls if call[0] > now - window]
+
+    def p95(self, calls):
+        ordered = sorted(seconds for _, seconds, _ in calls)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class ModelRouter:
+    """Choisit le modèle de chaque appel selon sa route et l'état mesuré des paliers"""
+
+    def __init__(self, clock=None):
+        self._clock = clock or time.monotonic  # Injectable (tests)
+        self.tiers = dict(DEFAULT_MODEL_TIERS, **getattr(settings, 'GEMINI_MODEL_TIERS', {}))
+        self.slo = dict(DEFAULT_ROUTE_SLO_SECONDS, **getattr(settings, 'GEMINI_ROUTE_SLO_SECONDS', {}))
+        self.enabled = getattr(settings, 'GEMINI_ROUTER_ENABLED', True)
+        self.window = getattr(settings, 'GEMINI_ROUTER_WINDOW_SECONDS', 120)
+        self.min_samples = getattr(settings, 'GEMINI_ROUTER_MIN_SAMPLES', 5)
+        self.max_error_rate = getattr(settings, 'GEMINI_ROUTER_MAX_ERROR_RATE', 0.3)
+        self.max_queue = getattr(settings, 'GEMINI_ROUTER_MAX_QUEUE', 8)
+        self.min_interval = getattr(settings, 'GEMINI_ROUTER_MIN_INTERVAL_SECONDS', 30)
+        self.upgrade_after = getattr(settings, 'GEMINI_ROUTER_UPGRADE_AFTER_SECONDS', 180)
+        self._lock = threading.Lock()
+        self._routes = {}  # route -> {'level', 'changed_at', 'reason', 'downgrades', 'upgrades'}
+        self._health = {}  # (route, model) -> _RouteHealth
+
+    def _tiers(self, route):
+        return self.tiers.get(route) or self.tiers['chat']
+
+    def _pressure(self, route, model, now):
+        """Raison de quitter ce modèle sur cette route, ou None s'il est sain"""
+        if gemini_resilience.circuit_state(model) == 'open':
+            return 'circuit_open'
+        if gemini_scheduler.queue_depth(model) >= self.max_queue:
+            return 'queue'
+        health = self._health.get((route, model))
+        calls = health.recent(now, self.window) if health else []
+        if len(calls) < self.min_samples:
+            return None  # Trop peu de mesures récentes (ex: palier abandonné depuis un moment)
+        if sum(1 for *_, failed in calls if failed) / len(calls) >= self.max_error_rate:
+            return 'errors'
+        if health.p95(calls) > self.slo.get(route, self.slo['chat']):
+            return 'latency'
+        return None
+
+    def pick(self, route):
+        """Modèle à utiliser pour un appel de cette route"""
+        tiers = self._tiers(route)
+        if not self.enabled or len(tiers) == 1:
+            return tiers[0]
+
+        with self._lock:
+            now = self._clock()
+            state = self._routes.setdefault(
+                route, {'level': 0, 'changed_at': 0.0, 'reason': None, 'downgrades': 0, 'upgrades': 0}
+            )
+            level = min(state['level'], len(tiers) - 1)
+            elapsed = now - state['changed_at']
+            reason = self._pressure(route, tiers[level], now)
+
+            # Disjoncteur ouvert: bascule immédiate, sinon hystérésis
+            if reason and level < len(tiers) - 1 and (reason == 'circuit_open' or elapsed >= self.min_interval):
+                level += 1
+                state.update(level=level, changed_at=now, reason=reason, downgrades=state['downgrades'] + 1)
+                print(f"DEBUG: ⬇️ Gemini route '{route}' downgraded to {tiers[level]} ({reason})")
+            elif not reason and level > 0 and elapsed >= self.upgrade_after \
+                    and self._pressure(route, tiers[level - 1], now) is None:
+                level -= 1
+                state.update(level=level, changed_at=now, reason=None, upgrades=state['upgrades'] + 1)
+                print(f"DEBUG: ⬆️ Gemini route '{route}' upgraded to {tiers[level]}")
+            return tiers[level]
+
+    def record(self, route, model, seconds, error=None):
+        """Mesure d'un appel: seules les erreurs de disponibilité (5xx, 429, file, disjoncteur) comptent"""
+        failed = error is not None and (
+            is_retryable(error) or isinstance(error, (SchedulerTimeout, CircuitOpenError))
+        )
+        with self._lock:
+            health = self._health.setdefault((route, model), _RouteHealth())
+            health.calls.append((self._clock(), seconds, failed))
+
+    @contextmanager
+    def measure(self, route, model):
+        """with model_router.measure(route, model): appel... (utilisable aussi autour d'un await)"""
+        started = self._clock()
+        try:
+            yield
+        except Exception as e:
+            self.record(route, model, self._clock() - started, e)
+            raise
+        self.record(route, model, self._clock() - started)
+
+    def stats(self):
+        with self._lock:
+            now = self._clock()
+            routes = {}
+            for route, tiers in self.tiers.items():
+                state = self._routes.get(route, {'level': 0, 'reason': None, 'downgrades': 0, 'upgrades': 0})
+                models = {}
+                for model in tiers:
+                    health = self._health.get((route, model))
+                    calls = health.recent(now, self.window) if health else []
+                    models[model] = {
+                        'calls': len(calls),
+                        'errors': sum(1 for *_, failed in calls if failed),
+                        'p95_seconds': health.p95(calls) if calls else None,
+                    }
+                routes[route] = {
+                    'model': tiers[min(state['level'], len(tiers) - 1)],
+                    'level': state['level'],
+                    'reason': state['reason'],
+                    'downgrades': state['downgrades'],
+                    'upgrades': state['upgrades'],
+                    'slo_seconds': self.slo.get(route),
+                    'models': models,
+                }
+            return {'enabled': self.enabled, 'routes': routes}
+
+
+# Instance singleton du routeur
+model_router = ModelRouter()
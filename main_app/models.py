@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
 
+from . import text_codec
+
 class LearningSession(models.Model):
     """Session d'apprentissage pour suivre la progression de l'utilisateur"""
     MODE_CHOICES = [
@@ -38,6 +41,36 @@ class LearningSession(models.Model):
         return (self.correct_answers / self.questions_asked) * 100
 
 
+class GeminiFile(models.Model):
+    """Fichier uploadé via l'API Gemini Files, réutilisable tant qu'il n'a pas expiré (48h côté Google)"""
+    content_hash = models.CharField(max_length=64, unique=True)  # SHA-256 du contenu local
+    name = models.CharField(max_length=255)  # ex: files/abc123
+    uri = models.CharField(max_length=500, blank=True)
+    mime_type = models.CharField(max_length=100, blank=True)
+    state = models.CharField(max_length=20, default='PROCESSING')
+    size_bytes = models.BigIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-last_used_at']
+    
+    def __str__(self):
+        return f"{self.name} ({self.state}) - {self.content_hash[:12]}"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
+
+
+class UploadedContentQuerySet(models.QuerySet):
+    def ready(self):
+        """Uploads exploitables par le tuteur: analyse terminée ou au moins sa première étape"""
+        return self.filter(models.Q(analysis_completed=True) | models.Q(analysis_stage__gt=0))
+
+
 class UploadedContent(models.Model):
     """Contenu uploadé par l'utilisateur (vidéos, images, documents)"""
     CONTENT_TYPE_CHOICES = [
@@ -52,17 +85,127 @@ class UploadedContent(models.Model):
     file = models.FileField(upload_to='uploads/%Y/%m/%d/', null=True, blank=True)
     filename = models.CharField(max_length=255)
     file_size = models.BigIntegerField()
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 du contenu
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
-    # Analyse Gemini
+    # Analyse Gemini (JSON complet) et ses champs les plus lus, en colonnes
     analysis_completed = models.BooleanField(default=False)
-    analysis_summary = models.TextField(blank=True)
+    analysis = models.JSONField(default=dict, blank=True)
+    summary = models.TextField(blank=True)
     key_concepts = models.JSONField(default=list, blank=True)
+    difficulty = models.CharField(max_length=32, blank=True)  # difficulty_level (vidéo) ou difficulty (problème)
+    problem_type = models.CharField(max_length=255, blank=True)
+    analysis_stage = models.PositiveSmallIntegerField(default=0)  # Étapes (ou parties) d'analyse déjà persistées
+    analysis_stage_count = models.PositiveSmallIntegerField(default=0)
+    
+    # Caches de contexte Gemini (instruction système + analyse) utilisés par le chat, un par modèle:
+    # {modèle: {'key': SHA-256 du contexte, 'name': 'cachedContents/abc123', 'expires_at': ISO 8601}}
+    context_caches = models.JSONField(default=dict, blank=True)
+    
+    objects = UploadedContentQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['uploaded_at']  # session.uploads.ready().last(): upload le plus récent
+        indexes = [
+            models.Index(fields=['session', 'uploaded_at'], name='upload_session_time_idx'),
+            # Index partiel des uploads exploitables (même condition que UploadedContentQuerySet.ready)
+            models.Index(
+                fields=['session', 'uploaded_at'],
+                condition=models.Q(analysis_completed=True) | models.Q(analysis_stage__gt=0),
+                name='upload_session_ready_idx',
+            ),
+        ]
+    
+    def set_analysis(self, analysis):
+        """Enregistre l'analyse et ses colonnes dérivées; renvoie les champs modifiés (update_fields)"""
+        self.analysis = analysis
+        self.summary = str(analysis.get('summary') or '')
+        if 'key_concepts' in analysis:
+            self.key_concepts = analysis['key_concepts']
+        self.difficulty = str(analysis.get('difficulty_level') or analysis.get('difficulty') or '')[:32]
+        self.problem_type = str(analysis.get('problem_type') or '')[:255]
+        return ['analysis', 'summary', 'key_concepts', 'difficulty', 'problem_type']
+    
+    @property
+    def analysis_version(self):
+        """Change à chaque étape d'analyse persistée (le contexte du chat est alors reconstruit)"""
+        return f"{self.id}:{self.analysis_stage}:{int(self.analysis_completed)}"
     
     def __str__(self):
         return f"{self.filename} - {self.content_type}"
 
 
+class AnalysisJob(models.Model):
+    """Tâche d'analyse Gemini en file d'attente (table DB, traitée par le pool de workers local)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    upload = models.ForeignKey(UploadedContent, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    progress = models.IntegerField(default=0)  # 0-100
+    
+    # Paramètres d'analyse
+    file_path = models.CharField(max_length=500)
+    context = models.TextField(blank=True)
+    speed_mode = models.BooleanField(default=False)
+    
+    # Résultat
+    result = models.JSONField(null=True, blank=True)
+    is_mock = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    error_code = models.IntegerField(null=True, blank=True)
+    
+    # Suivi d'exécution
+    attempts = models.IntegerField(default=0)
+    worker_id = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Rafraîchi par le worker tant qu'il traite la tâche
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"Job {self.id} ({self.status}) - {self.upload.filename}"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+
+class AnalysisCacheEntry(models.Model):
+    """Analyse Gemini mise en cache, adressée par le contenu du fichier et les paramètres d'analyse"""
+    cache_key = models.CharField(max_length=64, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    mode = models.CharField(max_length=20, choices=LearningSession.MODE_CHOICES)
+    context_hash = models.CharField(max_length=64)
+    speed_mode = models.BooleanField(default=False)
+    
+    analysis = models.JSONField(default=dict)
+    size_bytes = models.IntegerField(default=0)
+    hit_count = models.IntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-last_accessed_at']
+    
+    def __str__(self):
+        return f"{self.mode} - {self.content_hash[:12]} ({'speed' if self.speed_mode else 'quality'})"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
 class Interaction(models.Model):
     """Interaction entre l'utilisateur et Gemini"""
     INTERACTION_TYPE_CHOICES = [
@@ -84,16 +227,92 @@ class Interaction(models.Model):
     user_response = models.TextField(blank=True)
     is_correct = models.BooleanField(null=True, blank=True)
     
+    # Modèle Gemini qui a produit la réponse (choisi par model_router)
+    model_name = models.CharField(max_length=64, blank=True)
+    
     # Contexte
     context_data = models.JSONField(default=dict, blank=True)
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['session', 'timestamp'], name='interaction_session_time_idx'),
+            models.Index(fields=['timestamp'], name='interaction_time_idx'),  # Archivage par âge
+        ]
     
     def __str__(self):
         return f"{self.get_interaction_type_display()} at {self.timestamp}"
 
 
+class PromptBlob(models.Model):
+    """Prompt archivé, stocké une seule fois par contenu (SHA-256) et compressé"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    codec = models.CharField(max_length=8, default=text_codec.RAW)
+    data = models.BinaryField()
+    size_bytes = models.IntegerField(default=0)  # Taille non compressée
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size_bytes} bytes, {self.codec})"
+    
+    @property
+    def text(self):
+        return text_codec.decompress(self.codec, self.data)
+
+
+class InteractionArchive(models.Model):
+    """
+    Interaction archivée (voir main_app/interaction_archive.py): prompt dédupliqué, réponse compressée.
+    partition (AAAAMM) regroupe les lignes par mois pour les sauvegardes et les purges.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)  # Identifiant de l'Interaction d'origine
+    session = models.ForeignKey(LearningSession, on_delete=models.CASCADE, related_name='archived_interactions')
+    interaction_type = models.CharField(max_length=20, choices=Interaction.INTERACTION_TYPE_CHOICES)
+    timestamp = models.DateTimeField()
+    partition = models.PositiveIntegerField(db_index=True)
+    
+    prompt = models.ForeignKey(PromptBlob, on_delete=models.PROTECT, related_name='interactions')
+    response_codec = models.CharField(max_length=8, default=text_codec.RAW)
+    response_data = models.BinaryField()
+    user_response = models.TextField(blank=True)
+    is_correct = models.BooleanField(null=True, blank=True)
+    model_name = models.CharField(max_length=64, blank=True)
+    context_data = models.JSONField(default=dict, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['session', 'timestamp'], name='archive_session_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_interaction_type_display()} at {self.timestamp} (archived)"
+    
+    # Mêmes attributs de lecture qu'Interaction
+    @property
+    def gemini_prompt(self):
+        return self.prompt.text
+    
+    @property
+    def gemini_response(self):
+        return text_codec.decompress(self.response_codec, self.response_data)
+
+
+class ChatSessionState(models.Model):
+    """État sérialisé d'une conversation Gemini, partagé entre les workers"""
+    session = models.OneToOneField(LearningSession, on_delete=models.CASCADE, primary_key=True, related_name='chat_state')
+    context = models.TextField(blank=True)  # Contexte de l'instruction système
+    user_level = models.CharField(max_length=20, default='intermediate')
+    history = models.JSONField(default=list, blank=True)  # Liste de types.Content sérialisés
+    version = models.IntegerField(default=0)  # Incrémentée à chaque tour
+    analysis_version = models.CharField(max_length=64, blank=True)  # Étape d'analyse reflétée par le contexte
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    def __str__(self):
+        return f"Chat state for {self.session_id} (v{self.version})"
+
+
 class ConceptMap(models.Model):
     """Carte conceptuelle générée pour un document"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
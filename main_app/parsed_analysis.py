@@ -0,0 +1,71 @@
+"""
+Analyses décodées des uploads, en mémoire du processus
+Chaque tour de chat a besoin de l'analyse complète de l'upload courant (contexte du tuteur).
+Les vues chargent l'upload sans la colonne analysis (defer) et la lisent ici: décodée une fois
+par processus et par version d'analyse (nouvelle étape persistée, analyse terminée), au lieu
+d'un json.loads du document entier à chaque requête.
+Les dictionnaires renvoyés sont partagés: ne pas les modifier.
+"""
+from django.conf import settings
+from collections import OrderedDict
+import threading
+
+from .models import UploadedContent
+
+
+class ParsedAnalysisCache:
+    """LRU upload.id -> (analysis_version, analyse décodée)"""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or getattr(settings, 'PARSED_ANALYSIS_CACHE_MAX_ENTRIES', 256)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def _cached(self, upload):
+        with self._lock:
+            entry = self._entries.get(upload.id)
+            if entry is not None and entry[0] == upload.analysis_version:
+                self._entries.move_to_end(upload.id)
+                self._counters['hits'] += 1
+                return entry[1]
+            self._counters['misses'] += 1
+        return None
+
+    def _store(self, upload, analysis):
+        analysis = analysis or {}
+        with self._lock:
+            self._entries[upload.id] = (upload.analysis_version, analysis)
+            self._entries.move_to_end(upload.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return analysis
+
+    def get(self, upload):
+        """Analyse de l'upload ({} si aucune)"""
+        cached = self._cached(upload)
+        if cached is not None:
+            return cached
+        if 'analysis' in upload.get_deferred_fields():
+            analysis = UploadedContent.objects.filter(id=upload.id).values_list('analysis', flat=True).first()
+        else:
+            analysis = upload.analysis
+        return self._store(upload, analysis)
+
+    async def aget(self, upload):
+        cached = self._cached(upload)
+        if cached is not None:
+            return cached
+        if 'analysis' in upload.get_deferred_fields():
+            analysis = await UploadedContent.objects.filter(id=upload.id).values_list('analysis', flat=True).afirst()
+        else:
+            analysis = upload.analysis
+        return self._store(upload, analysis)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), max_entries=self.max_entries)
+
+
+# Instance singleton du cache d'analyses décodées
+parsed_analyses = ParsedAnalysisCache()
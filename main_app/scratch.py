@@ -0,0 +1,180 @@
+"""
+Espace de travail temporaire des uploads (scratch space)
+Chemins uniques par upload, quota disque, nettoyage des fichiers orphelins
+(workers interrompus) au démarrage puis périodiquement, et métriques d'usage.
+SCRATCH_DIR peut pointer vers un tmpfs (ex: /dev/shm/kachele) pour éviter le disque.
+"""
+from django.conf import settings
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ScratchQuotaExceeded(Exception):
+    """Le quota disque de l'espace temporaire est atteint"""
+    pass
+
+
+class ScratchSpace:
+    """Répertoire temporaire géré: un fichier par upload, supprimé par le worker ou par le balayage"""
+
+    reserve_block = 8 * 1024 * 1024  # Réservation par blocs: un balayage du répertoire tous les 8 Mo reçus
+
+    def __init__(self, root=None, quota_bytes=None, orphan_ttl=None, sweep_interval=None):
+        self.root = root or getattr(settings, 'SCRATCH_DIR', os.path.join(settings.BASE_DIR, 'tmp_uploads'))
+        self.quota_bytes = quota_bytes or getattr(settings, 'SCRATCH_QUOTA_BYTES', 2 * 1024 * 1024 * 1024)
+        self.orphan_ttl = orphan_ttl or getattr(settings, 'SCRATCH_ORPHAN_TTL_SECONDS', 3 * 3600)
+        self.sweep_interval = sweep_interval or getattr(settings, 'SCRATCH_SWEEP_INTERVAL_SECONDS', 600)
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._pid = None
+        self._reservations = {}  # Chemin du fichier en cours d'écriture -> octets réservés
+        self._counters = {'created': 0, 'released': 0, 'swept_files': 0, 'swept_bytes': 0, 'quota_rejections': 0}
+
+    def _incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def ensure_root(self):
+        os.makedirs(self.root, exist_ok=True)
+        return self.root
+
+    def path_for(self, filename):
+        """Chemin unique (l'extension d'origine est conservée pour la détection du type MIME)"""
+        self.ensure_root()
+        self._incr('created')
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(self.root, f"{uuid.uuid4().hex}{extension}")
+
+    def _entries(self):
+        try:
+            with os.scandir(self.root) as entries:
+                return [entry for entry in entries if entry.is_file(follow_symlinks=False)]
+        except FileNotFoundError:
+            return []
+
+    def usage(self, entries=None):
+        """Octets actuellement occupés dans l'espace temporaire"""
+        total = 0
+        for entry in self._entries() if entries is None else entries:
+            try:
+                total += entry.stat(follow_symlinks=False).st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def reserve(self, path, nbytes):
+        """
+        Réserve nbytes de plus pour le fichier path en cours d'écriture, ou lève ScratchQuotaExceeded.
+        La vérification et la réservation sont atomiques dans le processus: deux uploads simultanés
+        ne peuvent pas se partager la même marge. Les fichiers des autres processus comptent pour
+        leur taille actuelle sur disque.
+        """
+        with self._lock:
+            # Fichiers réservés: comptés pour leur réservation (>= leur taille sur disque)
+            written = self.usage([entry for entry in self._entries() if entry.path not in self._reservations])
+            if written + sum(self._reservations.values()) + nbytes > self.quota_bytes:
+                self._counters['quota_rejections'] += 1
+                raise ScratchQuotaExceeded(
+                    "Le serveur traite trop de fichiers en ce moment. Veuillez réessayer dans quelques instants."
+                )
+            self._reservations[path] = self._reservations.get(path, 0) + nbytes
+
+    def unreserve(self, path):
+        """Fin d'écriture (ou abandon): le fichier compte désormais pour sa taille sur disque"""
+        with self._lock:
+            self._reservations.pop(path, None)
+
+    def release(self, path):
+        """Supprime un fichier de l'espace temporaire (sans erreur s'il a déjà disparu)"""
+        if not path:
+            return
+        try:
+            os.remove(path)
+            self._incr('released')
+            print(f"DEBUG: Fichier temporaire supprimé: {path}")
+        except FileNotFoundError:
+            pass
+
+    def sweep(self):
+        """Supprime les fichiers plus anciens que orphan_ttl qui ne sont liés à aucune tâche active"""
+        from .models import AnalysisJob
+
+        deadline = time.time() - self.orphan_ttl
+        candidates = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime < deadline:
+                candidates.append((entry.path, stat.st_size))
+        if not candidates:
+            return 0
+
+        in_use = set(AnalysisJob.objects.filter(
+            status__in=['pending', 'running'],
+            file_path__in=[path for path, _ in candidates]
+        ).values_list('file_path', flat=True))
+
+        swept = 0
+        for path, size in candidates:
+            if path in in_use:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            swept += 1
+            self._incr('swept_bytes', size)
+        self._incr('swept_files', swept)
+        if swept:
+            print(f"DEBUG: Scratch sweep removed {swept} orphaned file(s) from {self.root}")
+        return swept
+
+    def start(self):
+        """
+        Balayage immédiat puis périodique (idempotent, redémarre après un fork).
+        Lancé au démarrage des workers gunicorn (post_worker_init) et du pool d'analyse;
+        le premier upload le lance aussi sous runserver ou ASGI.
+        """
+        with self._lock:
+            if self._pid == os.getpid() and self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._pid = os.getpid()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="scratch-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        from django.db import close_old_connections
+
+        while True:
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Scratch sweep failed")
+            finally:
+                close_old_connections()
+            time.sleep(self.sweep_interval)
+
+    def stats(self):
+        entries = self._entries()
+        used = self.usage(entries)
+        with self._lock:
+            counters = dict(self._counters, reserved_bytes=sum(self._reservations.values()))
+        counters.update({
+            'root': self.root,
+            'files': len(entries),
+            'bytes': used,
+            'quota_bytes': self.quota_bytes,
+            'usage_ratio': round(used / self.quota_bytes, 4) if self.quota_bytes else 0,
+        })
+        return counters
+
+
+# Instance singleton de l'espace temporaire
+scratch_space = ScratchSpace()
@@ -0,0 +1,159 @@
+"""
+Statistiques des sessions d'apprentissage (questions, bonnes réponses, indices, durée)
+Les compteurs sont incrémentés en base par des expressions F(): un UPDATE des seules colonnes
+concernées, sans relire la ligne, donc sans incrément perdu entre requêtes simultanées.
+Avec SESSION_STATS_FLUSH_INTERVAL > 0, les deltas sont cumulés en mémoire et écrits par lots
+(une écriture par session et par intervalle au lieu d'une par tour de chat).
+
+duration_seconds cumule le temps actif: l'écart avec l'activité précédente, sauf au-delà de
+SESSION_IDLE_TIMEOUT_SECONDS (session reprise plus tard). UserProgress (utilisateurs connectés)
+suit les mêmes totaux.
+"""
+from django.conf import settings
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+import atexit
+import threading
+import time
+
+from .models import LearningSession, UserProgress
+
+COUNTERS = ('questions', 'correct', 'hints', 'seconds')
+
+
+class SessionStats:
+    """Applique les deltas de statistiques des sessions (immédiatement ou par lots)"""
+
+    def __init__(self, flush_interval=None, idle_timeout=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'SESSION_STATS_FLUSH_INTERVAL', 0
+        )
+        self.idle_timeout = idle_timeout or getattr(settings, 'SESSION_IDLE_TIMEOUT_SECONDS', 1800)
+        self._lock = threading.Lock()
+        self._pending = {}  # session_id -> {'user_id', 'last_at', 'questions', 'correct', 'hints', 'seconds'}
+        self._flusher = None
+        self._flush_at_exit = False
+
+    def _active_seconds(self, last_activity, now):
+        """Temps actif depuis la dernière activité (0 si la session était inactive)"""
+        if last_activity is None:
+            return 0
+        gap = (now - last_activity).total_seconds()
+        return int(gap) if 0 < gap <= self.idle_timeout else 0
+
+    def record(self, session, questions=0, correct=0, hints=0):
+        """Une activité sur la session: compteurs à incrémenter et temps actif écoulé"""
+        now = timezone.now()
+        with self._lock:
+            pending = self._pending.get(session.id)
+            last_activity = max(session.updated_at, pending['last_at']) if pending else session.updated_at
+            delta = {
+                'questions': questions, 'correct': correct, 'hints': hints,
+                'seconds': self._active_seconds(last_activity, now),
+            }
+            if self.flush_interval > 0:
+                if pending is None:
+                    pending = self._pending[session.id] = dict(dict.fromkeys(COUNTERS, 0), user_id=session.user_id)
+                for name in COUNTERS:
+                    pending[name] += delta[name]
+                pending['last_at'] = now
+                self._start_flusher()
+                return
+
+        session.updated_at = now  # Instance alignée sur la ligne (prochaine activité mesurée à partir d'ici)
+        self._write(session.id, session.user_id, delta, now)
+
+    async def arecord(self, session, questions=0, correct=0, hints=0):
+        if self.flush_interval > 0:
+            self.record(session, questions, correct, hints)  # Mémoire seulement
+        else:
+            await sync_to_async(self.record)(session, questions, correct, hints)
+
+    def session_started(self, session):
+        """Nouvelle session d'un utilisateur connecté: total_sessions de sa progression"""
+        if session.user_id:
+            self._update_progress(session.user_id, {'sessions': 1}, timezone.now())
+
+    def _write(self, session_id, user_id, delta, now):
+        LearningSession.objects.filter(id=session_id).update(
+            questions_asked=F('questions_asked') + delta['questions'],
+            correct_answers=F('correct_answers') + delta['correct'],
+            hints_used=F('hints_used') + delta['hints'],
+            duration_seconds=F('duration_seconds') + delta['seconds'],
+            updated_at=now,
+        )
+        if user_id:
+            self._update_progress(user_id, delta, now)
+
+    def _update_progress(self, user_id, delta, now):
+        # Temps total recalculé depuis les sessions (minutes entières, sans erreur d'arrondi cumulée)
+        total_seconds = LearningSession.objects.filter(user_id=OuterRef('user_id')).values('user_id').annotate(
+            total=Sum('duration_seconds')
+        ).values('total')
+        changes = {
+            'total_sessions': F('total_sessions') + delta.get('sessions', 0),
+            'total_questions': F('total_questions') + delta.get('questions', 0),
+            'total_correct': F('total_correct') + delta.get('correct', 0),
+            'total_time_minutes': Coalesce(Subquery(total_seconds, output_field=IntegerField()), Value(0)) / 60,
+            'updated_at': now,
+        }
+        if not UserProgress.objects.filter(user_id=user_id).update(**changes):
+            UserProgress.objects.get_or_create(user_id=user_id)
+            UserProgress.objects.filter(user_id=user_id).update(**changes)
+
+    def flush(self):
+        """Écrit les deltas en attente (une requête UPDATE par session)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for session_id, delta in pending.items():
+            try:
+                self._write(session_id, delta['user_id'], delta, delta['last_at'])
+            except Exception as e:
+                print(f"DEBUG: Session stats flush failed for {session_id}: {e}")
+                self._merge_back(session_id, delta)
+        return len(pending)
+
+    def _merge_back(self, session_id, delta):
+        """Remet un delta non écrit en attente (réessayé au prochain lot)"""
+        with self._lock:
+            current = self._pending.get(session_id)
+            if current is None:
+                self._pending[session_id] = delta
+                return
+            for name in COUNTERS:
+                current[name] += delta[name]
+            current['last_at'] = max(current['last_at'], delta['last_at'])
+
+    def _start_flusher(self):
+        # Appelé sous self._lock
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name='session-stats-flusher', daemon=True)
+            self._flusher.start()
+            if not self._flush_at_exit:  # Une seule fois, même si le thread est relancé
+                atexit.register(self.flush)
+                self._flush_at_exit = True
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"DEBUG: Session stats flusher error: {e}")
+
+    def apply_pending(self, session):
+        """Ajoute à l'instance les deltas pas encore écrits par ce processus (lecture des statistiques)"""
+        with self._lock:
+            pending = self._pending.get(session.id)
+            if pending:
+                session.questions_asked += pending['questions']
+                session.correct_answers += pending['correct']
+                session.hints_used += pending['hints']
+                session.duration_seconds += pending['seconds']
+        return session
+
+
+# Instance singleton des statistiques de sessions
+session_stats = SessionStats()
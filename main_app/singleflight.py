@@ -0,0 +1,167 @@
+"""
+Déduplication des analyses identiques en cours (single-flight)
+Quand plusieurs uploads du même contenu, avec les mêmes paramètres, sont analysés en même
+temps (ex: toute une classe envoie le même PDF), un seul appel Gemini est lancé:
+- dans un processus, les autres tâches attendent le résultat de la première et le partagent
+  (progression comprise);
+- entre processus, un verrou de fichier par clé sérialise les workers: celui qui obtient le
+  verrou après un autre relit d'abord le cache d'analyses, que le premier vient de remplir.
+  Les clés sont réparties sur un nombre fixe de fichiers (lock_buckets): le répertoire des
+  verrous reste borné; deux clés du même compartiment s'attendent simplement l'une l'autre.
+Sans fcntl (Windows), la déduplication est limitée au processus.
+
+Un participant qui attend (suiveur, ou worker bloqué sur le verrou d'un autre processus) occupe
+son thread du pool d'analyse pendant toute la durée de l'appel du meneur: N uploads identiques
+simultanés immobilisent jusqu'à N threads (ANALYSIS_WORKERS) pour un seul appel Gemini.
+"""
+from django.conf import settings
+from contextlib import contextmanager
+import hashlib
+import os
+import threading
+import time
+
+from .scratch import scratch_space
+
+try:
+    import fcntl
+except ImportError:  # Dépendance système optionnelle: pas de verrou entre processus
+    fcntl = None
+
+
+class _Flight:
+    """Appel en cours pour une clé: résultat partagé, participants et dernière progression"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.progress_lock = threading.Lock()  # Ordre des progressions: rejeu à l'arrivée, puis diffusions
+        self.result = None
+        self.error = None
+        self.listeners = []
+        self.last_progress = None
+
+
+class SingleFlight:
+    """Exécute une fonction une seule fois par clé parmi les appels concurrents (threads et workers)"""
+
+    def __init__(self, lock_dir=None, lock_timeout=None, poll_interval=0.5, lock_buckets=None):
+        self.lock_dir = lock_dir or getattr(settings, 'ANALYSIS_SINGLEFLIGHT_LOCK_DIR', '') \
+            or os.path.join(scratch_space.root, 'locks')
+        self.lock_timeout = lock_timeout or getattr(
+            settings, 'ANALYSIS_SINGLEFLIGHT_LOCK_TIMEOUT', getattr(settings, 'ANALYSIS_JOB_TIMEOUT', 600)
+        )
+        self.poll_interval = poll_interval
+        self.lock_buckets = lock_buckets or getattr(settings, 'ANALYSIS_SINGLEFLIGHT_LOCK_BUCKETS', 256)
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._counters = {'leaders': 0, 'followers': 0, 'cross_process_waits': 0, 'recheck_hits': 0, 'lock_timeouts': 0}
+
+    def _incr(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _broadcast(self, flight, args):
+        """Relaie une progression du meneur à tous les participants"""
+        with flight.progress_lock:
+            flight.last_progress = args
+            for listener in list(flight.listeners):
+                self._notify(listener, args)
+
+    def _notify(self, listener, args):
+        try:
+            listener(*args)
+        except Exception as e:
+            print(f"DEBUG: Single-flight progress listener failed: {e}")
+
+    def lock_path(self, key):
+        """Fichier de verrou du compartiment de la clé (nombre de fichiers borné par lock_buckets)"""
+        bucket = int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) % self.lock_buckets
+        return os.path.join(self.lock_dir, f"{bucket:04d}.lock")
+
+    @contextmanager
+    def _file_lock(self, key):
+        """Verrou exclusif inter-processus pour la clé (attente bornée par lock_timeout)"""
+        if fcntl is None:
+            yield
+            return
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with open(self.lock_path(key), 'a') as handle:
+            deadline = time.monotonic() + self.lock_timeout
+            locked, waiting = False, False
+            while not locked:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except BlockingIOError:
+                    if not waiting:
+                        waiting = True
+                        self._incr('cross_process_waits')
+                        print(f"DEBUG: ⏳ Identical analysis running in another worker, waiting ({key[:12]})")
+                    if time.monotonic() >= deadline:
+                        # Le premier worker est probablement bloqué: l'analyse est faite ici quand même
+                        self._incr('lock_timeouts')
+                        break
+                    time.sleep(self.poll_interval)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def run(self, key, fn, recheck=None, on_progress=None):
+        """
+        fn(progress) une seule fois pour les appels concurrents de même clé; tous reçoivent son
+        résultat (ou son exception). progress(*args) est relayé à l'on_progress de chaque participant.
+        recheck(): résultat déjà disponible (ex: cache rempli par un autre worker) ou None,
+        consulté une fois le verrou inter-processus obtenu. Sans clé, fn est simplement appelé.
+        Les suiveurs bloquent le thread appelant jusqu'à la fin de l'appel du meneur.
+        """
+        if not key:
+            return fn(on_progress)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            self._counters['leaders' if leader else 'followers'] += 1
+
+        if on_progress:
+            # Inscription et rejeu de la dernière progression avant toute nouvelle diffusion
+            with flight.progress_lock:
+                flight.listeners.append(on_progress)
+                if flight.last_progress:
+                    self._notify(on_progress, flight.last_progress)
+
+        if not leader:
+            print(f"DEBUG: 🔁 Identical analysis already in flight, sharing its result ({key[:12]})")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            with self._file_lock(key):
+                cached = recheck() if recheck else None
+                if cached is not None:
+                    self._incr('recheck_hits')
+                    flight.result = cached
+                else:
+                    flight.result = fn(lambda *args: self._broadcast(flight, args))
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._flights), cross_process=fcntl is not None)
+
+
+# Instance singleton pour les analyses d'uploads
+analysis_flights = SingleFlight()
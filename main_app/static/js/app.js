@@ -468,21 +468,38 @@ async function handleFileUpload(file) {
                 try {
                     const data = JSON.parse(xhr.responseText);
 
-                    // Final status before display
-                    showProgressStatus('Finalisation de l\'analyse...', 100);
-
-                    if (data.success) {
-                        // Vider le chat pour la nouvelle analyse
-                        chatMessages.innerHTML = '';
-
-                        // Afficher l'analyse et générer la question
-                        window.KacheleNeuralSync.showToast('Analysis complete!', 'success');
-                        displayAnalysis(data.analysis);
-                        resolve(data);
-                    } else {
-                        displayError(data.error || 'Upload failed');
-                        reject(new Error(data.error));
-                    }
+                    // Analyse en file d'attente: suivre le job jusqu'à la fin
+                    const resultPromise = (data.success && data.job_id && !data.analysis)
+                        ? pollAnalysisJob(data.job_id)
+                        : Promise.resolve(data);
+
+                    resultPromise.then((result) => {
+                        // Final status before display
+                        showProgressStatus('Finalisation de l\'analyse...', 100);
+
+                        if (result.success) {
+                            window.KacheleNeuralSync.showToast('Analysis complete!', 'success');
+                            if (result.alreadyDisplayed) {
+                                // Analyse progressive: le chat a déjà démarré, on complète l'affichage
+                                displayAnalysis(result.analysis, true);
+                            } else {
+                                // Vider le chat pour la nouvelle analyse
+                                chatMessages.innerHTML = '';
+
+                                // Afficher l'analyse et générer la question
+                                displayAnalysis(result.analysis);
+                            }
+                            resolve(result);
+                        } else {
+                            hideProgressStatus();
+                            displayError(result.error || 'Upload failed');
+                            reject(new Error(result.error));
+                        }
+                    }).catch((e) => {
+                        hideProgressStatus();
+                        displayError(e.message || 'Network error during analysis');
+                        reject(e);
+                    });
                 } catch (e) {
                     hideProgressStatus();
                     displayError('Invalid server response');
@@ -514,6 +531,37 @@ async function handleFileUpload(file) {
     });
 }
 
+// Suit une analyse en file d'attente jusqu'à ce qu'elle soit terminée ou en échec.
+// Les étapes déjà analysées (partial_analysis) sont affichées au fil de l'eau: le tuteur
+// démarre dès la première, les suivantes complètent l'affichage.
+async function pollAnalysisJob(jobId, intervalMs = 1000) {
+    let shownStage = 0;
+    while (true) {
+        const response = await fetch(`/api/upload/${jobId}/status/`);
+        const data = await response.json();
+
+        if (!response.ok) {
+            return { success: false, error: data.error || 'Analysis status unavailable' };
+        }
+        if (data.status === 'completed' || data.status === 'failed') {
+            if (data.success && shownStage > 0) data.alreadyDisplayed = true;
+            return data;
+        }
+
+        if (data.partial_analysis && data.stage > shownStage) {
+            if (shownStage === 0) chatMessages.innerHTML = '';
+            displayAnalysis(data.partial_analysis, shownStage > 0);
+            shownStage = data.stage;
+        }
+
+        if (shownStage === 0) {
+            const label = data.status === 'pending' ? 'En file d\'attente...' : 'Analyse par Gemini 3 en cours...';
+            showProgressStatus(label, Math.max(data.progress || 0, 5));
+        }
+        await new Promise(r => setTimeout(r, intervalMs));
+    }
+}
+
 function displayError(message) {
     uploadSection.style.display = 'none';
     analysisSection.style.display = 'block';
@@ -539,7 +587,8 @@ function displayError(message) {
 // ============================================
 // 4. DISPLAY ANALYSIS
 // ============================================
-function displayAnalysis(analysis) {
+// update: nouvelle étape d'une analyse déjà affichée (pas de nouvelle intro ni de première question)
+function displayAnalysis(analysis, update = false) {
     hideProgressStatus(); // Supprimer la barre de progression/status
     // DO NOT hide uploadSection, we will compact it instead later
     analysisSection.style.display = 'block';
@@ -827,7 +876,7 @@ function displayAnalysis(analysis) {
         const markersContainer = document.getElementById('videoMarkers');
 
         videoSection.style.display = 'block';
-        videoPlayer.src = URL.createObjectURL(window.currentUploadedFile);
+        if (!update) videoPlayer.src = URL.createObjectURL(window.currentUploadedFile);
 
         // Add markers for timestamps
         markersContainer.innerHTML = '';
@@ -881,6 +930,22 @@ function displayAnalysis(analysis) {
 
     analysisContent.innerHTML = html;
 
+    if (update) {
+        if (window.renderMathInElement) {
+            renderMathInElement(analysisContent, {
+                delimiters: [
+                    { left: '$$', right: '$$', display: true },
+                    { left: '$', right: '$', display: false },
+                    { left: '\\(', right: '\\)', display: false },
+                    { left: '\\[', right: '\\]', display: true }
+                ],
+                throwOnError: false
+            });
+        }
+        bindAnswerButtons();
+        return;
+    }
+
     // ✅ NOUVEAU: Ajouter le résumé et les concepts au chat INSTANTANÉMENT
     let chatIntro = `J'ai terminé l'analyse de **${window.currentFileName || 'votre contenu'}**. Voici une synthèse rapide :\n\n`;
 
@@ -913,6 +978,10 @@ function displayAnalysis(analysis) {
     // 🎯 Générer automatiquement la première question socratique
     generateAndDisplayFirstQuestion();
 
+    bindAnswerButtons();
+}
+
+function bindAnswerButtons() {
     document.querySelectorAll('.answer-question-btn').forEach(btn => {
         btn.addEventListener('click', () => {
             const question = decodeURIComponent(btn.dataset.question);
@@ -930,20 +999,23 @@ async function generateAndDisplayFirstQuestion() {
         return;
     }
 
+    const streamIntro = '🧠 J\'ai analysé ton contenu. Voici ma première question pour toi :';
+    let stream = null;
+    let streamedText = '';
+
     try {
-        const response = await fetch('/api/first-question/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                session_id: currentSessionId,
-                mode: currentMode
-            })
+        const data = await postStream('/api/first-question/', {
+            session_id: currentSessionId,
+            mode: currentMode
+        }, (token) => {
+            if (!stream) {
+                hideAnalysisSpinner();
+                stream = createStreamingMessage();
+            }
+            streamedText += token;
+            stream.update(`${streamIntro}\n\n${streamedText}`);
         });
 
-        const data = await response.json();
-
         // ✅ Cacher le spinner d'analyse
         hideAnalysisSpinner();
 
@@ -951,12 +1023,12 @@ async function generateAndDisplayFirstQuestion() {
             // Afficher la question générée
             const questionIntro = data.is_fallback
                 ? '🤔 Pendant que Gemini réfléchit, commençons par ceci :'
-                : '🧠 J\'ai analysé ton contenu. Voici ma première question pour toi :';
+                : streamIntro;
 
-            addMessage('ai', `${questionIntro}\n\n${data.question}`);
+            finishMessage(stream, `${questionIntro}\n\n${data.question}`);
         } else {
             // Fallback message si ça échoue
-            addMessage('ai', "Bonjour ! J'ai terminé l'analyse. De quoi souhaites-tu discuter ?");
+            finishMessage(stream, "Bonjour ! J'ai terminé l'analyse. De quoi souhaites-tu discuter ?");
         }
     } catch (error) {
         console.error('Error generating first question:', error);
@@ -1050,24 +1122,27 @@ async function sendMessage() {
 
 async function askQuestion(question) {
     showThinkingIndicator();
+    let stream = null;
+    let streamedText = '';
+
     try {
-        const response = await fetch('/api/ask/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                session_id: currentSessionId,
-                question: question,
-                context: {}
-            })
+        const data = await postStream('/api/ask/', {
+            session_id: currentSessionId,
+            question: question,
+            context: {}
+        }, (token) => {
+            // Afficher les tokens dès leur arrivée (time-to-first-token)
+            if (!stream) {
+                hideThinkingIndicator();
+                stream = createStreamingMessage();
+            }
+            streamedText += token;
+            stream.update(streamedText);
         });
-
-        const data = await response.json();
         hideThinkingIndicator();
 
         if (data.success) {
-            addMessage('ai', data.response);
+            finishMessage(stream, data.response);
             sessionStats.questionsAsked++;
             updateSessionStats();
         } else {
@@ -1134,23 +1209,25 @@ requestHintBtn.addEventListener('click', async () => {
         return;
     }
 
+    let stream = null;
+    let streamedText = '';
+
     try {
-        const response = await fetch('/api/hint/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                session_id: currentSessionId,
-                problem: currentQuestion,
-                current_progress: ''
-            })
+        const data = await postStream('/api/hint/', {
+            session_id: currentSessionId,
+            problem: currentQuestion,
+            current_progress: ''
+        }, (token) => {
+            // Le hint arrive en JSON: on affiche le champ "hint" au fur et à mesure
+            streamedText += token;
+            const partialHint = extractPartialJsonField(streamedText, 'hint');
+            if (!partialHint) return;
+            if (!stream) stream = createStreamingMessage();
+            stream.update(`💡 Hint: ${partialHint}`);
         });
 
-        const data = await response.json();
-
         if (data.success) {
-            addMessage('ai', `💡 Hint: ${data.hint}`);
+            finishMessage(stream, `💡 Hint: ${data.hint}`);
             sessionStats.hintsUsed++;
             updateSessionStats();
         } else {
@@ -1162,7 +1239,7 @@ requestHintBtn.addEventListener('click', async () => {
     }
 });
 
-function addMessage(sender, text) {
+function createMessageElement(sender) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${sender}`;
 
@@ -1180,44 +1257,147 @@ function addMessage(sender, text) {
     `;
 
     chatMessages.appendChild(messageDiv);
-    const bubble = messageDiv.querySelector('.message-bubble');
+    return messageDiv.querySelector('.message-bubble');
+}
+
+function renderAiBubble(bubble, text, renderMath = true) {
+    // Rendering markdown first is safer for structure
+    bubble.innerHTML = marked.parse(text);
+
+    // Trigger KaTeX rendering
+    if (renderMath && window.renderMathInElement) {
+        renderMathInElement(bubble, {
+            delimiters: [
+                { left: '$$', right: '$$', display: true },
+                { left: '$', right: '$', display: false },
+                { left: '\\(', right: '\\)', display: false },
+                { left: '\\[', right: '\\]', display: true }
+            ],
+            throwOnError: false
+        });
+    }
+}
+
+function scrollChatToBottom() {
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+
+    // Si la zone de messages grandit, on s'assure que le champ de texte en bas est visible
+    setTimeout(() => {
+        chatInput.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+    }, 100);
+}
+
+function addMessage(sender, text) {
+    const bubble = createMessageElement(sender);
 
     if (sender === 'ai') {
-        // Typing effect for AI
-        let i = 0;
         bubble.classList.add('typing');
+        renderAiBubble(bubble, text);
+    } else {
+        bubble.innerHTML = text.replace(/\n/g, '<br>');
+    }
 
-        // Prepare the full HTML first but show incrementally
-        // Or better: render markdown then type it? 
-        // Rendering markdown first is safer for structure
-        const rawHtml = marked.parse(text);
-
-        // For a more natural feel, we type the text or use a CSS transition
-        // But for hackathon wow factor, let's do a smooth reveal
-        bubble.innerHTML = rawHtml;
+    scrollChatToBottom();
+}
 
-        // Trigger KaTeX rendering
-        if (window.renderMathInElement) {
-            renderMathInElement(bubble, {
-                delimiters: [
-                    { left: '$$', right: '$$', display: true },
-                    { left: '$', right: '$', display: false },
-                    { left: '\\(', right: '\\)', display: false },
-                    { left: '\\[', right: '\\]', display: true }
-                ],
-                throwOnError: false
+// Bulle IA mise à jour au fil des tokens reçus (KaTeX rendu une seule fois à la fin)
+function createStreamingMessage() {
+    const bubble = createMessageElement('ai');
+    bubble.classList.add('typing');
+    let pendingText = null;
+
+    return {
+        update(text) {
+            // Un seul rendu markdown par frame, même si les tokens arrivent plus vite
+            const scheduled = pendingText !== null;
+            pendingText = text;
+            if (scheduled) return;
+            requestAnimationFrame(() => {
+                renderAiBubble(bubble, pendingText, false);
+                pendingText = null;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
             });
+        },
+        finish(text) {
+            pendingText = null;
+            renderAiBubble(bubble, text);
+            scrollChatToBottom();
         }
+    };
+}
+
+// Termine une bulle en streaming, ou affiche un message complet si aucun token n'est arrivé
+function finishMessage(stream, text) {
+    if (stream) {
+        stream.finish(text);
     } else {
-        bubble.innerHTML = text.replace(/\n/g, '<br>');
+        addMessage('ai', text);
     }
+}
 
-    chatMessages.scrollTop = chatMessages.scrollHeight;
+// Extrait la valeur (éventuellement incomplète) d'un champ texte d'un JSON en cours de réception
+function extractPartialJsonField(text, field) {
+    const match = text.match(new RegExp(`"${field}"\\s*:\\s*"((?:[^"\\\\]|\\\\.)*)`));
+    if (!match) return '';
+    const raw = match[1].replace(/\\$/, '');
+    try {
+        return JSON.parse(`"${raw}"`);
+    } catch (e) {
+        return raw;
+    }
+}
 
-    // Si la zone de messages grandit, on s'assure que le champ de texte en bas est visible
-    setTimeout(() => {
-        chatInput.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
-    }, 100);
+// POST JSON avec {stream: true} et lecture du flux Server-Sent Events.
+// onToken est appelé pour chaque fragment; renvoie les données de l'évènement final (done/error).
+async function postStream(url, payload, onToken) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify({ ...payload, stream: true })
+    });
+
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!contentType.includes('text/event-stream')) {
+        // Erreur survenue avant le début du flux (session introuvable, etc.)
+        return response.json();
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = { success: false, error: 'Stream ended unexpectedly' };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let separator;
+        while ((separator = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, separator);
+            buffer = buffer.slice(separator + 2);
+
+            let eventName = 'message';
+            let eventData = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                else if (line.startsWith('data:')) eventData += line.slice(5).trim();
+            });
+            if (!eventData) continue;
+
+            const parsed = JSON.parse(eventData);
+            if (eventName === 'token') {
+                onToken(parsed.text);
+            } else if (eventName === 'done' || eventName === 'error') {
+                result = parsed;
+            }
+        }
+    }
+
+    return result;
 }
 
 
@@ -0,0 +1,48 @@
+"""
+Compression des textes archivés (prompts et réponses Gemini)
+zstd si le paquet zstandard est installé, sinon zlib (bibliothèque standard). Le codec est
+enregistré avec chaque valeur: une archive reste lisible si le codec par défaut change.
+Les textes courts sont gardés tels quels (la compression n'y gagne rien).
+"""
+from django.conf import settings
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # Dépendance optionnelle: zlib sinon
+    zstandard = None
+
+RAW = 'raw'
+ZLIB = 'zlib'
+ZSTD = 'zstd'
+
+
+def default_codec():
+    codec = getattr(settings, 'INTERACTION_ARCHIVE_CODEC', '') or ZSTD
+    return ZLIB if codec == ZSTD and zstandard is None else codec
+
+
+def compress(text, codec=None, min_bytes=None):
+    """(codec, octets) pour text"""
+    data = (text or '').encode('utf-8')
+    min_bytes = getattr(settings, 'INTERACTION_COMPRESS_MIN_BYTES', 256) if min_bytes is None else min_bytes
+    codec = codec or default_codec()
+    if len(data) < min_bytes or codec == RAW:
+        return RAW, data
+
+    if codec == ZSTD:
+        compressed = zstandard.ZstdCompressor(level=10).compress(data)
+    else:
+        codec, compressed = ZLIB, zlib.compress(data, 9)
+    return (codec, compressed) if len(compressed) < len(data) else (RAW, data)
+
+
+def decompress(codec, data):
+    data = bytes(data or b'')  # BinaryField: memoryview sous PostgreSQL
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("This archived text is zstd-compressed: install the zstandard package to read it")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == ZLIB:
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
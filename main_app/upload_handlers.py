@@ -0,0 +1,109 @@
+"""
+Gestion des uploads en streaming
+Le fichier est écrit sur disque au fil de la réception (jamais entièrement en mémoire),
+haché (SHA-256) dans la même passe, et refusé dès qu'il dépasse la limite de son type
+ou le quota de l'espace temporaire.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler, StopUpload
+import hashlib
+import os
+import shutil
+
+from .scratch import scratch_space, ScratchQuotaExceeded
+
+# Extensions acceptées par type de contenu
+CONTENT_TYPE_EXTENSIONS = {
+    'video': ['.mp4', '.avi', '.mov', '.webm'],
+    'image': ['.jpg', '.jpeg', '.png', '.gif', '.webp'],
+    'document': ['.pdf', '.txt', '.doc', '.docx'],
+}
+
+
+def detect_content_type(filename):
+    """Type de contenu (video/image/document) d'après l'extension, ou None si non supporté"""
+    extension = os.path.splitext(filename)[1].lower()
+    for content_type, extensions in CONTENT_TYPE_EXTENSIONS.items():
+        if extension in extensions:
+            return content_type
+    return None
+
+
+def upload_max_size(content_type):
+    """Taille maximale acceptée pour un type de contenu (octets)"""
+    limits = getattr(settings, 'UPLOAD_MAX_SIZES', {})
+    return limits.get(content_type, 100 * 1024 * 1024)
+
+
+def persist_upload(file):
+    """
+    Place le fichier uploadé sous un nom unique dans l'espace temporaire et renvoie son chemin.
+    Un fichier déjà spoolé sur disque est simplement renommé (aucune recopie).
+    """
+    path = scratch_space.path_for(file.name)
+
+    if hasattr(file, 'temporary_file_path'):
+        # Même système de fichiers (FILE_UPLOAD_TEMP_DIR = SCRATCH_DIR): rename atomique
+        shutil.move(file.temporary_file_path(), path)
+    else:
+        with open(path, 'wb') as destination:
+            for chunk in file.chunks():
+                destination.write(chunk)
+    return path
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spoole l'upload directement dans FILE_UPLOAD_TEMP_DIR en calculant son SHA-256.
+
+    Un type non supporté, un dépassement de taille ou de quota interrompt la requête sans lire
+    le reste du corps (StopUpload avec fermeture de la connexion); la raison est exposée à la vue
+    via request.upload_error = (message, status). L'espace disque est réservé au fil de la
+    réception (scratch_space.reserve), par blocs.
+    """
+    chunk_size = 256 * 1024  # Mémoire utilisée par upload, quelle que soit la taille du fichier
+    spool_path = None
+
+    def _reject(self, message, status):
+        self.request.upload_error = (message, status)
+        raise StopUpload(connection_reset=True)
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        scratch_space.ensure_root()
+        scratch_space.start()  # Déjà lancé par post_worker_init sous gunicorn
+        self.upload_complete()  # Fichier précédent de la même requête
+        super().new_file(field_name, file_name, *args, **kwargs)
+
+        self.kind = detect_content_type(file_name)
+        if self.kind is None:
+            self._reject(f'Unsupported file type: {os.path.splitext(file_name)[1].lower()}', 400)
+        self.max_size = upload_max_size(self.kind)
+        self.received = 0
+        self.reserved = 0
+        self.spool_path = self.file.temporary_file_path()
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            limit_mb = self.max_size // (1024 * 1024)
+            self._reject(f'Fichier trop volumineux: {limit_mb} Mo maximum pour ce type de contenu ({self.kind}).', 413)
+        if self.received > self.reserved:
+            block = max(self.received - self.reserved, min(scratch_space.reserve_block, self.max_size - self.reserved))
+            try:
+                scratch_space.reserve(self.spool_path, block)
+            except ScratchQuotaExceeded as e:
+                self._reject(str(e), 507)
+            self.reserved += block
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.hasher.hexdigest()
+        return file
+
+    def upload_complete(self):
+        if self.spool_path:
+            scratch_space.unreserve(self.spool_path)
+            self.spool_path = None
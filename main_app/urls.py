@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Vues API asynchrones (à servir via ASGI) ou bloquantes (WSGI/gunicorn sync)
+api_views = async_views if settings.ASYNC_API_VIEWS else views
 
 app_name = 'main_app'
 
@@ -13,10 +17,22 @@ urlpatterns = [
     # API endpoints
     path('api/session/create/', views.create_session, name='create_session'),
     path('api/session/<uuid:session_id>/stats/', views.get_session_stats, name='session_stats'),
-    path('api/upload/', views.upload_content, name='upload_content'),
-    path('api/first-question/', views.generate_first_question, name='generate_first_question'),
-    path('api/ask/', views.ask_question, name='ask_question'),
-    path('api/answer/', views.submit_answer, name='submit_answer'),
-    path('api/hint/', views.request_hint, name='request_hint'),
+    path('api/upload/', api_views.upload_content, name='upload_content'),
+    path('api/upload/<uuid:job_id>/status/', views.get_upload_status, name='upload_status'),
+    path('api/first-question/', api_views.generate_first_question, name='generate_first_question'),
+    path('api/ask/', api_views.ask_question, name='ask_question'),
+    path('api/answer/', api_views.submit_answer, name='submit_answer'),
+    path('api/hint/', api_views.request_hint, name='request_hint'),
     path('api/practice/generate/', views.generate_practice, name='generate_practice'),
+    path('api/cache/stats/', views.get_cache_stats, name='cache_stats'),
+    path('api/chat/stats/', views.get_chat_store_stats, name='chat_store_stats'),
+    path('api/scratch/stats/', views.get_scratch_stats, name='scratch_stats'),
+    path('api/gemini/stats/', views.get_gemini_stats, name='gemini_stats'),
 ]
+
+if settings.ASYNC_API_VIEWS:
+    # Flux SSE de progression: une connexion longue par client, réservé au service ASGI
+    # (en WSGI, chaque flux bloquerait un worker; le client interroge alors /status/)
+    urlpatterns.append(
+        path('api/upload/<uuid:job_id>/events/', async_views.get_upload_events, name='upload_events')
+    )
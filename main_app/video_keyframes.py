@@ -0,0 +1,157 @@
+"""
+Extraction d'images clés horodatées pour les vidéos longues
+Avec un binaire ffmpeg local (optionnel), une vidéo longue est envoyée à Gemini sous
+forme de lot d'images clés (changements de scène ou intervalle fixe) au lieu du fichier
+complet: pas d'upload ni de traitement côté Google, pour une fraction des octets.
+Seules les images sont envoyées (pas la piste audio): réservé aux vidéos dont l'image porte
+le contenu, donc désactivé par défaut (VIDEO_KEYFRAME_MODE).
+Sans ffmpeg (5.1 ou plus récent), l'analyse retombe sur l'upload classique de la vidéo.
+"""
+from django.conf import settings
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from .scratch import scratch_space
+from .lazy_imports import lazy_module
+
+types = lazy_module('google.genai.types')
+
+SHOWINFO_PTS = re.compile(r"pts_time:\s*([0-9.]+)")
+
+
+def _binary(name):
+    configured = getattr(settings, f'{name.upper()}_BINARY', '') or name
+    return shutil.which(configured)
+
+
+def ffmpeg_available():
+    return bool(_binary('ffmpeg') and _binary('ffprobe'))
+
+
+def format_timestamp(seconds):
+    """Format MM:SS (ou H:MM:SS) utilisé par le schéma d'analyse vidéo"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def probe_duration(path):
+    """Durée de la vidéo en secondes (ffprobe), ou None"""
+    result = subprocess.run(
+        [_binary('ffprobe'), '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', path],
+        capture_output=True, text=True, timeout=30
+    )
+    try:
+        return float(json.loads(result.stdout)['format']['duration'])
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+def _even_sample(items, count):
+    """Garde count éléments répartis uniformément (premier et dernier inclus)"""
+    if len(items) <= count:
+        return items
+    if count == 1:
+        return items[:1]
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(i * step)] for i in range(count)]
+
+
+class KeyframeExtractor:
+    """Sélection et extraction des images clés via ffmpeg"""
+
+    def __init__(self):
+        self.mode = getattr(settings, 'VIDEO_KEYFRAME_MODE', 'off')  # off | auto | always
+        self.min_duration = getattr(settings, 'VIDEO_KEYFRAME_MIN_DURATION', 600)
+        self.max_frames = getattr(settings, 'VIDEO_KEYFRAME_MAX_FRAMES', 60)
+        self.scene_threshold = getattr(settings, 'VIDEO_KEYFRAME_SCENE_THRESHOLD', 0.3)
+        self.max_edge = getattr(settings, 'VIDEO_KEYFRAME_MAX_EDGE', 1024)
+        self.timeout = getattr(settings, 'VIDEO_KEYFRAME_TIMEOUT', 240)
+
+    def should_use(self, path):
+        """Durée de la vidéo si le mode images clés s'applique, sinon None"""
+        if self.mode == 'off' or not ffmpeg_available():
+            return None
+        duration = probe_duration(path)
+        if duration is None:
+            return None
+        if self.mode == 'always' or duration >= self.min_duration:
+            return duration
+        return None
+
+    def _run_ffmpeg(self, path, video_filter, out_dir):
+        command = [
+            _binary('ffmpeg'), '-hide_banner', '-nostdin', '-i', path,
+            '-vf', f"{video_filter},showinfo,scale='min({self.max_edge},iw)':-2",
+            '-fps_mode', 'vfr', '-q:v', '4',  # -fps_mode remplace -vsync (déprécié) depuis ffmpeg 5.1
+            os.path.join(out_dir, 'frame_%05d.jpg')
+        ]
+        result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr[-500:]}")
+        # showinfo journalise une ligne par image retenue, dans l'ordre des fichiers écrits
+        timestamps = [float(t) for t in SHOWINFO_PTS.findall(result.stderr)]
+        frames = sorted(f for f in os.listdir(out_dir) if f.endswith('.jpg'))
+        return list(zip(timestamps, (os.path.join(out_dir, f) for f in frames)))
+
+    def extract(self, path, duration):
+        """
+        Liste de (secondes, octets JPEG): changements de scène, complétés par un
+        échantillonnage à intervalle fixe si la vidéo en contient trop peu.
+        """
+        with tempfile.TemporaryDirectory(dir=scratch_space.ensure_root()) as out_dir:
+            frames = self._run_ffmpeg(
+                path, f"select='eq(n,0)+gt(scene,{self.scene_threshold})'", out_dir
+            )
+            if len(frames) < self.max_frames // 4:
+                for name in os.listdir(out_dir):
+                    os.remove(os.path.join(out_dir, name))
+                interval = max(duration / self.max_frames, 1.0)
+                frames = self._run_ffmpeg(path, f"fps=1/{interval:.3f}", out_dir)
+
+            selected = _even_sample(frames, self.max_frames)
+            result = []
+            for seconds, frame_path in selected:
+                with open(frame_path, 'rb') as f:
+                    result.append((seconds, f.read()))
+            return result
+
+    def build_contents(self, keyframes, duration, prompt):
+        """Contenu Gemini: chaque image précédée de son horodatage, puis le prompt d'analyse"""
+        contents = [
+            f"Les images suivantes sont {len(keyframes)} images clés horodatées extraites d'une vidéo "
+            f"de {format_timestamp(duration)}. Elles remplacent la vidéo complète: appuie-toi sur leurs "
+            f"horodatages pour les champs \"timestamps\" et \"interactive_questions\"."
+        ]
+        for seconds, data in keyframes:
+            contents.append(f"[{format_timestamp(seconds)}]")
+            contents.append(types.Part.from_bytes(data=data, mime_type='image/jpeg'))
+        contents.append(prompt)
+        return contents
+
+    def prepare(self, path, prompt):
+        """Contenu à envoyer à la place de la vidéo, ou None (upload classique)"""
+        try:
+            duration = self.should_use(path)
+            if duration is None:
+                return None
+            keyframes = self.extract(path, duration)
+            if not keyframes:
+                return None
+            size = sum(len(data) for _, data in keyframes)
+            print(f"DEBUG: 🎞️ Keyframe mode: {len(keyframes)} frames ({size // 1024} KB) for a {format_timestamp(duration)} video")
+            return self.build_contents(keyframes, duration, prompt)
+        except Exception as e:
+            print(f"DEBUG: Keyframe extraction failed, uploading full video ({e})")
+            return None
+
+
+# Instance singleton de l'extracteur
+keyframe_extractor = KeyframeExtractor()
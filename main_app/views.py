@@ -4,6 +4,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from django.conf import settings
 import json
 import os
 import logging
@@ -85,12 +86,249 @@ def get_mock_response(question, analysis_summary):
     note = "\n\n*(Note: Mode Démo Intelligent activé - Gemini est actuellement en haute performance de calcul)*"
     
     return random.choice(responses) + note
-from .models import LearningSession, UploadedContent, Interaction, ConceptMap, UserProgress
+from .models import LearningSession, UploadedContent, Interaction, ConceptMap, UserProgress, AnalysisJob
 from .gemini_service import gemini_service
+from .analysis_cache import analysis_cache, compute_file_hash
+from .job_queue import enqueue_analysis
+from .chat_store import chat_store
+from .upload_handlers import detect_content_type, persist_upload
+from .scratch import scratch_space
+from .singleflight import analysis_flights
+from .image_preprocessing import image_preprocessor
+from .context_cache import context_cache
+from .gemini_scheduler import gemini_scheduler
+from .gemini_resilience import gemini_resilience
+from .model_router import model_router
+from .session_stats import session_stats
+from .parsed_analysis import parsed_analyses
+from . import gemini_transport
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 
 
+# Questions d'ouverture prédéfinies (failover quota/surcharge)
+FALLBACK_FIRST_QUESTIONS = {
+    'video': "Après avoir regardé cette vidéo, quel est selon toi le concept le plus important qui y est présenté ? Pourquoi ?",
+    'problem': "Avant de te donner des indices, quelle est ta première approche pour résoudre ce problème ? Quels concepts penses-tu devoir utiliser ?",
+    'document': "Maintenant que tu as parcouru ce document, quels sont les 2-3 idées principales qui en ressortent selon toi ?",
+    'creative': "Peux-tu m'expliquer l'intention derrière ton travail ? Qu'as-tu cherché à exprimer ou à accomplir ?"
+}
+
+
+def build_first_question_prompt(mode, analysis):
+    """Construit le prompt de la première question socratique selon le mode"""
+    if mode == 'video':
+        prompt = f"""
+        Tu as analysé une vidéo éducative. Voici le résumé:
+        {analysis.get('summary', '')}
+        
+        Concepts clés: {', '.join(analysis.get('key_concepts', []))}
+        
+        En tant que tuteur socratique, génère UNE question d'ouverture engageante qui:
+        1. Vérifie si l'étudiant a compris le message principal
+        2. Ne révèle pas la réponse
+        3. Est formulée de manière encourageante et stimulante
+        4. Pousse à la réflexion critique
+        
+        Réponds UNIQUEMENT avec la question, sans introduction ni conclusion.
+        """
+    elif mode == 'problem':
+        prompt = f"""
+        Tu as analysé un problème visuel de type: {analysis.get('problem_type', 'inconnu')}
+        
+        Concepts requis: {', '.join(analysis.get('concepts_needed', []))}
+        
+        En tant que tuteur socratique, génère UNE question d'ouverture qui:
+        1. Demande à l'étudiant d'identifier le type de problème
+        2. L'invite à réfléchir aux concepts nécessaires
+        3. Ne donne aucun indice direct sur la solution
+        
+        Réponds UNIQUEMENT avec la question, sans autre texte.
+        """
+    elif mode == 'document':
+        prompt = f"""
+        Tu as analysé un document de type: {analysis.get('document_type', 'académique')}
+        
+        Résumé: {analysis.get('summary', '')[:200]}...
+        Sujets principaux: {', '.join(analysis.get('main_topics', [])[:3])}
+        
+        En tant que tuteur socratique, génère UNE question d'ouverture qui:
+        1. Vérifie la compréhension globale du document
+        2. Encourage à faire des liens entre les concepts
+        3. Est ouverte et stimulante
+        
+        Réponds UNIQUEMENT avec la question.
+        """
+    else:  # creative
+        prompt = f"""
+        Tu as analysé un travail créatif.
+        
+        Points forts identifiés: {', '.join([imp.get('aspect', '') for imp in analysis.get('strengths', [])[:2]])}
+        
+        En tant que mentor créatif, génère UNE question d'ouverture qui:
+        1. Demande à l'artiste d'expliquer son intention créative
+        2. L'invite à réfléchir sur ses choix
+        3. Est positive et encourageante
+        
+        Réponds UNIQUEMENT avec la question.
+        """
+    return prompt
+
+
+def build_chat_context(session, analysis_summary=None, context=None):
+    """Contexte de session envoyé au tuteur (analyse du fichier ou mode Chat Direct)"""
+    if analysis_summary is not None:
+        # Préparer le contexte pour Gemini basé sur le fichier
+        return f"""
+            Session Mode: {session.get_mode_display()}
+            Content Analysis: {json.dumps(analysis_summary, indent=2)}
+            Additional Context: {json.dumps(context or {}, indent=2)}
+            """
+    # Mode "Chat Direct" sans fichier
+    return f"""
+            Session Mode: {session.get_mode_display()} (Mode Text Direct)
+            L'utilisateur a choisi de discuter directement sans uploader de fichier.
+            Tu agis comme un tuteur généraliste expert utilisant la méthode socratique.
+            """
+
+
+def build_hint_prompt(problem, current_progress=""):
+    """Prompt d'indice socratique (réponse JSON hint/encouragement)"""
+    return f"""
+        L'étudiant travaille sur ce problème: {problem}
+        Progrès actuel: {current_progress}
+        
+        Fournis UN seul hint subtil qui guide sans révéler la solution.
+        Le hint doit être encourageant et pédagogique.
+        Réponds en format JSON: {{"hint": "...", "encouragement": "..."}}
+        """
+
+
+def sse_event(event, data):
+    """Formate un évènement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def wants_stream(request, data):
+    """Le client demande une réponse en streaming ({"stream": true} ou ?stream=1)"""
+    return data.get('stream') is True or request.GET.get('stream') == '1'
+
+
+def sse_response(events):
+    """Réponse text/event-stream non bufferisée"""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Désactive le buffering nginx
+    return response
+
+
+def relay_chunks(chunks, parts):
+    """Relaie les fragments Gemini en évènements 'token' et accumule le texte dans parts"""
+    for text in chunks:
+        parts.append(text)
+        yield sse_event('token', {'text': text})
+
+
+def record_question(session, question, response, context, model_name=''):
+    """Enregistre une question du chat et met à jour les statistiques"""
+    interaction = Interaction.objects.create(
+        session=session,
+        interaction_type='question',
+        gemini_prompt=question,
+        gemini_response=response,
+        model_name=model_name,
+        context_data=context
+    )
+    session_stats.record(session, questions=1)
+    return interaction
+
+
+def record_hint(session, hint_prompt, hint_data, problem, model_name=''):
+    """Enregistre un indice et met à jour les statistiques"""
+    interaction = Interaction.objects.create(
+        session=session,
+        interaction_type='hint',
+        gemini_prompt=hint_prompt,
+        gemini_response=hint_data.get('hint', ''),
+        model_name=model_name,
+        context_data={'problem': problem}
+    )
+    session_stats.record(session, hints=1)
+    return interaction
+
+
+def stream_first_question(chunks, mode):
+    """Flux SSE de la première question (fallback prédéfini si quota/surcharge)"""
+    parts = []
+    try:
+        yield from relay_chunks(chunks, parts)
+    except Exception as e:
+        error_msg, status_code = clean_gemini_error(str(e))
+        if status_code in [429, 503] and not parts:
+            yield sse_event('done', {
+                'success': True,
+                'question': FALLBACK_FIRST_QUESTIONS.get(mode, "Que penses-tu de ce contenu ?"),
+                'is_fallback': True
+            })
+        else:
+            yield sse_event('error', {'success': False, 'error': error_msg})
+        return
+    
+    yield sse_event('done', {
+        'success': True,
+        'question': ''.join(parts).strip().strip('"').strip("'")
+    })
+
+
+def stream_question_response(chunks, session, question, context, analysis_summary, meta):
+    """
+    Flux SSE d'une réponse du tuteur; l'interaction est enregistrée à la fin du flux
+    (meta: complété par le service avec le modèle utilisé)
+    """
+    parts = []
+    try:
+        yield from relay_chunks(chunks, parts)
+    except Exception as e:
+        error_msg, status_code = clean_gemini_error(str(e))
+        if status_code in [429, 503] and not parts:
+            print(f"DEBUG: QUOTA HIT during Chat stream! Activating Mock Response.")
+            yield sse_event('done', {
+                'success': True,
+                'response': get_mock_response(question, analysis_summary or {}),
+                'is_mock': True
+            })
+        else:
+            yield sse_event('error', {'success': False, 'error': error_msg})
+        return
+    
+    response = ''.join(parts)
+    interaction = record_question(session, question, response, context, meta.get('model', ''))
+    yield sse_event('done', {
+        'success': True,
+        'response': response,
+        'interaction_id': str(interaction.id)
+    })
+
+
+def stream_hint(chunks, session, hint_prompt, problem, meta):
+    """Flux SSE d'un indice (JSON); l'indice est parsé et enregistré à la fin du flux"""
+    parts = []
+    try:
+        yield from relay_chunks(chunks, parts)
+        hint_data = json.loads(''.join(parts))
+        record_hint(session, hint_prompt, hint_data, problem, meta.get('model', ''))
+    except Exception as e:
+        error_msg, status_code = clean_gemini_error(str(e))
+        yield sse_event('error', {'success': False, 'error': error_msg})
+        return
+    
+    yield sse_event('done', {
+        'success': True,
+        'hint': hint_data.get('hint'),
+        'encouragement': hint_data.get('encouragement')
+    })
+
+
 def index(request):
     """Page d'accueil de KacheleNeuralSync Live"""
     return render(request, 'main_app/index.html')
@@ -134,6 +372,7 @@ def create_session(request):
             title=title,
             user=request.user if request.user.is_authenticated else None
         )
+        session_stats.session_started(session)
         
         return JsonResponse({
             'success': True,
@@ -158,9 +397,25 @@ def upload_content(request):
     - file: Le fichier
     - session_id: ID de la session
     - context: Contexte optionnel
+    
+    Si l'analyse est en cache, elle est renvoyée immédiatement.
+    Sinon l'analyse est confiée au pool de workers et la réponse (202)
+    contient un job_id à suivre via /api/upload/<job_id>/status/.
     """
+    return handle_upload(request)
+
+
+def handle_upload(request):
+    """Traitement bloquant de l'upload (parsing multipart, écriture disque, hash, mise en file)"""
     try:
         if 'file' not in request.FILES:
+            # Fichier refusé pendant la réception (type ou taille, voir HashingUploadHandler)
+            upload_error = getattr(request, 'upload_error', None)
+            if upload_error:
+                return JsonResponse({
+                    'success': False,
+                    'error': upload_error[0]
+                }, status=upload_error[1])
             return JsonResponse({
                 'success': False,
                 'error': 'No file provided'
@@ -174,131 +429,54 @@ def upload_content(request):
         session = LearningSession.objects.get(id=session_id)
         
         # Déterminer le type de contenu
-        file_extension = os.path.splitext(file.name)[1].lower()
-        
-        if file_extension in ['.mp4', '.avi', '.mov', '.webm']:
-            content_type = 'video'
-        elif file_extension in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-            content_type = 'image'
-        elif file_extension in ['.pdf', '.txt', '.doc', '.docx']:
-            content_type = 'document'
-        else:
+        content_type = detect_content_type(file.name)
+        if content_type is None:
             return JsonResponse({
                 'success': False,
-                'error': f'Unsupported file type: {file_extension}'
+                'error': f'Unsupported file type: {os.path.splitext(file.name)[1].lower()}'
             }, status=400)
         
-        # Utiliser un fichier temporaire au lieu du stockage permanent
-        import tempfile
-        import shutil
-        from django.conf import settings
+        # Le fichier a déjà été spoolé sur disque pendant la réception: on le renomme
+        # dans tmp_uploads sans le recopier (le worker le supprimera après l'analyse)
+        temp_file_path = persist_upload(file)
         
-        # Créer un répertoire temporaire si nécessaire
-        temp_dir = os.path.join(settings.BASE_DIR, 'tmp_uploads')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Chemin du fichier temporaire
-        temp_file_path = os.path.join(temp_dir, file.name)
-        
-        # Écrire le fichier téléchargé sur le disque
-        with open(temp_file_path, 'wb+') as destination:
-            for chunk in file.chunks():
-                destination.write(chunk)
+        # Récupérer le mode rapide si spécifié (défaut: False pour qualité maximale)
+        speed_mode = request.POST.get('speed_mode', 'false').lower() == 'true'
         
         print(f"DEBUG: START Upload for {file.name} (Size: {file.size})")
+        enqueued = False
         try:
             # Étape 1: Création de l'objet DB
             print("DEBUG: Step 1 - Creating UploadedContent object...")
+            # Hash calculé pendant la réception (sinon relu depuis le disque)
+            content_hash = getattr(file, 'content_hash', '') or compute_file_hash(temp_file_path)
             uploaded_content = UploadedContent.objects.create(
                 session=session,
                 content_type=content_type,
                 file=None,
                 filename=file.name,
-                file_size=file.size
+                file_size=file.size,
+                content_hash=content_hash
             )
             print(f"DEBUG: Step 1 OK - ID: {uploaded_content.id}")
 
-            # Étape 2: Vérification du Cache
+            # Étape 2: Vérification du Cache (contenu + mode + contexte + speed_mode)
             print("DEBUG: Step 2 - Checking cache...")
-            existing_analysis = UploadedContent.objects.filter(
-                filename=file.name,
-                file_size=file.size,
-                analysis_completed=True
-            ).exclude(id=uploaded_content.id).order_by('-uploaded_at').first()
-
-            if existing_analysis:
-                print(f"DEBUG: Step 2 CACHE HIT! Reusing analysis for {file.name}")
-                # ... (rest of cache logic)
-                uploaded_content.analysis_completed = True
-                uploaded_content.analysis_summary = existing_analysis.analysis_summary
-                uploaded_content.key_concepts = existing_analysis.key_concepts
-                uploaded_content.save()
-                
-                return JsonResponse({
-                    'success': True,
-                    'upload_id': str(uploaded_content.id),
-                    'analysis': json.loads(uploaded_content.analysis_summary),
-                    'is_cached': True
-                })
+            cached_analysis = analysis_cache.get(
+                content_hash,
+                session.mode,
+                context=context,
+                speed_mode=speed_mode
+            )
 
-            # Étape 3: Appel Gemini
-            print(f"DEBUG: Step 3 - Calling Gemini (Mode: {session.mode})...")
-            class TempFileWrapper:
-                def __init__(self, path):
-                    self.path = path
-            
-            temp_file_obj = TempFileWrapper(temp_file_path)
-            
-            # Récupérer le mode rapide si spécifié (défaut: False pour qualité maximale)
-            speed_mode = request.POST.get('speed_mode', 'false').lower() == 'true'
-            if speed_mode:
-                print(f"DEBUG: ⚡ SPEED MODE activated for {file.name}")
-            
-            analysis_result = None
-            
-            if session.mode == 'video' and content_type == 'video':
-                analysis_result = gemini_service.analyze_video(
-                    temp_file_obj,
-                    context=context,
-                    speed_mode=speed_mode
-                )
-            elif session.mode == 'problem' and content_type == 'image':
-                analysis_result = gemini_service.analyze_image_problem(
-                    temp_file_path, # On passe le path directement car PIL.Image.open l'accepte
-                    subject_hint=context,
-                    speed_mode=speed_mode
-                )
-            elif session.mode == 'document' and content_type == 'document':
-                analysis_result = gemini_service.analyze_document(
-                    temp_file_obj,
-                    focus_areas=context,
-                    speed_mode=speed_mode
-                )
-            elif session.mode == 'creative' and content_type == 'image':
-                analysis_result = gemini_service.creative_workshop(
-                    temp_file_path, 
-                    creative_goal=context,
-                    speed_mode=speed_mode
-                )
-            
-            if analysis_result and analysis_result.get('success'):
-                print("DEBUG: Step 4 - Analysis Success, saving to DB...")
-                analysis_data = analysis_result.get('analysis', {})
-                
-                # Sauvegarder l'analyse
+            if cached_analysis is not None:
+                print(f"DEBUG: Step 2 CACHE HIT! Reusing analysis for {file.name} ({content_hash[:12]})")
                 uploaded_content.analysis_completed = True
-                uploaded_content.analysis_summary = json.dumps(analysis_data)
-                
-                # Extraire les concepts clés en toute sécurité
-                if 'key_concepts' in analysis_data:
-                    uploaded_content.key_concepts = analysis_data['key_concepts']
-                
+                uploaded_content.set_analysis(cached_analysis)
                 uploaded_content.save()
-                session.save()
                 
-                # Création sécurisée de la carte conceptuelle
-                if session.mode == 'document' and 'concept_map' in analysis_data:
-                    cmap_data = analysis_data.get('concept_map', {})
+                if session.mode == 'document' and 'concept_map' in cached_analysis:
+                    cmap_data = cached_analysis.get('concept_map', {})
                     ConceptMap.objects.create(
                         session=session,
                         nodes=cmap_data.get('nodes', []),
@@ -308,43 +486,32 @@ def upload_content(request):
                 return JsonResponse({
                     'success': True,
                     'upload_id': str(uploaded_content.id),
-                    'analysis': analysis_data
+                    'analysis': cached_analysis,
+                    'is_cached': True
                 })
-            else:
-                raw_error = analysis_result.get('error', 'Analysis failed') if analysis_result else 'No analysis performed'
-                print(f"DEBUG: Step 3 FAILED! Raw Error from Gemini: {raw_error}")
-                error_msg, status_code = clean_gemini_error(raw_error)
-                
-                # FAILOVER: If quota hit or model overloaded, use MOCK data
-                if status_code in [429, 503] and any(x in file.name.lower() for x in ["demo", "code", "math", "pdf", "rapport", "test"]):
-                    print(f"DEBUG: QUOTA HIT! Activating Mock Failover for {file.name}")
-                    mock_data = get_mock_analysis(file.name, session.mode)
-                    uploaded_content.analysis_completed = True
-                    uploaded_content.analysis_summary = json.dumps(mock_data)
-                    uploaded_content.save()
-                    return JsonResponse({
-                        'success': True,
-                        'upload_id': str(uploaded_content.id),
-                        'analysis': mock_data,
-                        'is_mock': True
-                    })
-
-                friendly_msg = error_msg
-                if status_code == 429:
-                    friendly_msg = "Désolé, le quota Gemini (Free Tier) est atteint. Veuillez patienter 60s ou utilisez un fichier de test ('demo_math.png')."
-                elif status_code == 503:
-                    friendly_msg = "Désolé, le modèle Gemini est actuellement surchargé. Veuillez réessayer dans quelques instants ou utilisez un fichier de test."
 
-                return JsonResponse({
-                    'success': False,
-                    'error': friendly_msg
-                }, status=status_code)
+            # Étape 3: Mise en file d'attente de l'analyse Gemini
+            print(f"DEBUG: Step 3 - Enqueuing Gemini analysis (Mode: {session.mode})...")
+            job = enqueue_analysis(
+                uploaded_content,
+                temp_file_path,
+                context=context,
+                speed_mode=speed_mode
+            )
+            enqueued = True
+            
+            return JsonResponse({
+                'success': True,
+                'upload_id': str(uploaded_content.id),
+                'job_id': str(job.id),
+                'status': job.status,
+                'status_url': f'/api/upload/{job.id}/status/'
+            }, status=202)
                 
         finally:
-            # Nettoyage : Supprimer le fichier temporaire QUOI QU'IL ARRIVE
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-                print(f"Fichier temporaire supprimé: {temp_file_path}")
+            # Nettoyage : le worker supprime le fichier une fois l'analyse terminée
+            if not enqueued:
+                scratch_space.release(temp_file_path)
         
     except LearningSession.DoesNotExist:
         return JsonResponse({
@@ -366,6 +533,45 @@ def upload_content(request):
         }, status=500)
 
 
+def upload_status_payload(job):
+    """État d'une tâche d'analyse tel que renvoyé au client (polling ou SSE)"""
+    payload = {
+        'success': job.status != 'failed',
+        'job_id': str(job.id),
+        'upload_id': str(job.upload_id),
+        'status': job.status,
+        'progress': job.progress,
+    }
+    if job.status == 'completed':
+        payload['analysis'] = job.result
+        if job.is_mock:
+            payload['is_mock'] = True
+    elif job.status == 'running' and job.result:
+        # Analyse progressive: étapes (ou parties d'un document volumineux) déjà terminées.
+        # Dès la première étape, le tuteur peut démarrer (/api/first-question/)
+        payload['partial_analysis'] = job.result
+        payload['stage'] = job.upload.analysis_stage
+        payload['stage_count'] = job.upload.analysis_stage_count
+    elif job.status == 'failed':
+        payload['error'] = job.error
+        payload['error_code'] = job.error_code
+    return payload
+
+
+@require_http_methods(["GET"])
+def get_upload_status(request, job_id):
+    """Récupère l'état d'une analyse en file d'attente (progression + résultat)"""
+    try:
+        job = AnalysisJob.objects.select_related('upload').get(id=job_id)
+    except AnalysisJob.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Job not found'
+        }, status=404)
+    
+    return JsonResponse(upload_status_payload(job))
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def generate_first_question(request):
@@ -375,7 +581,8 @@ def generate_first_question(request):
     POST body:
     {
         "session_id": "...",
-        "mode": "video|problem|document|creative"
+        "mode": "video|problem|document|creative",
+        "stream": false  (true: réponse text/event-stream)
     }
     """
     try:
@@ -384,7 +591,7 @@ def generate_first_question(request):
         mode = data.get('mode')
         
         session = LearningSession.objects.get(id=session_id)
-        latest_upload = session.uploads.filter(analysis_completed=True).last()
+        latest_upload = session.uploads.ready().defer('analysis').last()
         
         if not latest_upload:
             return JsonResponse({
@@ -392,84 +599,27 @@ def generate_first_question(request):
                 'error': 'No completed analysis found'
             }, status=404)
         
-        analysis = json.loads(latest_upload.analysis_summary)
+        analysis = parsed_analyses.get(latest_upload)
         
         # Créer un prompt spécifique selon le mode pour générer la première question
-        if mode == 'video':
-            prompt = f"""
-            Tu as analysé une vidéo éducative. Voici le résumé:
-            {analysis.get('summary', '')}
-            
-            Concepts clés: {', '.join(analysis.get('key_concepts', []))}
-            
-            En tant que tuteur socratique, génère UNE question d'ouverture engageante qui:
-            1. Vérifie si l'étudiant a compris le message principal
-            2. Ne révèle pas la réponse
-            3. Est formulée de manière encourageante et stimulante
-            4. Pousse à la réflexion critique
-            
-            Réponds UNIQUEMENT avec la question, sans introduction ni conclusion.
-            """
-        elif mode == 'problem':
-            prompt = f"""
-            Tu as analysé un problème visuel de type: {analysis.get('problem_type', 'inconnu')}
-            
-            Concepts requis: {', '.join(analysis.get('concepts_needed', []))}
-            
-            En tant que tuteur socratique, génère UNE question d'ouverture qui:
-            1. Demande à l'étudiant d'identifier le type de problème
-            2. L'invite à réfléchir aux concepts nécessaires
-            3. Ne donne aucun indice direct sur la solution
-            
-            Réponds UNIQUEMENT avec la question, sans autre texte.
-            """
-        elif mode == 'document':
-            prompt = f"""
-            Tu as analysé un document de type: {analysis.get('document_type', 'académique')}
-            
-            Résumé: {analysis.get('summary', '')[:200]}...
-            Sujets principaux: {', '.join(analysis.get('main_topics', [])[:3])}
-            
-            En tant que tuteur socratique, génère UNE question d'ouverture qui:
-            1. Vérifie la compréhension globale du document
-            2. Encourage à faire des liens entre les concepts
-            3. Est ouverte et stimulante
-            
-            Réponds UNIQUEMENT avec la question.
-            """
-        else:  # creative
-            prompt = f"""
-            Tu as analysé un travail créatif.
-            
-            Points forts identifiés: {', '.join([imp.get('aspect', '') for imp in analysis.get('strengths', [])[:2]])}
-            
-            En tant que mentor créatif, génère UNE question d'ouverture qui:
-            1. Demande à l'artiste d'expliquer son intention créative
-            2. L'invite à réfléchir sur ses choix
-            3. Est positive et encourageante
-            
-            Réponds UNIQUEMENT avec la question.
-            """
-        
-        # Initialiser la session de chat si nécessaire
-        if not hasattr(gemini_service, '_active_chats'):
-            gemini_service._active_chats = {}
+        prompt = build_first_question_prompt(mode, analysis)
         
-        if session_id not in gemini_service._active_chats:
-            full_context = f"""
+        # Contexte de la conversation (construit uniquement si elle n'existe pas encore)
+        def full_context():
+            return f"""
             Session Mode: {session.get_mode_display()}
             Content Analysis: {json.dumps(analysis, indent=2)}
             """
-            gemini_service._active_chats[session_id] = gemini_service.start_interactive_session(
-                context=full_context,
-                user_level='intermediate'
-            )
+        
+        # Route rapide (réflexion LOW, puis flash-lite sous pression): la première question doit arriver vite
+        if wants_stream(request, data):
+            return sse_response(stream_first_question(
+                gemini_service.stream_session_message(session_id, prompt, context=full_context, upload=latest_upload, route='first_question'),
+                mode
+            ))
         
         # Générer la question
-        question = gemini_service.send_message(
-            prompt,
-            chat_session=gemini_service._active_chats[session_id]
-        )
+        question = gemini_service.send_session_message(session_id, prompt, context=full_context, upload=latest_upload, route='first_question')
         
         # Nettoyer la question (enlever les éventuels guillemets ou formatage)
         question = question.strip().strip('"').strip("'")
@@ -489,15 +639,9 @@ def generate_first_question(request):
         
         # FAILOVER: Questions prédéfinies selon le mode
         if status_code in [429, 503]:
-            fallback_questions = {
-                'video': "Après avoir regardé cette vidéo, quel est selon toi le concept le plus important qui y est présenté ? Pourquoi ?",
-                'problem': "Avant de te donner des indices, quelle est ta première approche pour résoudre ce problème ? Quels concepts penses-tu devoir utiliser ?",
-                'document': "Maintenant que tu as parcouru ce document, quels sont les 2-3 idées principales qui en ressortent selon toi ?",
-                'creative': "Peux-tu m'expliquer l'intention derrière ton travail ? Qu'as-tu cherché à exprimer ou à accomplir ?"
-            }
             return JsonResponse({
                 'success': True,
-                'question': fallback_questions.get(data.get('mode'), "Que penses-tu de ce contenu ?"),
+                'question': FALLBACK_FIRST_QUESTIONS.get(data.get('mode'), "Que penses-tu de ce contenu ?"),
                 'is_fallback': True
             })
         
@@ -517,7 +661,8 @@ def ask_question(request):
     {
         "session_id": "...",
         "question": "...",
-        "context": {...}
+        "context": {...},
+        "stream": false  (true: réponse text/event-stream)
     }
     """
     try:
@@ -529,57 +674,32 @@ def ask_question(request):
         session = LearningSession.objects.get(id=session_id)
         
         # Récupérer l'analyse précédente pour le contexte
-        uploads = session.uploads.all()
+        uploads = session.uploads.only('filename', 'analysis_completed')
         print(f"DEBUG: Session {session_id} has {uploads.count()} total uploads.")
         for u in uploads:
             print(f"  - Upload {u.filename}: completed={u.analysis_completed}")
 
-        latest_upload = session.uploads.filter(analysis_completed=True).last()
+        latest_upload = session.uploads.ready().defer('analysis').last()
         
-        if latest_upload:
-            analysis_summary = json.loads(latest_upload.analysis_summary)
-            # Préparer le contexte pour Gemini basé sur le fichier
-            full_context = f"""
-            Session Mode: {session.get_mode_display()}
-            Content Analysis: {json.dumps(analysis_summary, indent=2)}
-            Additional Context: {json.dumps(context, indent=2)}
-            """
-        else:
-            # Mode "Chat Direct" sans fichier
-            full_context = f"""
-            Session Mode: {session.get_mode_display()} (Mode Text Direct)
-            L'utilisateur a choisi de discuter directement sans uploader de fichier.
-            Tu agis comme un tuteur généraliste expert utilisant la méthode socratique.
-            """
+        analysis_summary = parsed_analyses.get(latest_upload) if latest_upload else None
         
         # Démarrer ou continuer la session de chat
-        if not hasattr(gemini_service, '_active_chats'):
-            gemini_service._active_chats = {}
+        def full_context():
+            return build_chat_context(session, analysis_summary, context)
         
-        if session_id not in gemini_service._active_chats:
-            gemini_service._active_chats[session_id] = gemini_service.start_interactive_session(
-                context=full_context,
-                user_level='intermediate'  # TODO: Utiliser le vrai niveau de l'utilisateur
-            )
+        meta = {}
+        if wants_stream(request, data):
+            return sse_response(stream_question_response(
+                gemini_service.stream_session_message(session_id, question, context=full_context, upload=latest_upload, meta=meta),
+                session, question, context, analysis_summary, meta
+            ))
         
         # Envoyer la question
-        response = gemini_service.send_message(
-            question,
-            chat_session=gemini_service._active_chats[session_id]
-        )
-        
-        # Enregistrer l'interaction
-        interaction = Interaction.objects.create(
-            session=session,
-            interaction_type='question',
-            gemini_prompt=question,
-            gemini_response=response,
-            context_data=context
-        )
+        # TODO: Utiliser le vrai niveau de l'utilisateur (user_level)
+        response = gemini_service.send_session_message(session_id, question, context=full_context, upload=latest_upload, meta=meta)
         
-        # Mettre à jour les statistiques
-        session.questions_asked += 1
-        session.save()
+        # Enregistrer l'interaction et mettre à jour les statistiques
+        interaction = record_question(session, question, response, context, meta.get('model', ''))
         
         return JsonResponse({
             'success': True,
@@ -600,8 +720,9 @@ def ask_question(request):
             print(f"DEBUG: QUOTA HIT during Chat! Activating Mock Response.")
             try:
                 # On essaie de récupérer le résumé pour personnaliser un peu
-                latest_upload = LearningSession.objects.get(id=session_id).uploads.filter(analysis_completed=True).last()
-                analysis_summary = json.loads(latest_upload.analysis_summary) if latest_upload else {}
+                latest_upload = LearningSession.objects.get(id=session_id).uploads.ready().defer('analysis').last()
+                # Colonnes dédiées: pas besoin de l'analyse complète
+                analysis_summary = {'summary': latest_upload.summary, 'key_concepts': latest_upload.key_concepts} if latest_upload else {}
             except:
                 analysis_summary = {}
                 
@@ -644,11 +765,13 @@ def submit_answer(request):
         session = LearningSession.objects.get(id=session_id)
         
         # Évaluer la réponse avec Gemini
+        meta = {}
         evaluation = gemini_service.evaluate_answer(
             question=question,
             user_answer=user_answer,
             correct_answer=correct_answer,
-            context=json.dumps(context)
+            context=json.dumps(context),
+            meta=meta
         )
         
         # Enregistrer l'interaction
@@ -659,13 +782,12 @@ def submit_answer(request):
             gemini_response=evaluation.get('feedback', ''),
             user_response=user_answer,
             is_correct=evaluation.get('is_correct', False),
+            model_name=meta.get('model', ''),
             context_data=context
         )
         
         # Mettre à jour les statistiques
-        if evaluation.get('is_correct'):
-            session.correct_answers += 1
-        session.save()
+        session_stats.record(session, correct=1 if evaluation.get('is_correct') else 0)
         
         return JsonResponse({
             'success': True,
@@ -695,7 +817,8 @@ def request_hint(request):
     {
         "session_id": "...",
         "problem": "...",
-        "current_progress": "..."
+        "current_progress": "...",
+        "stream": false  (true: réponse text/event-stream)
     }
     """
     try:
@@ -707,44 +830,25 @@ def request_hint(request):
         session = LearningSession.objects.get(id=session_id)
         
         # Générer un hint avec Gemini
-        hint_prompt = f"""
-        L'étudiant travaille sur ce problème: {problem}
-        Progrès actuel: {current_progress}
-        
-        Fournis UN seul hint subtil qui guide sans révéler la solution.
-        Le hint doit être encourageant et pédagogique.
-        Réponds en format JSON: {{"hint": "...", "encouragement": "..."}}
-        """
+        hint_prompt = build_hint_prompt(problem, current_progress)
         
-        if not hasattr(gemini_service, '_active_chats'):
-            gemini_service._active_chats = {}
+        hint_context = f"Session Mode: {session.get_mode_display()}"
         
-        if session_id not in gemini_service._active_chats:
-            gemini_service._active_chats[session_id] = gemini_service.start_interactive_session(
-                context=f"Session Mode: {session.get_mode_display()}",
-                user_level='intermediate'
-            )
+        # Route rapide pour les indices (réflexion LOW, puis flash-lite sous pression, voir model_router)
+        meta = {}
+        if wants_stream(request, data):
+            return sse_response(stream_hint(
+                gemini_service.stream_session_message(session_id, hint_prompt, context=hint_context, route='hint', meta=meta),
+                session, hint_prompt, problem, meta
+            ))
         
-        response = gemini_service.send_message(
-            hint_prompt,
-            chat_session=gemini_service._active_chats[session_id]
-        )
+        response = gemini_service.send_session_message(session_id, hint_prompt, context=hint_context, route='hint', meta=meta)
         
         # Parser la réponse JSON
         hint_data = json.loads(response)
         
-        # Enregistrer l'interaction
-        Interaction.objects.create(
-            session=session,
-            interaction_type='hint',
-            gemini_prompt=hint_prompt,
-            gemini_response=hint_data.get('hint', ''),
-            context_data={'problem': problem}
-        )
-        
-        # Mettre à jour les statistiques
-        session.hints_used += 1
-        session.save()
+        # Enregistrer l'interaction et mettre à jour les statistiques
+        record_hint(session, hint_prompt, hint_data, problem, meta.get('model', ''))
         
         return JsonResponse({
             'success': True,
@@ -759,11 +863,57 @@ def request_hint(request):
         }, status=500)
 
 
+@require_http_methods(["GET"])
+def get_cache_stats(request):
+    """Récupère les compteurs du cache d'analyses, du cache d'images préparées, de la déduplication des analyses en cours et des analyses décodées"""
+    return JsonResponse({
+        'success': True,
+        'stats': analysis_cache.stats(),
+        'images': image_preprocessor.stats(),
+        'in_flight': analysis_flights.stats(),
+        'parsed_analyses': parsed_analyses.stats()
+    })
+
+
+@require_http_methods(["GET"])
+def get_scratch_stats(request):
+    """Récupère l'occupation de l'espace temporaire des uploads (fichiers, octets, quota)"""
+    return JsonResponse({
+        'success': True,
+        'stats': scratch_space.stats()
+    })
+
+
+@require_http_methods(["GET"])
+def get_chat_store_stats(request):
+    """Récupère les métriques du stockage des conversations et du cache de contexte Gemini"""
+    return JsonResponse({
+        'success': True,
+        'stats': chat_store.stats(),
+        'context_cache': context_cache.stats()
+    })
+
+
+@require_http_methods(["GET"])
+def get_gemini_stats(request):
+    """
+    Récupère l'état de l'ordonnanceur Gemini (file d'attente, budgets), de la résilience
+    (tentatives, disjoncteurs), du routage des modèles (palier courant par route) et du pool HTTP
+    """
+    return JsonResponse({
+        'success': True,
+        'scheduler': gemini_scheduler.stats(),
+        'resilience': gemini_resilience.stats(),
+        'router': model_router.stats(),
+        'transport': gemini_transport.describe()
+    })
+
+
 @require_http_methods(["GET"])
 def get_session_stats(request, session_id):
     """Récupère les statistiques d'une session"""
     try:
-        session = LearningSession.objects.get(id=session_id)
+        session = session_stats.apply_pending(LearningSession.objects.get(id=session_id))
         
         return JsonResponse({
             'success': True,